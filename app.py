@@ -1,18 +1,37 @@
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, g
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, g, Response, has_request_context
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta, date, timezone
 import re
 import random
 import string
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta
 import json
+import base64
+import csv
+import io
 from functools import wraps
 import os
 from dotenv import load_dotenv
 from threading import Thread
+import threading
+import queue
 import time
+import sys
 import sqlite3
+import click
+import atexit
+from decimal import Decimal
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from email.utils import parsedate_to_datetime
+
+try:
+    import MySQLdb
+    import MySQLdb.cursors
+except ImportError:  # only needed with DB_BACKEND=mysql
+    MySQLdb = None
 
 
 # Load environment variables
@@ -24,27 +43,843 @@ app.secret_key = os.getenv('SECRET_KEY', 'fallback-secret-key')
 # SQLite configuration
 DATABASE = os.getenv('DATABASE', 'debt_collection.db')
 
+# Optional tenant sharding. With DB_SHARDS > 0 each admin's clients, reminders
+# and payments live in shard file admin_id % DB_SHARDS under DB_SHARD_DIR, and
+# DATABASE becomes the directory database holding the admins table.
+DB_SHARDS = int(os.getenv('DB_SHARDS', '0'))
+DB_SHARD_DIR = os.getenv('DB_SHARD_DIR', 'shards')
+
+# Apply pending migrations on startup. Set to 0 when the deploy runs
+# `flask --app app migrate` as a separate step.
+AUTO_MIGRATE = os.getenv('AUTO_MIGRATE', '1') == '1'
+
+# Connection pool and PRAGMA tuning
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '8'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+DB_JOURNAL_MODE = os.getenv('DB_JOURNAL_MODE', 'WAL')
+DB_SYNCHRONOUS = os.getenv('DB_SYNCHRONOUS', 'NORMAL')
+DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(64 * 1024 * 1024)))
+DB_CACHE_SIZE = int(os.getenv('DB_CACHE_SIZE', '-16000'))  # negative = KiB
+
+# Storage backend: 'sqlite' (default) or 'mysql' for MySQL/MariaDB
+DB_BACKEND = os.getenv('DB_BACKEND', 'sqlite')
+MYSQL_HOST = os.getenv('MYSQL_HOST', 'localhost')
+MYSQL_PORT = int(os.getenv('MYSQL_PORT', '3306'))
+MYSQL_USER = os.getenv('MYSQL_USER', 'root')
+MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD', '')
+MYSQL_DATABASE = os.getenv('MYSQL_DATABASE', 'debt_collection')
+MYSQL_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', str(DB_POOL_SIZE)))
+
 # Brevo API configuration
 BREVO_API_KEY = os.getenv('BREVO_API_KEY')
-BREVO_API_URL = 'https://api.brevo.com/v3/smtp/email'
+BREVO_API_URL = os.getenv('BREVO_API_URL', 'https://api.brevo.com/v3/smtp/email')
+BREVO_BATCH_SIZE = int(os.getenv('BREVO_BATCH_SIZE', '1000'))  # messageVersions per request (API limit)
+BREVO_POOL_SIZE = int(os.getenv('BREVO_POOL_SIZE', '10'))  # keep-alive connections per process
+BREVO_CONNECT_TIMEOUT = float(os.getenv('BREVO_CONNECT_TIMEOUT', '3'))
+BREVO_READ_TIMEOUT = float(os.getenv('BREVO_READ_TIMEOUT', '10'))
+BREVO_MAX_RETRIES = int(os.getenv('BREVO_MAX_RETRIES', '3'))
+BREVO_BACKOFF_SECONDS = float(os.getenv('BREVO_BACKOFF_SECONDS', '0.5'))  # doubled per retry
+BREVO_MAX_RETRY_WAIT = float(os.getenv('BREVO_MAX_RETRY_WAIT', '30'))  # give up rather than wait longer
+BREVO_BREAKER_THRESHOLD = int(os.getenv('BREVO_BREAKER_THRESHOLD', '5'))  # consecutive failed calls
+BREVO_BREAKER_COOLDOWN = float(os.getenv('BREVO_BREAKER_COOLDOWN', '30'))
+
+# Outbound rate limits shared by every thread and process, as name=per_second[/burst].
+# 'brevo' caps Brevo API requests; a batch of up to BREVO_BATCH_SIZE messages is one
+# request. Per-gateway caps are opt-in: 'gateway' sets a default cap on messages per
+# SMS gateway domain, and entries named after a domain override it. 0 disables a limit.
+RATE_LIMITS = os.getenv('RATE_LIMITS', 'brevo=10/20')
+RATE_LIMIT_DATABASE = os.getenv('RATE_LIMIT_DATABASE', DATABASE)  # SQLite file holding the buckets
+RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', '60'))  # fail the send rather than wait longer
+
+class SQLitePool:
+    """Per-process pool of tuned SQLite connections shared by request and worker threads.
+
+    Connections are opened lazily up to ``size`` and handed back on release, so a
+    gunicorn worker keeps a handful of warm connections instead of reconnecting
+    (and re-running the PRAGMAs) on every request.
+    """
+
+    def __init__(self, database, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._stats = {'hits': 0, 'misses': 0, 'waits': 0, 'wait_time_ms': 0.0, 'timeouts': 0}
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # This enables column access by name
+        conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+        conn.execute(f'PRAGMA journal_mode = {DB_JOURNAL_MODE}')
+        conn.execute(f'PRAGMA synchronous = {DB_SYNCHRONOUS}')
+        conn.execute('PRAGMA foreign_keys = ON')
+        conn.execute(f'PRAGMA mmap_size = {DB_MMAP_SIZE}')
+        conn.execute(f'PRAGMA cache_size = {DB_CACHE_SIZE}')
+        return conn
+
+    def acquire(self):
+        """Take a connection from the pool, opening one if the pool is not full"""
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked (gunicorn --preload): never share the parent's handles
+                self._reset()
+            try:
+                conn = self._idle.get_nowait()
+                self._stats['hits'] += 1
+                return conn
+            except queue.Empty:
+                pass
+            if self._created < self.size:
+                self._created += 1
+                self._stats['misses'] += 1
+                create = True
+            else:
+                create = False
+
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        started = time.monotonic()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise sqlite3.OperationalError(f'Timed out after {self.timeout}s waiting for a database connection')
+        with self._lock:
+            self._stats['waits'] += 1
+            self._stats['wait_time_ms'] += (time.monotonic() - started) * 1000
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any unfinished transaction"""
+        if self._pid != os.getpid():
+            return
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            # Broken handle: drop it so the slot can be reopened
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(conn)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['wait_time_ms'] = round(stats['wait_time_ms'], 3)
+            stats.update({
+                'database': self.database,
+                'size': self.size,
+                'open': self._created,
+                'idle': self._idle.qsize(),
+            })
+        return stats
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(database=None):
+    """Return the process-wide pool for a database file"""
+    database = database or DATABASE
+    with _pools_lock:
+        pool = _pools.get(database)
+        if pool is None:
+            pool = _pools[database] = SQLitePool(database)
+    return pool
 
-def get_db():
-    """Get database connection"""
-    if 'db' not in g:
-        g.db = sqlite3.connect(DATABASE)
-        g.db.row_factory = sqlite3.Row  # This enables column access by name
-    return g.db
+def shard_path(bucket):
+    return os.path.join(DB_SHARD_DIR, f'shard_{bucket:03d}.db')
+
+def shard_database(admin_id):
+    """Database file holding an admin's clients (DATABASE unless sharding is on)"""
+    if not DB_SHARDS or admin_id is None:
+        return DATABASE
+    return shard_path(admin_id % DB_SHARDS)
+
+def all_databases():
+    """The directory database followed by every shard"""
+    return [DATABASE] + [shard_path(bucket) for bucket in range(DB_SHARDS)]
+
+def _pooled_db(database):
+    """Connection to a database file, held for the rest of the app context"""
+    dbs = g.setdefault('dbs', {})
+    if database not in dbs:
+        dbs[database] = get_pool(database).acquire()
+    return dbs[database]
+
+def get_db(admin_id=None):
+    """Get the connection holding an admin's data (default: the logged-in admin)"""
+    if admin_id is None and has_request_context():
+        admin_id = session.get('admin_id')
+    return _pooled_db(shard_database(admin_id))
+
+def get_directory_db():
+    """Get the connection holding the admins table"""
+    return _pooled_db(DATABASE)
 
 def close_db(e=None):
-    """Close database connection"""
-    db = g.pop('db', None)
-    if db is not None:
-        db.close()
+    """Return database connections to their pools"""
+    for database, db in g.pop('dbs', {}).items():
+        get_pool(database).release(db)
+
+# Write-behind buffer for append-only logs (reminder rows, delivery statuses).
+# Rows are group-committed: one transaction and one fsync per flush instead of
+# one per row, and no write lock is held while a send is in flight.
+WRITE_BUFFER_MAX_ROWS = int(os.getenv('WRITE_BUFFER_MAX_ROWS', '500'))
+WRITE_BUFFER_MAX_MS = int(os.getenv('WRITE_BUFFER_MAX_MS', '1000'))
+
+class WriteBuffer:
+    """Per-process queue of INSERTs flushed with executemany in one transaction.
+
+    A flush happens when MAX_ROWS rows are pending, when the oldest pending row
+    is MAX_MS old, at the end of every request and at interpreter exit. Only
+    use it for rows nothing reads back within the same request.
+    """
+
+    def __init__(self, max_rows=WRITE_BUFFER_MAX_ROWS, max_ms=WRITE_BUFFER_MAX_MS):
+        self.max_rows = max_rows
+        self.max_ms = max_ms
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # flushes run one at a time, in order
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._pending = {}  # database -> {sql: [params, ...]}
+        self._count = 0
+        self._timer = None
+        self._stats = {'rows': 0, 'flushes': 0, 'dropped': 0}
+
+    def add(self, database, sql, params):
+        """Queue one row for a database file"""
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()  # the parent flushes its own rows
+            self._pending.setdefault(database, {}).setdefault(sql, []).append(params)
+            self._count += 1
+            if self._timer is None:
+                self._timer = threading.Timer(self.max_ms / 1000, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+            full = self._count >= self.max_rows
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write every pending row; returns the number of rows written"""
+        if not self._count:
+            return 0  # nothing queued: skip the lock on the per-request path
+        with self._flush_lock:
+            with self._lock:
+                if self._pid != os.getpid() or not self._count:
+                    return 0
+                pending, self._pending, self._count = self._pending, {}, 0
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+
+            written = 0
+            for database, statements in pending.items():
+                rows = sum(len(params) for params in statements.values())
+                pool = get_pool(database)
+                db = pool.acquire()
+                try:
+                    db.execute('BEGIN IMMEDIATE')
+                    for sql, params in statements.items():
+                        db.executemany(sql, params)
+                    db.commit()
+                    written += rows
+                except Exception as e:
+                    db.rollback()
+                    print(f"Warning: write buffer dropped {rows} row(s) for {database}: {e}")
+                    with self._lock:
+                        self._stats['dropped'] += rows
+                finally:
+                    pool.release(db)
+
+            with self._lock:
+                self._stats['rows'] += written
+                self._stats['flushes'] += 1
+            return written
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._stats, pending=self._count, max_rows=self.max_rows, max_ms=self.max_ms)
+
+write_buffer = WriteBuffer()
+atexit.register(write_buffer.flush)
+
+class MySQLPool(SQLitePool):
+    """Per-process pool of MySQL/MariaDB connections (same accounting as SQLitePool)"""
+
+    def __init__(self, size=MYSQL_POOL_SIZE, timeout=DB_POOL_TIMEOUT):
+        super().__init__(f'mysql://{MYSQL_USER}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}', size, timeout)
+
+    def _connect(self):
+        if MySQLdb is None:
+            raise RuntimeError('DB_BACKEND=mysql requires the mysqlclient package')
+        conn = MySQLdb.connect(host=MYSQL_HOST, port=MYSQL_PORT, user=MYSQL_USER, passwd=MYSQL_PASSWORD,
+                               db=MYSQL_DATABASE, charset='utf8mb4', autocommit=False)
+        cursor = conn.cursor()
+        cursor.execute("SET time_zone = '+00:00'")  # CURRENT_TIMESTAMP in UTC, as in SQLite
+        cursor.close()
+        return conn
+
+    def acquire(self):
+        conn = super().acquire()
+        try:
+            conn.ping()
+        except MySQLdb.Error:
+            # Server closed an idle connection (wait_timeout): replace it
+            conn = self._connect()
+        return conn
+
+    def release(self, conn):
+        if self._pid != os.getpid():
+            return
+        try:
+            conn.rollback()
+        except MySQLdb.Error:
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put(conn)
+
+def get_mysql_pool():
+    with _pools_lock:
+        pool = _pools.get('mysql')
+        if pool is None:
+            pool = _pools['mysql'] = MySQLPool()
+    return pool
+
+# Storage repositories
+#
+# Routes reach admins, clients and sms_reminders through get_repository()
+# rather than raw SQL, so the same route code runs on SQLite or MySQL/MariaDB.
+# Queries are written once with :named parameters; each backend supplies the
+# connection handling and the few statements that differ by dialect.
+# Features built on SQLite-only machinery (FTS5, triggers, the payments
+# ledger) still use get_db() directly and are marked @sqlite_only.
+class Repository:
+    sort_columns = None  # listing sort expressions, see CLIENT_SORT_COLUMNS
+    has_archive = False  # archived_* tables (cold storage) exist
+    insert_ignore = 'INSERT OR IGNORE'  # skip rows that hit a unique key
+
+    def execute(self, sql, params=None):
+        raise NotImplementedError
+
+    def execute_directory(self, sql, params=None):
+        """Run a statement on the admins table"""
+        return self.execute(sql, params)
+
+    def iter_rows(self, sql, params, batch_size):
+        """Yield batches of row dicts from a server-side cursor on a dedicated connection"""
+        raise NotImplementedError
+
+    def commit(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def sync_admin(self, admin):
+        """Make sure an admin's row exists wherever its clients are stored"""
+
+    def fetchone(self, sql, params=None):
+        row = self.execute(sql, params).fetchone()
+        return dict(row) if row is not None else None
+
+    def fetchall(self, sql, params=None):
+        return [dict(row) for row in self.execute(sql, params).fetchall()]
+
+    # Admins
+    def get_admin(self, admin_id):
+        row = self.execute_directory('SELECT * FROM admins WHERE id = :id', {'id': admin_id}).fetchone()
+        return dict(row) if row is not None else None
+
+    def get_admin_by_email(self, email):
+        row = self.execute_directory('SELECT * FROM admins WHERE email = :email', {'email': email}).fetchone()
+        return dict(row) if row is not None else None
+
+    def create_admin(self, username, email, password):
+        return self.execute_directory(
+            'INSERT INTO admins (username, email, password) VALUES (:username, :email, :password)',
+            {'username': username, 'email': email, 'password': password}
+        ).lastrowid
+
+    # Clients
+    def get_client(self, admin_id, client_id):
+        return self.fetchone('SELECT * FROM clients WHERE id = :id AND admin_id = :admin_id',
+                             {'id': client_id, 'admin_id': admin_id})
+
+    def create_client(self, admin_id, client):
+        """Insert a client (name, phone, products, total_amount, remaining_balance, due_date)"""
+        client_id = self.execute('''
+            INSERT INTO clients (admin_id, name, phone, phone_e164, carrier, products, total_amount,
+                                 remaining_balance, due_date)
+            VALUES (:admin_id, :name, :phone, :phone_e164, :carrier, :products, :total_amount,
+                    :remaining_balance, :due_date)
+        ''', dict(client, admin_id=admin_id, **phone_columns(client['phone']))).lastrowid
+        self.refresh_statuses(client_ids=[client_id])
+        return client_id
+
+    def update_client(self, admin_id, client_id, client):
+        count = self.execute('''
+            UPDATE clients
+            SET name = :name, phone = :phone, phone_e164 = :phone_e164, carrier = :carrier, products = :products,
+                total_amount = :total_amount, remaining_balance = :remaining_balance, due_date = :due_date
+            WHERE id = :id AND admin_id = :admin_id
+        ''', dict(client, id=client_id, admin_id=admin_id, **phone_columns(client['phone']))).rowcount
+        self.refresh_statuses(client_ids=[client_id])
+        return count
+
+    def delete_client(self, admin_id, client_id):
+        return self.execute('DELETE FROM clients WHERE id = :id AND admin_id = :admin_id',
+                            {'id': client_id, 'admin_id': admin_id}).rowcount
+
+    def due_clients(self, admin_id, today=None):
+        """Unpaid clients due yesterday, today or tomorrow"""
+        today = today or date.today()
+        return self.fetchall('''
+            SELECT * FROM clients
+            WHERE admin_id = :admin_id AND due_date IN (:yesterday, :today, :tomorrow) AND remaining_balance > 0
+            ORDER BY due_date
+        ''', {
+            'admin_id': admin_id,
+            'yesterday': (today - timedelta(days=1)).strftime('%Y-%m-%d'),
+            'today': today.strftime('%Y-%m-%d'),
+            'tomorrow': (today + timedelta(days=1)).strftime('%Y-%m-%d')
+        })
+
+    def count_due_between(self, admin_id, start, end):
+        """Unpaid clients with a due date in [start, end]"""
+        return self.fetchone('''
+            SELECT COUNT(*) AS count FROM clients
+            WHERE admin_id = :admin_id AND due_date >= :start AND due_date <= :end AND remaining_balance > 0
+        ''', {'admin_id': admin_id, 'start': start.strftime('%Y-%m-%d'), 'end': end.strftime('%Y-%m-%d')})['count']
+
+    _SMS_ELIGIBLE = '''
+        FROM clients
+        WHERE admin_id = :admin_id AND phone IS NOT NULL AND phone != '' AND remaining_balance > 0
+    '''
+
+    def sms_eligible_clients(self, admin_id):
+        return self.fetchall('SELECT * ' + self._SMS_ELIGIBLE, {'admin_id': admin_id})
+
+    def count_sms_eligible(self, admin_id):
+        return self.fetchone('SELECT COUNT(*) AS count ' + self._SMS_ELIGIBLE, {'admin_id': admin_id})['count']
+
+    def recent_paid_clients(self, admin_id, limit=5):
+        return self.fetchall('''
+            SELECT * FROM clients
+            WHERE admin_id = :admin_id AND remaining_balance <= 0
+            ORDER BY paid_at DESC
+            LIMIT :limit
+        ''', {'admin_id': admin_id, 'limit': limit})
+
+    def buffer_write(self, sql, params):
+        """Append-only INSERT that may be group-committed later (see WriteBuffer)"""
+        self.execute(sql, params)
+
+    # SMS reminders
+    def log_sms_reminder(self, client_id, method='email_gateway'):
+        # Written later, so skip clients deleted in the meantime instead of failing the batch
+        self.buffer_write(SMS_REMINDER_LOG_SQL,
+                          {'client_id': client_id, 'method': method, 'sent_at': datetime.now().isoformat()})
+
+    # Notification ledger
+    def claim_notifications(self, admin_id, clients, today=None):
+        """Record an alert for each client's current (status, due date); returns the
+        clients that had not been alerted for it before
+
+        The ledger's primary key makes each insert an atomic claim, so concurrent
+        checks never both send the same alert. Commit before sending.
+        """
+        today = today or date.today()
+        # Past due dates never come back into the due window
+        self.execute('DELETE FROM notification_ledger WHERE admin_id = :admin_id AND due_date < :yesterday',
+                     {'admin_id': admin_id, 'yesterday': (today - timedelta(days=1)).strftime('%Y-%m-%d')})
+        claimed = []
+        for client in clients:
+            if self.execute(f'''
+                {self.insert_ignore} INTO notification_ledger (client_id, status, due_date, admin_id)
+                VALUES (:client_id, :status, :due_date, :admin_id)
+            ''', {'client_id': client['id'], 'status': client['status'], 'due_date': client['due_date'],
+                  'admin_id': admin_id}).rowcount == 1:
+                claimed.append(client)
+        return claimed
+
+    def release_notifications(self, clients):
+        """Drop the claims of alerts that failed to send, so the next check retries them"""
+        for client in clients:
+            self.execute('''
+                DELETE FROM notification_ledger
+                WHERE client_id = :client_id AND status = :status AND due_date = :due_date
+            ''', {'client_id': client['id'], 'status': client['status'], 'due_date': client['due_date']})
+
+    # Notification mode and daily digest
+    def set_notification_mode(self, admin_id, mode):
+        return self.execute_directory('UPDATE admins SET notification_mode = :mode WHERE id = :id',
+                                      {'mode': mode, 'id': admin_id}).rowcount
+
+    def digest_admins(self):
+        return [dict(row) for row in self.execute_directory(
+            "SELECT * FROM admins WHERE notification_mode = 'digest' ORDER BY id").fetchall()]
+
+    def claim_digest(self, admin_id, today=None):
+        """Mark today's digest as sent; False if another run already claimed it (commit before sending)"""
+        today = (today or date.today()).strftime('%Y-%m-%d')
+        return self.execute_directory('''
+            UPDATE admins SET digest_sent_on = :today
+            WHERE id = :id AND (digest_sent_on IS NULL OR digest_sent_on < :today)
+        ''', {'today': today, 'id': admin_id}).rowcount == 1
+
+    def release_digest(self, admin_id, previous):
+        """Undo claim_digest after a failed send so the next run retries"""
+        self.execute_directory('UPDATE admins SET digest_sent_on = :previous WHERE id = :id',
+                               {'previous': previous, 'id': admin_id})
+
+    # Dialect-specific
+    def refresh_statuses(self, admin_id=None, client_ids=None):
+        """Recompute the materialized status/days_overdue of the given clients"""
+        raise NotImplementedError
+
+    def ensure_current_statuses(self, admin_id, today=None):
+        """Make sure an admin's materialized statuses reflect today's date"""
+        raise NotImplementedError
+
+    def client_summary(self, admin_id, today=None):
+        """Totals and status counts (see SUMMARY_COUNTERS); also makes statuses current"""
+        raise NotImplementedError
+
+    def mark_paid(self, admin_id, client_id, method='cash'):
+        """Settle a client's remaining balance; ValueError if there is nothing to settle"""
+        raise NotImplementedError
+
+class SQLiteRepository(Repository):
+    """Repository over the pooled SQLite connection holding one admin's data"""
+    sort_columns = property(lambda self: CLIENT_SORT_COLUMNS)
+    has_archive = True
+
+    def __init__(self, admin_id=None):
+        self.admin_id = admin_id
+
+    def execute(self, sql, params=None):
+        return get_db(self.admin_id).execute(sql, params or {})
+
+    def execute_directory(self, sql, params=None):
+        return get_directory_db().execute(sql, params or {})
+
+    def buffer_write(self, sql, params):
+        write_buffer.add(shard_database(self.admin_id), sql, params)
+
+    def create_admin(self, username, email, password):
+        admin_id = super().create_admin(username, email, password)
+        if DB_SHARDS:
+            mirror_admin(self.get_admin(admin_id))
+        return admin_id
+
+    def sync_admin(self, admin):
+        if DB_SHARDS:
+            mirror_admin(admin)
+            get_db(admin['id']).commit()
+
+    def iter_rows(self, sql, params, batch_size):
+        # Streams outlive the request's connection, so hold a separate one
+        pool = get_pool(shard_database(self.admin_id))
+        db = pool.acquire()
+        try:
+            cursor = db.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [dict(row) for row in rows]
+            cursor.close()
+        finally:
+            pool.release(db)
+
+    def commit(self):
+        # Directory first, so a shard never holds an admin the directory lacks
+        for database, db in sorted(g.get('dbs', {}).items(), key=lambda item: item[0] != DATABASE):
+            db.commit()
+
+    def refresh_statuses(self, admin_id=None, client_ids=None):
+        return refresh_client_statuses(get_db(self.admin_id), admin_id=admin_id, client_ids=client_ids)
+
+    def ensure_current_statuses(self, admin_id, today=None):
+        get_admin_summary(get_db(admin_id), admin_id, today)
+
+    def client_summary(self, admin_id, today=None):
+        return get_admin_summary(get_db(admin_id), admin_id, today)
+
+    def mark_paid(self, admin_id, client_id, method='cash'):
+        return record_payment(get_db(admin_id), admin_id, client_id, method=method)
+
+# MySQL keeps status, days_overdue and paid_at current in the same statement
+# (there are no triggers on this backend)
+MYSQL_STATUS_SET_SQL = '''
+    status = CASE
+        WHEN remaining_balance <= 0 THEN 'paid'
+        WHEN due_date IS NULL THEN 'pending'
+        WHEN due_date < :today THEN 'overdue'
+        WHEN due_date = :today THEN 'due_today'
+        WHEN due_date = :tomorrow THEN 'due_tomorrow'
+        ELSE 'pending'
+    END,
+    days_overdue = CASE WHEN remaining_balance <= 0 THEN NULL ELSE DATEDIFF(:today, due_date) END,
+    paid_at = CASE WHEN remaining_balance <= 0 THEN COALESCE(paid_at, CURRENT_TIMESTAMP) END
+'''
+
+MYSQL_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS admins (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL UNIQUE,
+        password VARCHAR(255) NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        notification_mode VARCHAR(16) NOT NULL DEFAULT 'instant',
+        digest_sent_on DATE
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4''',
+    '''CREATE TABLE IF NOT EXISTS clients (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        admin_id INT NOT NULL,
+        name VARCHAR(255) NOT NULL,
+        phone VARCHAR(32),
+        phone_e164 VARCHAR(16),
+        carrier VARCHAR(16),
+        products TEXT NOT NULL,
+        total_amount DECIMAL(12, 2) NOT NULL,
+        remaining_balance DECIMAL(12, 2) NOT NULL,
+        due_date DATE,
+        status VARCHAR(16),
+        days_overdue INT,
+        paid_at TIMESTAMP NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (admin_id) REFERENCES admins (id) ON DELETE CASCADE,
+        INDEX idx_clients_admin_due (admin_id, due_date),
+        INDEX idx_clients_admin_created (admin_id, created_at),
+        INDEX idx_clients_admin_status (admin_id, status, due_date),
+        INDEX idx_clients_admin_name (admin_id, name),
+        INDEX idx_clients_admin_summary (admin_id, remaining_balance, due_date, total_amount),
+        INDEX idx_clients_admin_paid_at (admin_id, paid_at),
+        INDEX idx_clients_phone_e164 (phone_e164, carrier)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4''',
+    '''CREATE TABLE IF NOT EXISTS sms_reminders (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        client_id INT NOT NULL,
+        method VARCHAR(32) NOT NULL DEFAULT 'email_gateway',
+        sent_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (client_id) REFERENCES clients (id) ON DELETE CASCADE,
+        INDEX idx_sms_reminders_client_sent (client_id, sent_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4''',
+    '''CREATE TABLE IF NOT EXISTS notification_ledger (
+        client_id INT NOT NULL,
+        status VARCHAR(16) NOT NULL,
+        due_date DATE NOT NULL,
+        admin_id INT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (client_id, status, due_date),
+        INDEX idx_notification_ledger_admin_due (admin_id, due_date)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4''',
+]
+
+# Columns added after a table first shipped, applied by create_schema() to
+# existing databases: (table, column to look for, ALTER TABLE clause)
+MYSQL_ADDED_COLUMNS = [
+    ('clients', 'phone_e164', 'ADD COLUMN phone_e164 VARCHAR(16), ADD COLUMN carrier VARCHAR(16), '
+                              'ADD INDEX idx_clients_phone_e164 (phone_e164, carrier)'),
+    ('admins', 'notification_mode', "ADD COLUMN notification_mode VARCHAR(16) NOT NULL DEFAULT 'instant', "
+                                    'ADD COLUMN digest_sent_on DATE'),
+]
+
+class MySQLCursor:
+    """DB-API cursor wrapper returning plain dicts shaped like the SQLite rows"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.lastrowid = cursor.lastrowid
+        self.rowcount = cursor.rowcount
+
+    @staticmethod
+    def normalize(row):
+        for key, value in row.items():
+            if isinstance(value, datetime):
+                row[key] = value.strftime('%Y-%m-%d %H:%M:%S')
+            elif isinstance(value, date):
+                row[key] = value.isoformat()
+            elif isinstance(value, Decimal):
+                # SUM() over integers comes back as an exponent-0 Decimal
+                row[key] = int(value) if value.as_tuple().exponent == 0 else float(value)
+        return row
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        return self.normalize(row) if row is not None else None
+
+    def fetchall(self):
+        return [self.normalize(row) for row in self._cursor.fetchall()]
+
+class MySQLRepository(Repository):
+    """Repository over a pooled MySQL/MariaDB connection held for the request"""
+
+    # MySQL's default collations already compare names case-insensitively
+    sort_columns = {
+        'created_at': 'created_at',
+        'name': 'name',
+        'due_date': "IFNULL(due_date, '')",
+        'balance': 'remaining_balance'
+    }
+
+    insert_ignore = 'INSERT IGNORE'
+
+    # admin_id -> date its statuses were last recomputed in this process
+    _statuses_as_of = {}
+
+    def __init__(self):
+        self._conn = None
+
+    @staticmethod
+    def translate(sql):
+        """:name placeholders -> MySQLdb's %(name)s"""
+        return re.sub(r'(?<![:\w]):([A-Za-z_]\w*)', r'%(\1)s', sql.replace('%', '%%'))
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = get_mysql_pool().acquire()
+        return self._conn
+
+    def execute(self, sql, params=None):
+        cursor = self._connection().cursor(MySQLdb.cursors.DictCursor)
+        cursor.execute(self.translate(sql), params or {})
+        return MySQLCursor(cursor)
+
+    def iter_rows(self, sql, params, batch_size):
+        # SSDictCursor streams from the server instead of buffering the result
+        pool = get_mysql_pool()
+        conn = pool.acquire()
+        cursor = conn.cursor(MySQLdb.cursors.SSDictCursor)
+        try:
+            cursor.execute(self.translate(sql), params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [MySQLCursor.normalize(row) for row in rows]
+        finally:
+            cursor.close()
+            pool.release(conn)
+
+    def commit(self):
+        if self._conn is not None:
+            self._conn.commit()
+
+    def close(self):
+        if self._conn is not None:
+            get_mysql_pool().release(self._conn)
+            self._conn = None
+
+    @classmethod
+    def create_schema(cls):
+        repo = cls()
+        try:
+            for sql in MYSQL_SCHEMA:
+                repo._connection().cursor().execute(sql)
+            for table, column, alter in MYSQL_ADDED_COLUMNS:
+                if not repo.fetchone('''
+                    SELECT COUNT(*) AS count FROM information_schema.columns
+                    WHERE table_schema = DATABASE() AND table_name = :table AND column_name = :column
+                ''', {'table': table, 'column': column})['count']:
+                    repo._connection().cursor().execute(f'ALTER TABLE {table} {alter}')
+            repo.commit()
+        finally:
+            repo.close()
+
+    def refresh_statuses(self, admin_id=None, client_ids=None, today=None):
+        today = today or date.today()
+        params = {'today': today.strftime('%Y-%m-%d'), 'tomorrow': (today + timedelta(days=1)).strftime('%Y-%m-%d')}
+        conditions = []
+        if admin_id is not None:
+            conditions.append('admin_id = :admin_id')
+            params['admin_id'] = admin_id
+        if client_ids is not None:
+            if not client_ids:
+                return 0
+            conditions.append(f"id IN ({', '.join(f':id{i}' for i in range(len(client_ids)))})")
+            params.update({f'id{i}': client_id for i, client_id in enumerate(client_ids)})
+        return self.execute(f'''
+            UPDATE clients SET {MYSQL_STATUS_SET_SQL}
+            WHERE {' AND '.join(conditions) or '1'}
+            AND (status IS NULL OR status != 'paid' OR remaining_balance > 0)
+        ''', params).rowcount
+
+    def ensure_current_statuses(self, admin_id, today=None):
+        today = today or date.today()
+        if self._statuses_as_of.get(admin_id) != today:
+            self.refresh_statuses(admin_id=admin_id, today=today)
+            self.commit()
+            self._statuses_as_of[admin_id] = today
+
+    def client_summary(self, admin_id, today=None):
+        self.ensure_current_statuses(admin_id, today)
+        return get_client_summary(self, admin_id, today, archived=False)
+
+    def mark_paid(self, admin_id, client_id, method='cash'):
+        count = self.execute('''
+            UPDATE clients SET remaining_balance = 0
+            WHERE id = :id AND admin_id = :admin_id AND remaining_balance > 0
+        ''', {'id': client_id, 'admin_id': admin_id}).rowcount
+        if count == 0:
+            client = self.get_client(admin_id, client_id)
+            raise ValueError('Client not found' if client is None else 'Client has no remaining balance')
+        self.refresh_statuses(client_ids=[client_id])
+
+def get_repository(admin_id=None):
+    """Return the repository for an admin's data (default: the logged-in admin)"""
+    if admin_id is None and has_request_context():
+        admin_id = session.get('admin_id')
+    repos = g.setdefault('repos', {})
+    if admin_id not in repos:
+        repos[admin_id] = MySQLRepository() if DB_BACKEND == 'mysql' else SQLiteRepository(admin_id)
+    return repos[admin_id]
+
+def sqlite_only(f):
+    """Refuse routes that depend on SQLite-only features when running on MySQL"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if DB_BACKEND != 'sqlite':
+            return jsonify({'success': False, 'message': 'This feature is not available with the MySQL backend yet'}), 501
+        return f(*args, **kwargs)
+    return decorated_function
 
 def init_db():
-    """Initialize the database with required tables"""
-    db = get_db()
-    
+    """Initialize the database (and every shard) with required tables"""
+    if DB_BACKEND == 'mysql':
+        if AUTO_MIGRATE:
+            MySQLRepository.create_schema()
+        return
+
+    if DB_SHARDS:
+        os.makedirs(DB_SHARD_DIR, exist_ok=True)
+    for database in all_databases():
+        create_base_tables(_pooled_db(database))
+
+def create_base_tables(db):
+    """Create the original tables, then apply migrations if AUTO_MIGRATE is on"""
     # Create admins table
     db.execute('''
         CREATE TABLE IF NOT EXISTS admins (
@@ -85,15 +920,431 @@ def init_db():
     
     db.commit()
 
-@app.before_request
-def before_request():
-    """Initialize database connection before each request"""
-    get_db()
+    if AUTO_MIGRATE:
+        run_migrations(db)
+
+# Versioned schema migrations
+#
+# Each entry is (version, name, steps). A step is either a SQL string or a
+# callable taking the connection. Versions are applied in order, once, and
+# recorded in schema_migrations. Never edit an applied migration; add a new one.
+# Prefer literal SQL for data backfills: a callable runs today's code against
+# the schema as it was at that version.
+MIGRATIONS = [
+    (1, 'clients hot-path indexes', [
+        # /dashboard due list, /check_due_payments, /get_notification_stats,
+        # /check_sms_eligible_clients and the instant notification scan
+        '''CREATE INDEX IF NOT EXISTS idx_clients_admin_due_active
+           ON clients (admin_id, due_date) WHERE remaining_balance > 0''',
+        # /clients listing order and per-admin COUNT/SUM
+        '''CREATE INDEX IF NOT EXISTS idx_clients_admin_created
+           ON clients (admin_id, created_at)''',
+    ]),
+    (2, 'sms_reminders history index', [
+        '''CREATE INDEX IF NOT EXISTS idx_sms_reminders_client_sent
+           ON sms_reminders (client_id, sent_at)''',
+    ]),
+    (3, 'covering index for per-admin summary aggregate', [
+        '''CREATE INDEX IF NOT EXISTS idx_clients_admin_summary
+           ON clients (admin_id, remaining_balance, due_date, total_amount)''',
+    ]),
+    (4, 'trigger-maintained admin_summary', [
+        lambda db: create_admin_summary_schema(db),
+        '''INSERT OR REPLACE INTO admin_summary
+               (admin_id, as_of_date, total_clients, total_debt, total_outstanding, paid_count,
+                pending_count, overdue_count, due_today_count, due_tomorrow_count)
+           SELECT a.id, date('now', 'localtime'), COUNT(c.id),
+                  COALESCE(SUM(c.total_amount), 0), COALESCE(SUM(c.remaining_balance), 0),
+                  COALESCE(SUM(CASE WHEN c.remaining_balance <= 0 THEN 1 ELSE 0 END), 0),
+                  COALESCE(SUM(CASE WHEN c.remaining_balance > 0
+                               AND NOT COALESCE(date(c.due_date) < date('now', 'localtime'), 0) THEN 1 ELSE 0 END), 0),
+                  COALESCE(SUM(CASE WHEN c.remaining_balance > 0
+                               AND date(c.due_date) < date('now', 'localtime') THEN 1 ELSE 0 END), 0),
+                  COALESCE(SUM(CASE WHEN c.remaining_balance > 0
+                               AND date(c.due_date) = date('now', 'localtime') THEN 1 ELSE 0 END), 0),
+                  COALESCE(SUM(CASE WHEN c.remaining_balance > 0
+                               AND date(c.due_date) = date('now', 'localtime', '+1 day') THEN 1 ELSE 0 END), 0)
+           FROM admins a LEFT JOIN clients c ON c.admin_id = a.id
+           GROUP BY a.id''',
+    ]),
+    (5, 'canonical due dates and materialized client status', [
+        # Unparseable legacy values are moved here rather than lost
+        'ALTER TABLE clients ADD COLUMN due_date_raw TEXT',
+        lambda db: normalize_stored_due_dates(db),
+        'ALTER TABLE clients ADD COLUMN status TEXT',
+        'ALTER TABLE clients ADD COLUMN days_overdue INTEGER',
+        '''UPDATE clients SET
+               status = CASE
+                   WHEN remaining_balance <= 0 THEN 'paid'
+                   WHEN due_date IS NULL THEN 'pending'
+                   WHEN due_date < date('now', 'localtime') THEN 'overdue'
+                   WHEN due_date = date('now', 'localtime') THEN 'due_today'
+                   WHEN due_date = date('now', 'localtime', '+1 day') THEN 'due_tomorrow'
+                   ELSE 'pending'
+               END,
+               days_overdue = CASE
+                   WHEN remaining_balance <= 0 THEN NULL
+                   ELSE CAST(julianday(date('now', 'localtime')) - julianday(due_date) AS INTEGER)
+               END''',
+        '''CREATE INDEX IF NOT EXISTS idx_clients_admin_status
+           ON clients (admin_id, status, due_date)''',
+    ]),
+    (6, 'keyset pagination sort indexes', [
+        # The implicit rowid tail of each index doubles as the id tiebreaker
+        '''CREATE INDEX IF NOT EXISTS idx_clients_admin_name
+           ON clients (admin_id, name COLLATE NOCASE)''',
+        '''CREATE INDEX IF NOT EXISTS idx_clients_admin_due_sort
+           ON clients (admin_id, IFNULL(due_date, ''))''',
+        # The balance sort uses idx_clients_admin_summary (migration 3)
+    ]),
+    (7, 'full-text client search', [
+        lambda db: create_client_search_schema(db),
+        lambda db: rebuild_client_search_index(db),
+    ]),
+    (8, 'payments ledger and paid_at', [
+        '''CREATE TABLE IF NOT EXISTS payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER NOT NULL,
+            admin_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            method TEXT NOT NULL DEFAULT 'cash',
+            balance_after REAL NOT NULL,
+            note TEXT,
+            paid_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (client_id) REFERENCES clients (id) ON DELETE CASCADE
+        )''',
+        # Per-client history and per-admin collection reports
+        '''CREATE INDEX IF NOT EXISTS idx_payments_client_paid
+           ON payments (client_id, paid_at)''',
+        '''CREATE INDEX IF NOT EXISTS idx_payments_admin_paid
+           ON payments (admin_id, paid_at, amount)''',
+        'ALTER TABLE clients ADD COLUMN paid_at TIMESTAMP',
+        # No record of when existing settled clients paid; created_at is the best available stand-in
+        'UPDATE clients SET paid_at = created_at WHERE remaining_balance <= 0',
+        # paid_at follows the balance on every write path, including bulk and import
+        '''CREATE TRIGGER IF NOT EXISTS clients_paid_at_insert
+           AFTER INSERT ON clients WHEN NEW.remaining_balance <= 0 BEGIN
+               UPDATE clients SET paid_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS clients_paid_at_update
+           AFTER UPDATE OF remaining_balance ON clients
+           WHEN (OLD.remaining_balance <= 0) != (NEW.remaining_balance <= 0) BEGIN
+               UPDATE clients SET paid_at = CASE WHEN NEW.remaining_balance <= 0 THEN CURRENT_TIMESTAMP END
+               WHERE id = NEW.id;
+           END''',
+        # /get_recent_paid_clients top-N
+        '''CREATE INDEX IF NOT EXISTS idx_clients_admin_paid_at
+           ON clients (admin_id, paid_at) WHERE remaining_balance <= 0''',
+    ]),
+    (9, 'archive tables for long-settled clients', [
+        lambda db: create_archive_schema(db),
+    ]),
+    (10, 'outbox and jobs for background sends', [
+        '''CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            total INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP,
+            FOREIGN KEY (admin_id) REFERENCES admins (id) ON DELETE CASCADE
+        )''',
+        # status: pending -> sending (leased until next_attempt_at) -> sent | failed
+        '''CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id INTEGER NOT NULL,
+            admin_id INTEGER NOT NULL,
+            client_id INTEGER NOT NULL,
+            recipient TEXT NOT NULL,
+            message TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP,
+            FOREIGN KEY (job_id) REFERENCES jobs (id) ON DELETE CASCADE
+        )''',
+        # Worker claims: only unfinished rows are indexed
+        '''CREATE INDEX IF NOT EXISTS idx_outbox_due
+           ON outbox (next_attempt_at) WHERE status IN ('pending', 'sending')''',
+        # /jobs/<id> progress counts
+        '''CREATE INDEX IF NOT EXISTS idx_outbox_job_status
+           ON outbox (job_id, status)''',
+    ]),
+    (11, 'per-number SMS gateway memo', [
+        # Keyed by the 10-digit 9xxxxxxxxx number; only the directory database's copy is used
+        '''CREATE TABLE IF NOT EXISTS gateway_memo (
+            phone TEXT PRIMARY KEY,
+            gateway TEXT,
+            last_success_at TIMESTAMP,
+            failures INTEGER NOT NULL DEFAULT 0,
+            last_failure_at TIMESTAMP,
+            bad_until TIMESTAMP
+        ) WITHOUT ROWID''',
+    ]),
+    (12, 'normalized phone and carrier columns', [
+        # Filled on every write; `flask backfill-phones` fills existing rows
+        'ALTER TABLE clients ADD COLUMN phone_e164 TEXT',
+        'ALTER TABLE clients ADD COLUMN carrier TEXT',
+        '''CREATE INDEX IF NOT EXISTS idx_clients_phone_e164
+           ON clients (phone_e164, carrier) WHERE phone_e164 IS NOT NULL''',
+        'ALTER TABLE outbox ADD COLUMN carrier TEXT',
+    ]),
+    (13, 'notification ledger', [
+        # One row per automatic alert sent; the primary key is the send claim
+        '''CREATE TABLE IF NOT EXISTS notification_ledger (
+            client_id INTEGER NOT NULL,
+            status TEXT NOT NULL,
+            due_date DATE NOT NULL,
+            admin_id INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (client_id, status, due_date)
+        ) WITHOUT ROWID''',
+        '''CREATE INDEX IF NOT EXISTS idx_notification_ledger_admin_due
+           ON notification_ledger (admin_id, due_date)''',
+    ]),
+    (14, 'per-admin notification mode and digest date', [
+        # 'instant' (one alert per transition) or 'digest' (one email per day)
+        "ALTER TABLE admins ADD COLUMN notification_mode TEXT NOT NULL DEFAULT 'instant'",
+        'ALTER TABLE admins ADD COLUMN digest_sent_on DATE',
+    ]),
+]
+
+def run_migrations(db):
+    """Apply any pending migrations and return the list of versions applied"""
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    db.commit()
+
+    applied = []
+    for version, name, steps in MIGRATIONS:
+        # BEGIN IMMEDIATE takes the write lock, so concurrent workers starting
+        # together serialize here and the loser sees the version as applied.
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            cursor = db.execute('SELECT 1 FROM schema_migrations WHERE version = ?', (version,))
+            if cursor.fetchone():
+                db.rollback()
+                continue
+
+            for step in steps:
+                if callable(step):
+                    step(db)
+                else:
+                    db.execute(step)
+
+            db.execute('INSERT INTO schema_migrations (version, name) VALUES (?, ?)', (version, name))
+            db.commit()
+            applied.append(version)
+            print(f"Applied migration {version}: {name}")
+        except Exception:
+            db.rollback()
+            raise
+
+    return applied
+
+def get_schema_version(db):
+    """Return the highest applied migration version (0 if none)"""
+    cursor = db.execute('SELECT MAX(version) AS version FROM schema_migrations')
+    row = cursor.fetchone()
+    return row['version'] or 0
+
+# Queries that must be served by an index. check_hot_query_plans() runs
+# EXPLAIN QUERY PLAN on each one and reports any full table scan.
+HOT_QUERIES = [
+    ('dashboard_due_clients', '''
+        SELECT * FROM clients
+        WHERE admin_id = ? AND due_date IN (?, ?, ?) AND remaining_balance > 0
+        ORDER BY due_date
+    ''', (1, '2000-01-01', '2000-01-02', '2000-01-03')),
+    ('dashboard_total_clients', '''
+        SELECT COUNT(*) as total_clients FROM clients WHERE admin_id = ?
+    ''', (1,)),
+    ('clients_listing', '''
+        SELECT * FROM clients WHERE admin_id = ? ORDER BY created_at DESC
+    ''', (1,)),
+    ('notification_stats_overdue', '''
+        SELECT COUNT(*) as count FROM clients
+        WHERE admin_id = ? AND due_date < ? AND remaining_balance > 0
+    ''', (1, '2000-01-01')),
+    ('notification_stats_week', '''
+        SELECT COUNT(*) as count FROM clients
+        WHERE admin_id = ? AND due_date >= ? AND due_date <= ? AND remaining_balance > 0
+    ''', (1, '2000-01-01', '2000-01-08')),
+    ('sms_eligible_clients', '''
+        SELECT COUNT(*) as count FROM clients
+        WHERE admin_id = ?
+        AND phone IS NOT NULL
+        AND phone != ''
+        AND remaining_balance > 0
+    ''', (1,)),
+    ('recent_paid_clients', '''
+        SELECT * FROM clients
+        WHERE admin_id = ? AND remaining_balance <= 0
+        ORDER BY paid_at DESC
+        LIMIT 5
+    ''', (1,)),
+    ('client_last_reminder', '''
+        SELECT sent_at FROM sms_reminders
+        WHERE client_id = ?
+        ORDER BY sent_at DESC
+        LIMIT 1
+    ''', (1,)),
+]
+
+# An FTS5 "SCAN ... VIRTUAL TABLE INDEX n:M..." is a MATCH lookup, not a scan
+FTS_MATCH_PLAN = re.compile(r'VIRTUAL TABLE INDEX \d+:\S*M')
+
+def check_hot_query_plans(db):
+    """Return a list of (query name, plan detail) for hot queries that scan a table"""
+    problems = []
+    for name, sql, params in HOT_QUERIES:
+        cursor = db.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        for row in cursor.fetchall():
+            detail = row['detail']
+            if not detail.startswith('SCAN ') or detail.startswith('SCAN CONSTANT ROW'):
+                continue
+            if FTS_MATCH_PLAN.search(detail):
+                continue
+            problems.append((name, detail))
+    return problems
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Apply pending schema migrations (run once per deploy)"""
+    if DB_BACKEND == 'mysql':
+        MySQLRepository.create_schema()
+        print(f"MySQL schema ready on {MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DATABASE}")
+        return
+    for database in all_databases():
+        db = _pooled_db(database)
+        applied = run_migrations(db)
+        print(f"{database}: schema at version {get_schema_version(db)} ({len(applied)} migration(s) applied)")
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if any hot query falls back to a full table scan"""
+    if DB_BACKEND != 'sqlite':
+        sys.exit('check-query-plans only supports the SQLite backend')
+    db = get_db()
+    problems = check_hot_query_plans(db)
+    for name, detail in problems:
+        print(f"FAIL {name}: {detail}")
+    if problems:
+        sys.exit(1)
+    print(f"OK: {len(HOT_QUERIES)} hot queries use indexes")
+
+# Tenant shards
+#
+# A shard has the full schema but only holds some admins' clients,
+# sms_reminders and payments; the directory database keeps the admins table.
+# Each shard carries a mirror of its admins' rows so foreign keys and the
+# admin_summary triggers work unchanged inside the shard.
+ADMIN_COLUMNS = ('id', 'username', 'email', 'password', 'created_at')
+
+# table -> condition selecting one admin's rows in the attached source database,
+# parents before the tables referencing them
+SHARD_TABLES = [
+    ('clients', 'admin_id = :admin_id'),
+    ('sms_reminders', 'client_id IN (SELECT id FROM source.clients WHERE admin_id = :admin_id)'),
+    ('payments', 'admin_id = :admin_id'),
+    ('archived_clients', 'admin_id = :admin_id'),
+    ('archived_sms_reminders', 'client_id IN (SELECT id FROM source.archived_clients WHERE admin_id = :admin_id)'),
+    ('archived_payments', 'admin_id = :admin_id'),
+    ('jobs', 'admin_id = :admin_id'),
+    ('outbox', 'admin_id = :admin_id'),
+    ('notification_ledger', 'admin_id = :admin_id'),
+]
+
+# Top-level per-admin tables; deleting an admin's rows here cascades to the rest
+SHARD_PURGE_TABLES = ('clients', 'archived_clients', 'jobs', 'notification_ledger')
+
+def mirror_admin(admin):
+    """Copy an admin's directory row into its shard (caller commits)"""
+    get_db(admin['id']).execute(f'''
+        INSERT OR IGNORE INTO admins ({', '.join(ADMIN_COLUMNS)}) VALUES ({', '.join('?' for _ in ADMIN_COLUMNS)})
+    ''', tuple(admin[column] for column in ADMIN_COLUMNS))
+
+def _table_columns(db, table, schema='main'):
+    return [row['name'] for row in db.execute(f'PRAGMA {schema}.table_info({table})').fetchall()]
+
+def copy_admin_to_shard(admin, source=None):
+    """Copy one admin's rows from the source database into its shard.
+
+    Returns the number of rows copied per table, or None if the shard already
+    holds rows for the admin (so re-running a split is safe). Unsent outbox
+    messages move rather than copy, so no worker sends them twice.
+    """
+    source = source or DATABASE
+    shard = get_db(admin['id'])
+    shard.execute('ATTACH DATABASE ? AS source', (source,))
+    try:
+        shard.execute('BEGIN IMMEDIATE')
+        try:
+            mirror_admin(admin)
+            if any(shard.execute(f'SELECT 1 FROM {table} WHERE admin_id = ? LIMIT 1', (admin['id'],)).fetchone()
+                   for table in SHARD_PURGE_TABLES):
+                shard.rollback()
+                return None
+            copied = {}
+            for table, condition in SHARD_TABLES:
+                source_columns = set(_table_columns(shard, table, 'source'))
+                columns = ', '.join(column for column in _table_columns(shard, table) if column in source_columns)
+                copied[table] = shard.execute(f'''
+                    INSERT INTO main.{table} ({columns}) SELECT {columns} FROM source.{table} WHERE {condition}
+                ''', {'admin_id': admin['id']}).rowcount if columns else 0
+            # The insert trigger stamps settled clients with the copy time; keep the original
+            shard.execute('''
+                UPDATE main.clients SET paid_at = (SELECT s.paid_at FROM source.clients s WHERE s.id = clients.id)
+                WHERE admin_id = ? AND remaining_balance <= 0
+            ''', (admin['id'],))
+            shard.execute('''
+                DELETE FROM source.outbox WHERE admin_id = ? AND status IN ('pending', 'sending')
+            ''', (admin['id'],))
+            roll_over_admin_summary(shard, admin['id'])
+            shard.commit()
+        except Exception:
+            shard.rollback()
+            raise
+    finally:
+        shard.execute('DETACH DATABASE source')
+    return copied
+
+@app.cli.command('split-shards')
+@click.option('--purge', is_flag=True, help='Delete each admin\'s clients from the directory database once copied.')
+def split_shards_command(purge):
+    """Copy every admin's clients (live and archived), their history, jobs and alert ledger into its shard"""
+    if DB_BACKEND != 'sqlite' or not DB_SHARDS:
+        sys.exit('Set DB_SHARDS (SQLite backend) to the number of shards first')
+    directory = get_directory_db()
+    for admin in directory.execute('SELECT * FROM admins ORDER BY id').fetchall():
+        copied = copy_admin_to_shard(admin)
+        if copied is None:
+            print(f"admin {admin['id']}: already in {shard_database(admin['id'])}, skipped")
+        else:
+            counts = ', '.join(f'{count} {table}' for table, count in copied.items())
+            print(f"admin {admin['id']} -> {shard_database(admin['id'])}: {counts}")
+        if purge:
+            # Reminders, payments and outbox rows go with their parents (ON DELETE CASCADE)
+            for table in SHARD_PURGE_TABLES:
+                directory.execute(f'DELETE FROM {table} WHERE admin_id = ?', (admin['id'],))
+            directory.commit()
 
+# Connections are opened lazily by get_db(), so static and login pages
+# never touch the pool.
 @app.teardown_appcontext
 def close_db_connection(exception):
-    """Close database connection after each request"""
+    """Return database connection to the pool after each request"""
+    for repo in g.pop('repos', {}).values():
+        repo.close()
     close_db()
+    write_buffer.flush()
 
 @app.context_processor
 def inject_date():
@@ -110,20 +1361,329 @@ def login_required(f):
 def generate_otp():
     return ''.join(random.choices(string.digits, k=6))
 
-def send_email_brevo(to_email, subject, html_content):
-    """Send email using Brevo API - optimized for SMS gateways"""
-    if not BREVO_API_KEY:
-        print("ERROR: BREVO_API_KEY is not set!")
-        return False
-    
-    print(f"Attempting to send email to: {to_email}")
-    
-    headers = {
-        'accept': 'application/json',
-        'api-key': BREVO_API_KEY,
-        'content-type': 'application/json'
-    }
-    
+def parse_rate_limits(spec):
+    """{name: (per_second, burst)} from a RATE_LIMITS string"""
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, value = entry.partition('=')
+        rate, _, burst = value.partition('/')
+        rate = float(rate)
+        limits[name.strip()] = (rate, float(burst) if burst else max(rate, 1.0))
+    return limits
+
+class RateLimitExceeded(Exception):
+    """Raised when tokens would not be available within the allowed wait"""
+
+class RateLimiter:
+    """Token buckets kept in a SQLite table, so every thread and every process
+    sending from this host draws from the same budget.
+
+    Each bucket refills at its per-second rate up to its burst size. A request
+    larger than the burst is let through once the bucket is full and leaves it
+    in debt, so later callers wait out the overdraft.
+    """
+
+    SCHEMA_SQL = '''
+        CREATE TABLE IF NOT EXISTS rate_buckets (
+            name TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+    '''
+
+    def __init__(self, database=None, limits=None, max_wait=RATE_LIMIT_MAX_WAIT):
+        self.database = database or RATE_LIMIT_DATABASE
+        self.limits = parse_rate_limits(RATE_LIMITS) if limits is None else limits
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._schema_ready = False
+        self._stats = {'acquired': 0, 'waited': 0, 'wait_time_ms': 0.0, 'max_wait_ms': 0.0, 'exceeded': 0}
+
+    def limit_for(self, name):
+        """(per_second, burst) for a bucket, or None when it is unlimited"""
+        limit = self.limits.get(name)
+        if limit is None and name.startswith('gateway:'):
+            limit = self.limits.get(name[len('gateway:'):], self.limits.get('gateway'))
+        return limit if limit and limit[0] > 0 else None
+
+    def _take(self, db, costs, now):
+        """Deduct every cost in one transaction; returns seconds to wait (0 when taken)"""
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            wait_for = 0.0
+            buckets = {}
+            for name, tokens in costs.items():
+                rate, burst = self.limit_for(name)
+                row = db.execute('SELECT tokens, updated_at FROM rate_buckets WHERE name = ?', (name,)).fetchone()
+                available = burst if row is None else min(burst, row['tokens'] + max(now - row['updated_at'], 0) * rate)
+                needed = min(tokens, burst)
+                if available < needed:
+                    wait_for = max(wait_for, (needed - available) / rate)
+                buckets[name] = available - tokens
+            if wait_for:
+                db.rollback()
+                return wait_for
+            db.executemany('INSERT OR REPLACE INTO rate_buckets (name, tokens, updated_at) VALUES (?, ?, ?)',
+                           [(name, tokens, now) for name, tokens in buckets.items()])
+            db.commit()
+            return 0.0
+        except Exception:
+            db.rollback()
+            raise
+
+    def acquire(self, costs):
+        """Block until every bucket in {name: tokens} can pay, then take them all at once
+
+        Raises RateLimitExceeded if that would take longer than max_wait.
+        """
+        costs = {name: tokens for name, tokens in costs.items() if tokens > 0 and self.limit_for(name)}
+        if not costs:
+            return 0.0
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            schema_ready = self._schema_ready
+        pool = get_pool(self.database)
+        started = time.time()
+        waited = 0.0
+        while True:
+            db = pool.acquire()
+            try:
+                if not schema_ready:
+                    # Not in MIGRATIONS: the bucket file may be separate from the app data
+                    db.execute(self.SCHEMA_SQL)
+                    db.commit()
+                    schema_ready = True
+                    with self._lock:
+                        self._schema_ready = True
+                now = time.time()
+                wait_for = self._take(db, costs, now)
+            finally:
+                pool.release(db)
+            if not wait_for:
+                break
+            waited = now - started
+            if waited + wait_for > self.max_wait:
+                with self._lock:
+                    self._stats['exceeded'] += 1
+                raise RateLimitExceeded(f"Rate limit for {', '.join(costs)} would need a {waited + wait_for:.1f}s wait")
+            time.sleep(wait_for)
+            waited = time.time() - started
+        with self._lock:
+            self._stats['acquired'] += 1
+            if waited:
+                self._stats['waited'] += 1
+                self._stats['wait_time_ms'] += waited * 1000
+                self._stats['max_wait_ms'] = max(self._stats['max_wait_ms'], waited * 1000)
+        return waited
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['wait_time_ms'] = round(stats['wait_time_ms'], 3)
+        stats['max_wait_ms'] = round(stats['max_wait_ms'], 3)
+        stats['database'] = self.database
+        stats['limits'] = {name: {'per_second': rate, 'burst': burst} for name, (rate, burst) in self.limits.items()}
+        return stats
+
+rate_limiter = RateLimiter()
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Brevo while the circuit breaker is open"""
+
+class BrevoOutcomeUnknown(Exception):
+    """Raised when a request reached Brevo but no reply came back (read
+    timeout, broken response): the message may or may not have been sent"""
+
+class BrevoClient:
+    """Keep-alive HTTP client for the Brevo transactional email API.
+
+    Retries 429 and 5xx responses and failed connections with capped
+    exponential backoff, honoring Retry-After. A request that got no reply is
+    never repeated, since Brevo may already have accepted it. Every attempt first draws from
+    the shared rate limiter. After BREAKER_THRESHOLD
+    consecutive failed calls the breaker opens and sends fail fast for
+    BREAKER_COOLDOWN seconds; the next call after that is a single probe.
+    """
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, api_url=None, api_key=None, pool_size=BREVO_POOL_SIZE,
+                 timeout=(BREVO_CONNECT_TIMEOUT, BREVO_READ_TIMEOUT), max_retries=BREVO_MAX_RETRIES,
+                 backoff=BREVO_BACKOFF_SECONDS, max_wait=BREVO_MAX_RETRY_WAIT,
+                 breaker_threshold=BREVO_BREAKER_THRESHOLD, breaker_cooldown=BREVO_BREAKER_COOLDOWN,
+                 limiter=None):
+        self.api_url = api_url or BREVO_API_URL
+        self.limiter = limiter or rate_limiter
+        self.api_key = api_key or BREVO_API_KEY
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._session = requests.Session()  # sockets are never shared with a forked child
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._session.headers.update({
+            'accept': 'application/json',
+            'api-key': self.api_key or '',
+            'content-type': 'application/json'
+        })
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self._latencies = deque(maxlen=500)
+        self._stats = {'sent': 0, 'rejected': 0, 'errors': 0, 'retries': 0, 'short_circuited': 0}
+
+    def _session_for_process(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            return self._session
+
+    def _allow(self):
+        """Breaker check: True if a call may go out now"""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.breaker_cooldown:
+                self._stats['short_circuited'] += 1
+                return False
+            self._probing = True  # half-open: let exactly one call through
+            return True
+
+    def _release_probe(self):
+        """Give up a half-open probe slot without recording an outcome"""
+        with self._lock:
+            self._probing = False
+
+    def _record(self, outcome, started, api_failure):
+        with self._lock:
+            self._stats[outcome] += 1
+            self._latencies.append((time.monotonic() - started) * 1000)
+            self._probing = False
+            if not api_failure:
+                self._failures = 0
+                self._opened_at = None
+                return
+            self._failures += 1
+            if self._opened_at is not None or self._failures >= self.breaker_threshold:
+                if self._opened_at is None:
+                    print(f"Brevo circuit breaker opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+
+    def _retry_delay(self, response, attempt):
+        """Seconds to wait before the next attempt (None: do not retry)"""
+        delay = self.backoff * 2 ** attempt
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                delay = float(retry_after)
+            except ValueError:
+                try:
+                    delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                except (TypeError, ValueError):
+                    pass
+        delay = max(delay, 0)
+        return delay if delay <= self.max_wait else None
+
+    def post(self, payload, max_retries=None):
+        """POST one request to the send endpoint; returns the final Response
+
+        max_retries overrides the client's setting for this call (0: one attempt).
+
+        Raises CircuitOpenError when the breaker is open, RateLimitExceeded
+        when the send would wait too long for its tokens,
+        requests.ConnectionError when every attempt failed to connect and
+        BrevoOutcomeUnknown when a sent request got no reply.
+        """
+        if not self._allow():
+            raise CircuitOpenError('Brevo API unavailable (circuit open)')
+        try:
+            # After the breaker check, so fail-fast calls spend no quota
+            self.limiter.acquire(brevo_rate_costs(payload))
+        except Exception:
+            self._release_probe()
+            raise
+        session = self._session_for_process()
+        max_retries = self.max_retries if max_retries is None else max_retries
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            response = error = None
+            try:
+                response = session.post(self.api_url, json=payload, timeout=self.timeout)
+            except requests.ConnectionError as e:
+                error = e  # includes ConnectTimeout: nothing reached Brevo, so retrying is safe
+            except requests.RequestException as e:
+                self._record('errors', started, api_failure=True)
+                raise BrevoOutcomeUnknown(f'No reply from Brevo: {e}') from e
+            except Exception:
+                self._record('errors', started, api_failure=False)  # a bug on our side; frees the probe slot
+                raise
+            retryable = error is not None or response.status_code in self.RETRY_STATUSES
+            if not retryable:
+                break
+            delay = self._retry_delay(response, attempt) if attempt < max_retries else None
+            if delay is None:
+                break
+            try:
+                # A retry is another API request, but the recipients were already counted
+                waited = self.limiter.acquire({'brevo': 1})
+            except RateLimitExceeded:
+                break
+            delay = max(delay - waited, 0)
+            attempt += 1
+            with self._lock:
+                self._stats['retries'] += 1
+            print(f"Brevo {'error: ' + str(error) if error else 'HTTP ' + str(response.status_code)}, "
+                  f"retry {attempt}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+        if error is not None:
+            self._record('errors', started, api_failure=True)
+            raise error
+        if response.ok:
+            self._record('sent', started, api_failure=False)
+        else:
+            # 4xx other than 429 is our request's fault, not an outage
+            self._record('errors' if retryable else 'rejected', started, api_failure=retryable)
+        return response
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            if self._opened_at is None:
+                state = 'closed'
+            elif self._probing or time.monotonic() - self._opened_at >= self.breaker_cooldown:
+                state = 'half_open'
+            else:
+                state = 'open'
+            stats = dict(self._stats, circuit=state, consecutive_failures=self._failures)
+        stats['calls'] = stats['sent'] + stats['rejected'] + stats['errors']
+        stats['latency_ms'] = {
+            'avg': round(sum(latencies) / len(latencies), 1) if latencies else None,
+            'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1) if latencies else None,
+            'max': round(latencies[-1], 1) if latencies else None,
+        }
+        return stats
+
+brevo = BrevoClient()
+
+def build_brevo_payload(to_email, subject, html_content):
+    """Request body for one email; SMS gateways get a plain-text version"""
     # For SMS gateways, use plain text and minimal formatting
     is_sms_gateway = any(domain in to_email.lower() for domain in ['sms.', '.sms.', 'txt.', 'sun.com.ph'])
     
@@ -141,122 +1701,271 @@ def send_email_brevo(to_email, subject, html_content):
     # For SMS gateways, also add textContent
     if is_sms_gateway:
         data['textContent'] = html_content.replace('<br>', '\n').replace('<BR>', '\n')
+    return data
+
+def brevo_rate_costs(payload):
+    """Rate limiter tokens for one API request: one 'brevo' token plus one
+    'gateway:<domain>' token per recipient at an SMS gateway"""
+    costs = {'brevo': 1}
+    recipients = [to for version in payload.get('messageVersions') or [payload] for to in version['to']]
+    for recipient in recipients:
+        domain = recipient['email'].rpartition('@')[2].lower()
+        if domain in SMS_GATEWAY_DOMAIN_SET:
+            costs['gateway:' + domain] = costs.get('gateway:' + domain, 0) + 1
+    return costs
+
+def send_email_brevo(to_email, subject, html_content):
+    """Send email using Brevo API - optimized for SMS gateways"""
+    if not BREVO_API_KEY:
+        print("ERROR: BREVO_API_KEY is not set!")
+        return False
     
     try:
-        print("Sending request to Brevo API...")
-        print(f"Request data: {data}")
-        
-        response = requests.post(BREVO_API_URL, headers=headers, json=data)
-        print(f"Email API response status: {response.status_code}")
-        print(f"Email API response body: {response.text}")
+        response = brevo.post(build_brevo_payload(to_email, subject, html_content))
         
         if response.status_code == 201:
             print("Email sent successfully!")
             return True
         else:
-            print(f"Email sending failed with status {response.status_code}")
-            print(f"Response: {response.text}")
+            print(f"Email sending failed with status {response.status_code}: {response.text[:200]}")
             return False
     except Exception as e:
         print(f"Email error: {e}")
         return False
+
+def send_email_brevo_batch(messages):
+    """Send many (to_email, subject, html_content) emails in as few API calls as possible
+
+    Emails sharing a sender go out BREVO_BATCH_SIZE at a time as messageVersions
+    of one request. Returns one bool per message, in order.
+    """
+    return [outcome == 'sent' for outcome in send_email_brevo_outcomes(messages)]
+
+def send_email_brevo_outcomes(messages, max_retries=None):
+    """Batched send returning 'sent', 'rejected' (Brevo refused that recipient),
+    'error' (the call itself failed; worth retrying later), 'deferred' (not
+    sent: breaker open or rate limited) or 'unknown' (no reply; Brevo may have
+    sent it, so do not retry) per message.
+    max_retries overrides the Brevo client's retry count."""
+    if not BREVO_API_KEY:
+        print("ERROR: BREVO_API_KEY is not set!")
+        return ['error'] * len(messages)
     
-# Improved phone number validation function
-def validate_phone_number(phone):
-    """Validate Philippine mobile phone numbers"""
-    if not phone:
-        return False
-    
-    # Remove all non-digits
-    clean_phone = ''.join(filter(str.isdigit, phone))
+    outcomes = ['error'] * len(messages)
+    groups = {}
+    for index, message in enumerate(messages):
+        payload = build_brevo_payload(*message)
+        groups.setdefault(payload['sender']['email'] + payload['sender']['name'], []).append((index, payload))
     
-    # Check if it's a valid Philippine mobile number
-    # Format: 09xxxxxxxxx (11 digits) or 639xxxxxxxxx (12 digits) or 9xxxxxxxxx (10 digits)
-    if len(clean_phone) == 11 and clean_phone.startswith('09'):
-        return True
-    elif len(clean_phone) == 12 and clean_phone.startswith('639'):
-        return True
-    elif len(clean_phone) == 10 and clean_phone.startswith('9'):
-        return True
+    for group in groups.values():
+        for start in range(0, len(group), BREVO_BATCH_SIZE):
+            _send_brevo_versions(group[start:start + BREVO_BATCH_SIZE], outcomes, max_retries)
     
-    return False
+    sent = outcomes.count('sent')
+    print(f"Batch email: {sent} sent, {len(messages) - sent} failed")
+    return outcomes
+
+# A 400 message naming a recipient or messageVersion, e.g. "email is not valid
+# in to" or "messageVersions[3].to[0].email is invalid"
+BREVO_RECIPIENT_ERROR = re.compile(
+    r'messageVersions|recipient|email address|\bin (to|cc|bcc)\b|\b(to|cc|bcc)(\[|\.| is\b)', re.IGNORECASE)
+
+def brevo_recipient_error(response):
+    """True if a 400 blames a recipient rather than the request as a whole"""
+    try:
+        message = str(response.json().get('message', ''))
+    except (ValueError, AttributeError):
+        return False
+    return 'sender' not in message.lower() and BREVO_RECIPIENT_ERROR.search(message) is not None
+
+def _send_brevo_versions(batch, outcomes, max_retries=None):
+    """POST one request for a batch of (index, payload) and record each message's outcome"""
+    if len(batch) == 1:
+        data = batch[0][1]
+    else:
+        # Versions override the first message's subject and content
+        content_keys = ('subject', 'htmlContent', 'textContent')
+        first = batch[0][1]
+        data = {'sender': first['sender']}
+        data.update({key: first[key] for key in content_keys if first.get(key) is not None})
+        data['messageVersions'] = [
+            dict({key: payload[key] for key in content_keys if payload.get(key) is not None}, to=payload['to'])
+            for index, payload in batch
+        ]
     
-def send_sms_via_email_gateway(phone, message, carrier):
-    """
-    Send SMS via email-to-SMS gateway for Philippine carriers.
-    """
-    # Clean phone number to digits only
-    clean_phone = ''.join(filter(str.isdigit, phone))
+    try:
+        response = brevo.post(data, max_retries)
+    except BrevoOutcomeUnknown as e:
+        print(f"Batch email outcome unknown ({len(batch)} messages): {e}")
+        for index, payload in batch:
+            outcomes[index] = 'unknown'
+        return
+    except (CircuitOpenError, RateLimitExceeded) as e:
+        print(f"Batch email deferred ({len(batch)} messages): {e}")
+        for index, payload in batch:
+            outcomes[index] = 'deferred'
+        return
+    except Exception as e:
+        print(f"Batch email error ({len(batch)} messages): {e}")
+        return
     
-    # Normalize to proper format
-    if len(clean_phone) == 11 and clean_phone.startswith('09'):
-        local_number = clean_phone[1:]  # Remove leading 0 -> 9xxxxxxxxx
-    elif len(clean_phone) == 12 and clean_phone.startswith('639'):
-        local_number = clean_phone[2:]  # Remove leading 63 -> 9xxxxxxxxx
-    elif len(clean_phone) == 10 and clean_phone.startswith('9'):
-        local_number = clean_phone  # Already correct -> 9xxxxxxxxx
+    if response.status_code == 201:
+        outcome = 'sent'
+    elif response.status_code == 400 and len(batch) > 1 and brevo_recipient_error(response):
+        # One bad recipient rejects the whole request: split it to find which.
+        # Any other 400 (sender, content, payload) would fail every half too.
+        middle = len(batch) // 2
+        _send_brevo_versions(batch[:middle], outcomes, max_retries)
+        _send_brevo_versions(batch[middle:], outcomes, max_retries)
+        return
     else:
-        print(f"Invalid phone number format: {phone}")
-        return False
+        print(f"Email sending failed with status {response.status_code}: {response.text[:200]}")
+        outcome = 'rejected' if 400 <= response.status_code < 500 and response.status_code != 429 else 'error'
+    for index, payload in batch:
+        outcomes[index] = outcome
+    
+# Mobile prefixes (first four digits of the 09xxxxxxxxx form) per carrier
+CARRIER_PREFIXES = {
+    'smart': ('0907', '0908', '0909', '0910', '0912', '0918', '0919', '0920', '0921', '0928',
+              '0929', '0939', '0947', '0949', '0992', '0993', '0994', '0998', '0999'),
+    'globe': ('0905', '0906', '0915', '0916', '0917', '0926', '0927', '0935', '0936', '0937',
+              '0945', '0953', '0954', '0955', '0956', '0965', '0966', '0967', '0975', '0976',
+              '0977', '0995', '0996', '0997'),
+    'sun': ('0922', '0923', '0924', '0925', '0931', '0932', '0933', '0934', '0940', '0941',
+            '0942', '0943', '0944', '0973', '0974'),
+}
+CARRIER_BY_PREFIX = {prefix: carrier for carrier, prefixes in CARRIER_PREFIXES.items() for prefix in prefixes}
 
-    print(f"Formatted phone number: {local_number}")
+def validate_phone_number(phone):
+    """Validate Philippine mobile phone numbers"""
+    # Format: 09xxxxxxxxx (11 digits) or 639xxxxxxxxx (12 digits) or 9xxxxxxxxx (10 digits)
+    return sms_local_number(phone) is not None
 
-    # Updated carrier email gateway mapping
-    carrier_gateways = {
-        'smart': f'{local_number}@sms.smart.com.ph',
-        'globe': f'{local_number}@sms.globe.com.ph',
-        'sun': f'{local_number}@sun.com.ph',
-        # Alternative gateways to try
-        'smart_alt': f'{local_number}@txt.smart.com.ph',
-        'globe_alt': f'{local_number}@myglobe.sms.ph'
-    }
+def normalize_phone(phone):
+    """E.164 form (+639xxxxxxxxx) of a Philippine mobile number, or None if invalid"""
+    local_number = sms_local_number(phone)
+    return '+63' + local_number if local_number else None
 
-    # Try primary gateway first
-    if carrier not in carrier_gateways:
-        print(f"Unknown carrier: {carrier}")
-        return False
+def phone_columns(phone):
+    """phone_e164 and carrier values stored alongside a client's phone"""
+    phone_e164 = normalize_phone(phone)
+    return {'phone_e164': phone_e164, 'carrier': detect_carrier(phone_e164) if phone_e164 else None}
 
-    to_email = carrier_gateways[carrier]
-    print(f"Sending SMS via email gateway: {to_email}")
+# Email-to-SMS gateway domains per carrier, primary first
+SMS_GATEWAY_DOMAINS = {
+    'smart': ('sms.smart.com.ph', 'txt.smart.com.ph'),
+    'globe': ('sms.globe.com.ph', 'myglobe.sms.ph'),
+    'sun': ('sun.com.ph',),
+}
+SMS_GATEWAY_DOMAIN_SET = {domain for domains in SMS_GATEWAY_DOMAINS.values() for domain in domains}
 
-    # Keep SMS message short (160 characters max)
-    if len(message) > 160:
-        message = message[:157] + "..."
-    
-    # Simple text subject and content for SMS gateways
-    subject = ""  # Some SMS gateways work better with empty subject
-    html_content = message  # Plain text, no HTML formatting
+# Rolling per-gateway health, used to order fallbacks and skip failing gateways
+GATEWAY_HEALTH_WINDOW = int(os.getenv('GATEWAY_HEALTH_WINDOW', '50'))  # recent sends scored per gateway
+GATEWAY_TRIP_AFTER = int(os.getenv('GATEWAY_TRIP_AFTER', '5'))  # consecutive rejections
+GATEWAY_TRIP_SECONDS = float(os.getenv('GATEWAY_TRIP_SECONDS', '300'))
 
-    print(f"SMS Content: {message}")
+class GatewayHealth:
+    """Per-process success rate and latency for each gateway domain.
 
-    # Try sending via primary gateway
-    success = send_email_brevo(to_email, subject, html_content)
-    
-    if not success and carrier in ['smart', 'globe']:
-        # Try alternative gateway
-        alt_carrier = f"{carrier}_alt"
-        if alt_carrier in carrier_gateways:
-            print(f"Trying alternative gateway: {carrier_gateways[alt_carrier]}")
-            success = send_email_brevo(carrier_gateways[alt_carrier], subject, html_content)
-    
-    return success
+    A domain that rejected GATEWAY_TRIP_AFTER sends in a row is skipped for
+    GATEWAY_TRIP_SECONDS, unless it is the only gateway left to try. Latency
+    comes only from sends that timed one gateway; batched calls mixing
+    several domains record just the outcome.
+    """
+
+    def __init__(self, window=GATEWAY_HEALTH_WINDOW, trip_after=GATEWAY_TRIP_AFTER, trip_seconds=GATEWAY_TRIP_SECONDS):
+        self.window = window
+        self.trip_after = trip_after
+        self.trip_seconds = trip_seconds
+        self._lock = threading.Lock()
+        self._domains = {}
+
+    def _entry(self, domain):
+        entry = self._domains.get(domain)
+        if entry is None:
+            entry = self._domains[domain] = {'recent': deque(maxlen=self.window), 'streak': 0, 'tripped_at': None}
+        return entry
+
+    def record(self, domain, accepted, latency_ms=None):
+        with self._lock:
+            entry = self._entry(domain)
+            entry['recent'].append((accepted, latency_ms))
+            if accepted:
+                entry['streak'] = 0
+                entry['tripped_at'] = None
+            else:
+                entry['streak'] += 1
+                if entry['streak'] >= self.trip_after:
+                    entry['tripped_at'] = time.monotonic()
+
+    def _score(self, entry):
+        recent = entry['recent']
+        # Smoothed so an unused gateway starts at 0.5 rather than 0 or 1
+        rate = (sum(1 for accepted, latency in recent if accepted) + 1) / (len(recent) + 2)
+        return rate / (1 + (self._latency(recent) or 0) / 1000)
+
+    @staticmethod
+    def _latency(recent):
+        """Average of the timed sends in the window, or None"""
+        timed = [latency for accepted, latency in recent if latency is not None]
+        return sum(timed) / len(timed) if timed else None
+
+    def _failing(self, entry):
+        return entry['tripped_at'] is not None and time.monotonic() - entry['tripped_at'] < self.trip_seconds
+
+    def order(self, *groups):
+        """Domains group by group, best first within each group, without the failing
+        ones (if every domain is failing, only the first is kept)"""
+        with self._lock:
+            ranked = [domain for group in groups
+                      for domain in sorted(group, key=lambda domain: -self._score(self._entry(domain)))]
+            healthy = [domain for domain in ranked if not self._failing(self._entry(domain))]
+        return healthy or ranked[:1]
+
+    def snapshot(self):
+        with self._lock:
+            stats = []
+            for carrier, domains in SMS_GATEWAY_DOMAINS.items():
+                for domain in domains:
+                    entry = self._entry(domain)
+                    recent = entry['recent']
+                    accepted = sum(1 for ok, latency in recent if ok)
+                    latency = self._latency(recent)
+                    stats.append({
+                        'domain': domain,
+                        'carrier': carrier,
+                        'sends': len(recent),
+                        'success_rate': round(accepted / len(recent), 3) if recent else None,
+                        'avg_latency_ms': round(latency, 1) if latency is not None else None,
+                        'consecutive_rejections': entry['streak'],
+                        'state': 'failing' if self._failing(entry) else 'healthy',
+                        'score': round(self._score(entry), 3)
+                    })
+        return sorted(stats, key=lambda stat: -stat['score'])
+
+gateway_health = GatewayHealth()
+
+def sms_local_number(phone):
+    """10-digit 9xxxxxxxxx form used by the gateways, or None if the number is invalid"""
+    clean_phone = ''.join(filter(str.isdigit, phone or ''))
+    if len(clean_phone) == 11 and clean_phone.startswith('09'):
+        return clean_phone[1:]  # Remove leading 0 -> 9xxxxxxxxx
+    elif len(clean_phone) == 12 and clean_phone.startswith('639'):
+        return clean_phone[2:]  # Remove leading 63 -> 9xxxxxxxxx
+    elif len(clean_phone) == 10 and clean_phone.startswith('9'):
+        return clean_phone  # Already correct -> 9xxxxxxxxx
+    return None
+
+def sms_gateway_text(message):
+    # Keep SMS message short (160 characters max)
+    return message[:157] + "..." if len(message) > 160 else message
 
 @app.route('/check_sms_eligible_clients', methods=['GET'])
 @login_required
 def check_sms_eligible_clients():
     """Check how many clients are eligible for SMS reminders"""
     try:
-        db = get_db()
-        cursor = db.execute('''
-            SELECT COUNT(*) as count FROM clients 
-            WHERE admin_id = ? 
-            AND phone IS NOT NULL 
-            AND phone != '' 
-            AND remaining_balance > 0
-        ''', (session['admin_id'],))
-        
-        result = cursor.fetchone()
-        count = result['count'] if result else 0
+        count = get_repository().count_sms_eligible(session['admin_id'])
         
         return jsonify({
             'success': True, 
@@ -274,67 +1983,19 @@ def check_sms_eligible_clients():
         
 # Replace the detect_carrier function
 def detect_carrier(phone):
-    clean = ''.join(filter(str.isdigit, phone))
-    
-    # Normalize to 11-digit format starting with 09
-    if clean.startswith("639"):
-        clean = "0" + clean[2:]
-    elif clean.startswith("9") and len(clean) == 10:
-        clean = "0" + clean
-    elif len(clean) == 11 and clean.startswith("09"):
-        pass  # Already correct format
-    else:
-        return None
-
-    if len(clean) != 11 or not clean.startswith("09"):
+    """Carrier of a mobile number from its prefix, or None if the prefix is unknown
+    (sends then try every carrier's gateways)"""
+    local_number = sms_local_number(phone)
+    if local_number is None:
         return None
-
-    # Get first 4 digits for prefix matching
-    prefix = clean[:4]
-    
-    # Updated prefix mappings for Philippine carriers
-    smart_prefixes = {
-        "0907", "0908", "0909", "0910", "0912", "0918", "0919", "0920", 
-        "0921", "0928", "0929", "0939", "0998", "0999", "0947", "0949",
-        "0998", "0999", "0813", "0947", "0994", "0992", "0993"
-    }
-    
-    globe_prefixes = {
-        "0905", "0906", "0915", "0916", "0917", "0926", "0927", "0935", 
-        "0936", "0937", "0945", "0953", "0954", "0955", "0956", "0965", 
-        "0966", "0967", "0975", "0976", "0977", "0995", "0996", "0997"
-    }
-    
-    sun_prefixes = {
-        "0922", "0923", "0924", "0925", "0931", "0932", "0933", "0934", 
-        "0940", "0941", "0942", "0943", "0944", "0973", "0974"
-    }
-
-    if prefix in smart_prefixes:
-        return "smart"
-    elif prefix in globe_prefixes:
-        return "globe"
-    elif prefix in sun_prefixes:
-        return "sun"
-    else:
-        # For 0932 prefix (your number), it should be Globe
-        print(f"Unknown prefix: {prefix}, defaulting to Globe")
-        return "globe"
+    return CARRIER_BY_PREFIX.get('0' + local_number[:3])
     
 #endpoint to get fully paid clients for recent activity
 @app.route('/get_recent_paid_clients')
 @login_required
 def get_recent_paid_clients():
     try:
-        db = get_db()
-        cursor = db.execute('''
-            SELECT * FROM clients 
-            WHERE admin_id = ? AND remaining_balance <= 0 
-            ORDER BY created_at DESC 
-            LIMIT 5
-        ''', (session['admin_id'],))
-        
-        recent_paid = cursor.fetchall()
+        recent_paid = get_repository().recent_paid_clients(session['admin_id'])
         
         # Format the data
         formatted_clients = []
@@ -346,7 +2007,8 @@ def get_recent_paid_clients():
                 'total_amount': float(client['total_amount']),
                 'products': client['products'],
                 'due_date': client['due_date'] if client['due_date'] else 'N/A',
-                'created_at': client['created_at'] if client['created_at'] else 'N/A'
+                'created_at': client['created_at'] if client['created_at'] else 'N/A',
+                'paid_at': client['paid_at']
             })
         
         return jsonify({
@@ -366,9 +2028,8 @@ def get_recent_paid_clients():
 @login_required
 def send_sms_reminder(client_id):
     try:
-        db = get_db()
-        cursor = db.execute('SELECT * FROM clients WHERE id = ? AND admin_id = ?', (client_id, session['admin_id']))
-        client = cursor.fetchone()
+        repo = get_repository()
+        client = repo.get_client(session['admin_id'], client_id)
         
         print(f"=== SMS DEBUG: Client lookup for ID {client_id} ===")
         
@@ -398,77 +2059,595 @@ def send_sms_reminder(client_id):
         
         print(f"SMS Message: {message} (Length: {len(message)})")
         
-        # Detect carrier
-        carrier = detect_carrier(client['phone'])
-        print(f"Detected carrier: {carrier}")
+        # Remembered gateway first, then the detected carrier, then the healthiest others,
+        # racing the next gateway whenever an attempt is slow
+        sms_sent = hedged_sender.send(client['phone_e164'] or client['phone'], message, client['carrier'])
         
-        sms_sent = False
+        if sms_sent:
+            # Log the SMS reminder
+            try:
+                repo.log_sms_reminder(client['id'])
+                repo.commit()
+                print(f"✓ SMS reminder logged successfully")
+            except Exception as log_error:
+                print(f"Warning: Failed to log SMS reminder: {log_error}")
+            
+            return jsonify({
+                'success': True, 
+                'message': f'FREE SMS reminder sent to {client["name"]} at {client["phone"]}!'
+            })
+        else:
+            print(f"✗ All SMS attempts failed")
+            return jsonify({
+                'success': False, 
+                'message': f'Failed to send SMS to {client["phone"]}. The SMS gateway may be temporarily unavailable.'
+            })
+            
+    except Exception as e:
+        print(f"SMS reminder error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'message': f'Failed to send SMS reminder: {str(e)}'})
+
+def build_sms_reminder_message(client):
+    """Bulk reminder text for a client row with materialized days_overdue"""
+    # days_overdue is materialized and signed (negative = days left)
+    days_diff = -client['days_overdue'] if client['days_overdue'] is not None else None
+    
+    if days_diff is not None:
+        if days_diff < 0:
+            urgency = f"OVERDUE by {abs(days_diff)} days"
+        elif days_diff == 0:
+            urgency = "DUE TODAY"
+        elif days_diff <= 3:
+            urgency = f"Due in {days_diff} day(s)"
+        else:
+            urgency = f"Due: {client['due_date']}"
+    else:
+        urgency = "Payment Due"
+    
+    return f"""PAYMENT REMINDER
+Hi {client['name']},
+{urgency}
+Amount: PHP{client['remaining_balance']:,.2f}
+Please settle ASAP. Thank you!"""
+
+def sms_delivery_addresses(phone, carrier=None):
+    """Gateway addresses to try for a phone: its carrier's gateways (stored or detected), then
+    every other gateway, each group ordered by current health (failing gateways skipped)"""
+    local_number = sms_local_number(phone)
+    if local_number is None:
+        return []
+    carrier = carrier or detect_carrier(phone)
+    own = list(SMS_GATEWAY_DOMAINS.get(carrier, ()))
+    others = [domain for domains in SMS_GATEWAY_DOMAINS.values() for domain in domains if domain not in own]
+    return [f'{local_number}@{domain}' for domain in gateway_health.order(own, others)]
+
+def carrier_gateways(phone, carrier=None):
+    """Gateway domains of a number's carrier (every gateway when the carrier is unknown)"""
+    return set(SMS_GATEWAY_DOMAINS.get(carrier or detect_carrier(phone), SMS_GATEWAY_DOMAIN_SET))
+
+# Per-number gateway memo (directory database). A number's last accepting
+# gateway is tried first for GATEWAY_MEMO_TTL_DAYS. A number rejected by every
+# gateway of its carrier (every gateway if the carrier is unknown)
+# GATEWAY_BAD_AFTER times in a row is skipped for GATEWAY_BAD_TTL_DAYS.
+GATEWAY_MEMO_TTL_DAYS = int(os.getenv('GATEWAY_MEMO_TTL_DAYS', '30'))
+GATEWAY_BAD_AFTER = int(os.getenv('GATEWAY_BAD_AFTER', '3'))
+GATEWAY_BAD_TTL_DAYS = int(os.getenv('GATEWAY_BAD_TTL_DAYS', '7'))
+
+GATEWAY_MEMO_SUCCESS_SQL = '''
+    INSERT INTO gateway_memo (phone, gateway, last_success_at, failures)
+    VALUES (:phone, :gateway, CURRENT_TIMESTAMP, 0)
+    ON CONFLICT (phone) DO UPDATE SET
+        gateway = excluded.gateway, last_success_at = excluded.last_success_at,
+        failures = 0, bad_until = NULL
+'''
+
+GATEWAY_MEMO_FAILURE_SQL = '''
+    INSERT INTO gateway_memo (phone, failures, last_failure_at, bad_until)
+    VALUES (:phone, 1, CURRENT_TIMESTAMP, CASE WHEN :bad_after <= 1 THEN datetime('now', :bad_ttl) END)
+    ON CONFLICT (phone) DO UPDATE SET
+        gateway = NULL, failures = failures + 1, last_failure_at = CURRENT_TIMESTAMP,
+        bad_until = CASE WHEN failures + 1 >= :bad_after THEN datetime('now', :bad_ttl) END
+'''
+
+def load_gateway_memo(local_numbers):
+    """{local number: (fresh gateway domain or None, known bad)} for the numbers that have a memo"""
+    if DB_BACKEND != 'sqlite' or not local_numbers:
+        return {}
+    pool = get_pool(DATABASE)
+    db = pool.acquire()
+    try:
+        numbers = sorted(set(local_numbers))
+        memo = {}
+        for start in range(0, len(numbers), 500):
+            chunk = numbers[start:start + 500]
+            cursor = db.execute(f'''
+                SELECT phone,
+                       CASE WHEN last_success_at > datetime('now', ?) THEN gateway END AS gateway,
+                       COALESCE(bad_until > datetime('now'), 0) AS known_bad
+                FROM gateway_memo WHERE phone IN ({', '.join('?' * len(chunk))})
+            ''', [f'-{GATEWAY_MEMO_TTL_DAYS} days'] + chunk)
+            memo.update((row['phone'], (row['gateway'], bool(row['known_bad']))) for row in cursor)
+        return memo
+    finally:
+        pool.release(db)
+
+def record_gateway_outcomes(successes, failures):
+    """Remember accepting gateways ({local number: domain}) and numbers every gateway rejected"""
+    if DB_BACKEND != 'sqlite' or not (successes or failures):
+        return
+    pool = get_pool(DATABASE)
+    db = pool.acquire()
+    try:
+        db.execute('BEGIN IMMEDIATE')
+        db.executemany(GATEWAY_MEMO_SUCCESS_SQL,
+                       [{'phone': phone, 'gateway': gateway} for phone, gateway in successes.items()])
+        db.executemany(GATEWAY_MEMO_FAILURE_SQL, [
+            {'phone': phone, 'bad_after': GATEWAY_BAD_AFTER, 'bad_ttl': f'+{GATEWAY_BAD_TTL_DAYS} days'}
+            for phone in failures
+        ])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"Warning: failed to update gateway memo: {e}")
+    finally:
+        pool.release(db)
+
+def sms_candidates(phones, carriers=None):
+    """(local numbers, gateway addresses to try for each phone); known-bad numbers get none"""
+    local_numbers = [sms_local_number(phone) for phone in phones]
+    memo = load_gateway_memo([number for number in local_numbers if number])
+    
+    candidates = []
+    for phone, carrier, number in zip(phones, carriers or [None] * len(phones), local_numbers):
+        gateway, known_bad = memo.get(number, (None, False))
+        addresses = [] if known_bad else sms_delivery_addresses(phone, carrier)
+        preferred = f'{number}@{gateway}'
+        if gateway and preferred in addresses:  # not while that gateway is failing
+            addresses = [preferred] + [address for address in addresses if address != preferred]
+        candidates.append(addresses)
+    return local_numbers, candidates
+
+def deliver_sms_batch(items, carriers=None):
+    """Send many (phone, message) SMS through email gateways; one outcome per item
+
+    Outcomes are those of send_email_brevo_outcomes ('sent', 'rejected' by
+    every gateway tried, 'error', 'deferred', 'unknown') plus 'unreachable'
+    for an invalid or known-bad number with no gateway to try.
+
+    A number's remembered gateway goes first and known-bad numbers are not
+    sent at all. Each round sends every undelivered message to its next
+    gateway address in one batched call. A failed API call (as opposed to a
+    rejected recipient) ends that message's walk and is left to the caller
+    to retry.
+    """
+    carriers = carriers or [None] * len(items)
+    local_numbers, candidates = sms_candidates([phone for phone, message in items], carriers)
+    texts = [sms_gateway_text(message) for phone, message in items]
+    results = ['sent' if addresses else 'unreachable' for addresses in candidates]
+    pending = [index for index in range(len(items)) if candidates[index]]
+    rejected_by = [set() for item in items]  # gateway domains that rejected each message
+    successes, failures = {}, []
+    attempt = 0
+    while pending:
+        started = time.monotonic()
+        outcomes = send_email_brevo_outcomes([(candidates[index][attempt], "", texts[index]) for index in pending])
+        # A call carrying several messages times all their gateways at once: no per-gateway latency
+        latency_ms = (time.monotonic() - started) * 1000 if len(pending) == 1 else None
+        attempt += 1
+        still_pending = []
+        for index, outcome in zip(pending, outcomes):
+            if outcome in ('sent', 'rejected'):
+                gateway_health.record(candidates[index][attempt - 1].split('@', 1)[1], outcome == 'sent', latency_ms)
+            results[index] = outcome
+            if outcome == 'sent':
+                successes[local_numbers[index]] = candidates[index][attempt - 1].split('@', 1)[1]
+            elif outcome == 'rejected':
+                rejected_by[index].add(candidates[index][attempt - 1].split('@', 1)[1])
+                if attempt < len(candidates[index]):
+                    still_pending.append(index)
+                elif carrier_gateways(items[index][0], carriers[index]) <= rejected_by[index]:
+                    # Not when a skipped (failing) gateway of its carrier never got to answer
+                    failures.append(local_numbers[index])
+        pending = still_pending
+    
+    record_gateway_outcomes(successes, failures)
+    return results
+
+def deliver_sms(phone, message, carrier=None):
+    """Send one SMS (see deliver_sms_batch); True once a gateway accepts it"""
+    return deliver_sms_batch([(phone, message)], [carrier])[0] == 'sent'
+
+# Hedged single sends: when an attempt has not answered within
+# SMS_HEDGE_DELAY_MS, the next-best gateway is tried alongside it. At most
+# SMS_HEDGE_MAX_PARALLEL attempts are in flight, which also caps duplicate
+# deliveries per message. 0 turns hedging off.
+SMS_HEDGE_DELAY_MS = int(os.getenv('SMS_HEDGE_DELAY_MS', '1500'))
+SMS_HEDGE_MAX_PARALLEL = int(os.getenv('SMS_HEDGE_MAX_PARALLEL', '2'))
+SMS_HEDGE_WORKERS = int(os.getenv('SMS_HEDGE_WORKERS', '8'))
+
+class HedgedSender:
+    """Sends one SMS at a time, racing gateways when the current attempt is slow.
+
+    The first accepted attempt wins; attempts still in flight are left to
+    finish in the background and counted as duplicates if they also deliver.
+    """
+
+    def __init__(self, delay_ms=SMS_HEDGE_DELAY_MS, max_parallel=SMS_HEDGE_MAX_PARALLEL, workers=SMS_HEDGE_WORKERS):
+        self.delay_ms = delay_ms
+        self.max_parallel = max(max_parallel, 1)
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._executor = None
+        self._latencies = deque(maxlen=500)
+        self._stats = {'sends': 0, 'delivered': 0, 'hedged': 0, 'hedge_wins': 0, 'duplicates': 0}
+
+    def _executor_for_process(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()  # executor threads do not survive a fork
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='sms-hedge')
+            return self._executor
+
+    def _attempt(self, address, text, state):
+        started = time.monotonic()
+        # No client-side retries: a slow or failing attempt is what the hedge is for
+        outcome = send_email_brevo_outcomes([(address, "", text)], max_retries=0)[0]
+        if outcome in ('sent', 'rejected'):
+            gateway_health.record(address.split('@', 1)[1], outcome == 'sent', (time.monotonic() - started) * 1000)
+        if outcome == 'sent':
+            with self._lock:
+                state['delivered'] += 1
+                if state['delivered'] > 1:
+                    self._stats['duplicates'] += 1
+        return outcome
+
+    def send(self, phone, message, carrier=None):
+        """True once a gateway accepts the message"""
+        if self.delay_ms <= 0:
+            return deliver_sms(phone, message, carrier)
         
-        if carrier:
-            print(f"Trying detected carrier: {carrier}")
-            if send_sms_via_email_gateway(client['phone'], message, carrier):
-                sms_sent = True
-                print(f"✓ SMS sent successfully via {carrier}")
+        started = time.monotonic()
+        (number,), (addresses,) = sms_candidates([phone], [carrier])
+        text = sms_gateway_text(message)
+        executor = self._executor_for_process()
+        state = {'delivered': 0}
+        in_flight = {}
+        next_index = 0
+        winner = None
+        rejected_by = set()
+        api_failed = False
+        hedges = set()  # attempts started because another one was slow
+        launch_now = True
         
-        # If carrier detection failed or sending failed, try all carriers
-        if not sms_sent:
-            print("Trying all carriers...")
-            carriers_to_try = ['globe', 'smart', 'sun']
+        while True:
+            can_launch = next_index < len(addresses) and not api_failed and len(in_flight) < self.max_parallel
+            if can_launch and launch_now:
+                in_flight[executor.submit(self._attempt, addresses[next_index], text, state)] = next_index
+                next_index += 1
+                launch_now = False
+                continue
+            if not in_flight:
+                break
             
-            for test_carrier in carriers_to_try:
-                print(f"Trying {test_carrier} gateway...")
-                try:
-                    if send_sms_via_email_gateway(client['phone'], message, test_carrier):
-                        sms_sent = True
-                        print(f"✓ SMS sent successfully via {test_carrier}")
-                        break
-                    else:
-                        print(f"✗ Failed via {test_carrier}")
-                except Exception as carrier_error:
-                    print(f"✗ Error with {test_carrier}: {str(carrier_error)}")
+            done, _ = wait(in_flight, timeout=self.delay_ms / 1000 if can_launch else None,
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                # Slow attempt: race the next-best gateway against it
+                hedges.add(next_index)
+                launch_now = True
+                continue
+            
+            for future in done:
+                index = in_flight.pop(future)
+                outcome = future.result()
+                if outcome == 'sent' and winner is None:
+                    winner = index
+                elif outcome == 'rejected':
+                    rejected_by.add(addresses[index].split('@', 1)[1])
+                    launch_now = True
+                elif outcome in ('error', 'deferred', 'unknown'):
+                    # Brevo itself is failing or unavailable (other gateways will not
+                    # help), or may have sent it already (another would duplicate it)
+                    api_failed = True
+            if winner is not None:
+                break
         
-        if sms_sent:
-            # Log the SMS reminder
+        if winner is not None:
+            record_gateway_outcomes({number: addresses[winner].split('@', 1)[1]}, [])
+        elif addresses and carrier_gateways(phone, carrier) <= rejected_by:
+            record_gateway_outcomes({}, [number])
+        
+        with self._lock:
+            self._stats['sends'] += 1
+            self._stats['delivered'] += winner is not None
+            self._stats['hedged'] += bool(hedges)
+            self._stats['hedge_wins'] += winner in hedges
+            self._latencies.append((time.monotonic() - started) * 1000)
+        return winner is not None
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            stats = dict(self._stats, delay_ms=self.delay_ms, max_parallel=self.max_parallel)
+        stats['latency_ms'] = {
+            'avg': round(sum(latencies) / len(latencies), 1) if latencies else None,
+            'p95': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 1) if latencies else None,
+            'max': round(latencies[-1], 1) if latencies else None,
+        }
+        return stats
+
+hedged_sender = HedgedSender()
+
+# Durable outbox for bulk reminders
+#
+# /send_all_sms_reminders only writes one jobs row and one outbox row per
+# message, then returns. Worker threads claim due rows in small batches, send
+# them, and record the outcome in one transaction per batch. A claim is a
+# lease: a worker that dies mid-batch leaves its rows in 'sending' until the
+# lease runs out, then another worker picks them up again (at-least-once).
+OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', '2'))  # in-process workers; 0 = run `flask outbox-worker`
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))  # messages per claim and per batched send
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_RETRY_SECONDS = int(os.getenv('OUTBOX_RETRY_SECONDS', '30'))  # doubled after every failed attempt
+OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', '300'))
+OUTBOX_POLL_SECONDS = float(os.getenv('OUTBOX_POLL_SECONDS', '2'))
+
+# deliver_sms_batch outcomes that end a message, and the error recorded for
+# those that are retried
+OUTBOX_FINAL_OUTCOMES = {
+    'unreachable': 'Invalid or known-bad number: no gateway to try',
+    'unknown': 'No reply from Brevo; it may have been sent, so it is not retried',
+}
+OUTBOX_RETRY_ERRORS = {
+    'rejected': 'No carrier gateway accepted the message',
+    'error': 'Brevo API call failed',
+}
+
+SMS_REMINDER_LOG_SQL = '''
+    INSERT INTO sms_reminders (client_id, method, sent_at)
+    SELECT id, :method, :sent_at FROM clients WHERE id = :client_id
+'''
+
+OUTBOX_CLAIM_SQL = '''
+    UPDATE outbox SET status = 'sending', attempts = attempts + 1,
+                      next_attempt_at = datetime('now', :lease)
+    WHERE id IN (
+        SELECT id FROM outbox
+        WHERE status IN ('pending', 'sending') AND next_attempt_at <= datetime('now')
+        ORDER BY next_attempt_at
+        LIMIT :limit
+    )
+    RETURNING id, job_id, client_id, recipient, carrier, message, attempts
+'''
+
+JOB_PROGRESS_SQL = '''
+    SELECT status, COUNT(*) AS count FROM outbox WHERE job_id = :job_id GROUP BY status
+'''
+
+HOT_QUERIES.append(('outbox_claim', '''
+    SELECT id FROM outbox
+    WHERE status IN ('pending', 'sending') AND next_attempt_at <= datetime('now')
+    ORDER BY next_attempt_at
+    LIMIT 10
+''', {}))
+HOT_QUERIES.append(('job_progress', JOB_PROGRESS_SQL, {'job_id': 1}))
+
+outbox_wakeup = threading.Event()
+_outbox_threads = []
+_outbox_lock = threading.Lock()
+_outbox_pid = None
+
+def enqueue_sms_job(db, admin_id, clients):
+    """Queue one reminder per client with a valid phone; returns (job_id, queued, skipped)"""
+    messages = []
+    for client in clients:
+        # Rows written before backfill-phones ran are normalized here
+        columns = phone_columns(client['phone']) if client['phone_e164'] is None else client
+        if columns['phone_e164']:
+            messages.append((client['id'], columns['phone_e164'], columns['carrier'], build_sms_reminder_message(client)))
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        job_id = db.execute(
+            "INSERT INTO jobs (admin_id, kind, total) VALUES (?, 'sms_reminders', ?)",
+            (admin_id, len(messages))
+        ).lastrowid
+        db.executemany('''
+            INSERT INTO outbox (job_id, admin_id, client_id, recipient, carrier, message)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(job_id, admin_id) + message for message in messages])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    outbox_wakeup.set()
+    return job_id, len(messages), len(clients) - len(messages)
+
+def claim_outbox(db, limit=OUTBOX_BATCH_SIZE, lease_seconds=OUTBOX_LEASE_SECONDS):
+    """Lease up to `limit` due messages to the calling worker"""
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        rows = db.execute(OUTBOX_CLAIM_SQL, {'lease': f'+{lease_seconds} seconds', 'limit': limit}).fetchall()
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return rows
+
+def process_outbox(database, limit=OUTBOX_BATCH_SIZE):
+    """Claim, send and settle one batch from a database file; returns the number claimed"""
+    pool = get_pool(database)
+    db = pool.acquire()
+    try:
+        rows = claim_outbox(db, limit)
+        sent, failed = [], []
+        # Leased this often without an outcome: the worker died on it every time
+        for row in rows:
+            if row['attempts'] > OUTBOX_MAX_ATTEMPTS:
+                failed.append({'id': row['id'], 'status': 'failed', 'delay': '+0 seconds', 'attempted': 1,
+                               'error': 'Gave up after repeated worker crashes'})
+        rows_to_send = [row for row in rows if row['attempts'] <= OUTBOX_MAX_ATTEMPTS]
+        try:
+            outcomes = deliver_sms_batch([(row['recipient'], row['message']) for row in rows_to_send],
+                                         [row['carrier'] for row in rows_to_send])
+            crash = None
+        except Exception as e:
+            outcomes, crash = ['error'] * len(rows_to_send), str(e)
+        for row, outcome in zip(rows_to_send, outcomes):
+            if outcome == 'sent':
+                sent.append(row)
+            elif outcome in OUTBOX_FINAL_OUTCOMES:
+                failed.append({'id': row['id'], 'status': 'failed', 'delay': '+0 seconds', 'attempted': 1,
+                               'error': OUTBOX_FINAL_OUTCOMES[outcome]})
+            elif outcome == 'deferred':
+                # Nothing went out, so the claim does not use up one of the attempts
+                failed.append({'id': row['id'], 'status': 'pending', 'delay': f'+{OUTBOX_RETRY_SECONDS} seconds',
+                               'attempted': 0, 'error': 'Deferred: Brevo circuit open or rate limit reached'})
+            else:
+                final = row['attempts'] >= OUTBOX_MAX_ATTEMPTS
+                delay = OUTBOX_RETRY_SECONDS * 2 ** (row['attempts'] - 1)
+                failed.append({'id': row['id'], 'status': 'failed' if final else 'pending',
+                               'delay': f'+{delay} seconds', 'attempted': 1,
+                               'error': crash or OUTBOX_RETRY_ERRORS.get(outcome, outcome)})
+
+        if rows:
+            # One transaction per batch for every outcome and reminder log row
+            db.execute('BEGIN IMMEDIATE')
             try:
-                db.execute('INSERT INTO sms_reminders (client_id, method, sent_at) VALUES (?, ?, ?)', 
-                          (client['id'], 'email_gateway', datetime.now().isoformat()))
+                now = datetime.now().isoformat()
+                db.executemany('''
+                    UPDATE outbox SET status = 'sent', sent_at = CURRENT_TIMESTAMP, last_error = NULL
+                    WHERE id = ?
+                ''', [(row['id'],) for row in sent])
+                db.executemany(SMS_REMINDER_LOG_SQL, [
+                    {'client_id': row['client_id'], 'method': 'email_gateway', 'sent_at': now} for row in sent
+                ])
+                db.executemany('''
+                    UPDATE outbox SET status = :status, next_attempt_at = datetime('now', :delay),
+                                      last_error = :error, attempts = attempts - 1 + :attempted
+                    WHERE id = :id
+                ''', failed)
+                db.execute('''
+                    UPDATE jobs SET finished_at = CURRENT_TIMESTAMP
+                    WHERE id IN (SELECT DISTINCT job_id FROM outbox WHERE id IN (SELECT value FROM json_each(?)))
+                    AND finished_at IS NULL
+                    AND NOT EXISTS (SELECT 1 FROM outbox o
+                                    WHERE o.job_id = jobs.id AND o.status IN ('pending', 'sending'))
+                ''', (json.dumps([row['id'] for row in rows]),))
                 db.commit()
-                print(f"✓ SMS reminder logged successfully")
-            except Exception as log_error:
-                print(f"Warning: Failed to log SMS reminder: {log_error}")
-            
-            return jsonify({
-                'success': True, 
-                'message': f'FREE SMS reminder sent to {client["name"]} at {client["phone"]}!'
-            })
-        else:
-            print(f"✗ All SMS attempts failed")
-            return jsonify({
-                'success': False, 
-                'message': f'Failed to send SMS to {client["phone"]}. The SMS gateway may be temporarily unavailable.'
-            })
-            
+            except Exception:
+                db.rollback()
+                raise
+            print(f"Outbox {database}: {len(sent)} sent, {len(failed)} failed or retrying")
+        return len(rows)
+    finally:
+        pool.release(db)
+
+def run_outbox_worker(stop=None):
+    """Drain every database's outbox, sleeping when nothing is due"""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        claimed = 0
+        for database in all_databases():
+            try:
+                claimed += process_outbox(database)
+            except Exception as e:
+                print(f"Outbox worker error on {database}: {e}")
+        if not claimed:
+            outbox_wakeup.wait(OUTBOX_POLL_SECONDS)
+            outbox_wakeup.clear()
+
+def start_outbox_workers(count=OUTBOX_WORKERS, daemon=True, stop=None):
+    """Start `count` outbox worker threads in this process (once per process)"""
+    global _outbox_pid
+    with _outbox_lock:
+        if _outbox_pid == os.getpid():
+            return _outbox_threads
+        _outbox_pid = os.getpid()
+        _outbox_threads.clear()  # threads do not survive a fork
+        for number in range(count):
+            thread = Thread(target=run_outbox_worker, args=(stop,), daemon=daemon,
+                            name=f'outbox-worker-{number}')
+            thread.start()
+            _outbox_threads.append(thread)
+    if count:
+        print(f"Started {count} outbox worker(s) in process {os.getpid()}")
+    return _outbox_threads
+
+@app.before_request
+def ensure_outbox_workers():
+    # Started on the first request rather than at import, so a gunicorn
+    # --preload master never owns them and a restart resumes queued messages
+    if OUTBOX_WORKERS and DB_BACKEND == 'sqlite' and _outbox_pid != os.getpid():
+        start_outbox_workers()
+
+def get_job_progress(db, admin_id, job_id):
+    """Sent/failed/pending counts for one of an admin's jobs, or None"""
+    job = db.execute('SELECT * FROM jobs WHERE id = ? AND admin_id = ?', (job_id, admin_id)).fetchone()
+    if job is None:
+        return None
+    counts = {row['status']: row['count'] for row in db.execute(JOB_PROGRESS_SQL, {'job_id': job_id})}
+    pending = counts.get('pending', 0) + counts.get('sending', 0)
+    return {
+        'job_id': job['id'],
+        'kind': job['kind'],
+        'status': 'running' if pending else 'done',
+        'total': job['total'],
+        'sent': counts.get('sent', 0),
+        'failed': counts.get('failed', 0),
+        'pending': pending,
+        'created_at': job['created_at'],
+        'finished_at': job['finished_at']
+    }
+
+@app.route('/jobs/<int:job_id>')
+@login_required
+@sqlite_only
+def job_status(job_id):
+    """Progress of a background job started by this admin"""
+    try:
+        progress = get_job_progress(get_db(), session['admin_id'], job_id)
+        if progress is None:
+            return jsonify({'success': False, 'message': 'Job not found'}), 404
+        return jsonify(dict(progress, success=True))
     except Exception as e:
-        print(f"SMS reminder error: {e}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({'success': False, 'message': f'Failed to send SMS reminder: {str(e)}'})
+        print(f"Job status error: {e}")
+        return jsonify({'success': False, 'message': f'Error loading job: {str(e)}'})
+
+@app.cli.command('outbox-worker')
+@click.option('--workers', default=max(OUTBOX_WORKERS, 1), show_default=True,
+              help='Number of sender threads.')
+def outbox_worker_command(workers):
+    """Send queued outbox messages until interrupted (use with OUTBOX_WORKERS=0 on the web app)"""
+    if DB_BACKEND != 'sqlite':
+        sys.exit('outbox-worker only supports the SQLite backend')
+    stop = threading.Event()
+    threads = start_outbox_workers(workers, daemon=True, stop=stop)
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping outbox workers after their current batch...")
+        stop.set()
+        outbox_wakeup.set()
+        for thread in threads:
+            thread.join()
+    write_buffer.flush()
 
 @app.route('/send_all_sms_reminders', methods=['POST'])
 @login_required
 def send_all_sms_reminders():
-    """Send SMS reminders to all clients with outstanding balances and phone numbers"""
+    """Queue SMS reminders to all clients with outstanding balances and phone numbers"""
     try:
-        db = get_db()
-        cursor = db.execute('''
-            SELECT * FROM clients 
-            WHERE admin_id = ? 
-            AND phone IS NOT NULL 
-            AND phone != '' 
-            AND remaining_balance > 0
-        ''', (session['admin_id'],))
-        
-        eligible_clients = cursor.fetchall()
+        repo = get_repository()
+        repo.ensure_current_statuses(session['admin_id'])  # makes days_overdue current
+        eligible_clients = repo.sms_eligible_clients(session['admin_id'])
         
         if not eligible_clients:
             return jsonify({
@@ -476,73 +2655,37 @@ def send_all_sms_reminders():
                 'message': 'No clients with phone numbers and outstanding balances found'
             })
         
+        if DB_BACKEND == 'sqlite':
+            job_id, queued, skipped = enqueue_sms_job(get_db(), session['admin_id'], eligible_clients)
+            return jsonify({
+                'success': queued > 0,
+                'job_id': job_id,
+                'queued_count': queued,
+                'failed_count': skipped,
+                'message': f'Queued {queued} SMS reminders, {skipped} skipped (invalid phone number)'
+            })
+        
+        # No outbox on MySQL yet: send inline as before
         sent_count = 0
-        failed_count = 0
+        valid_clients = [client for client in eligible_clients if validate_phone_number(client['phone'])]
+        failed_count = len(eligible_clients) - len(valid_clients)
+        outcomes = deliver_sms_batch([(client['phone'], build_sms_reminder_message(client)) for client in valid_clients],
+                                     [client['carrier'] for client in valid_clients])
         
-        for client in eligible_clients:
-            # Validate phone number
-            if not validate_phone_number(client['phone']):
-                failed_count += 1
-                continue
-            
-            # Calculate days overdue/due
-            today = date.today()
-            days_diff = None
-            if client['due_date']:
-                try:
-                    client_due_date = datetime.strptime(client['due_date'], '%Y-%m-%d').date()
-                    days_diff = (client_due_date - today).days
-                except ValueError:
-                    pass
-            
-            # Create SMS message
-            if days_diff is not None:
-                if days_diff < 0:
-                    urgency = f"OVERDUE by {abs(days_diff)} days"
-                elif days_diff == 0:
-                    urgency = "DUE TODAY"
-                elif days_diff <= 3:
-                    urgency = f"Due in {days_diff} day(s)"
-                else:
-                    urgency = f"Due: {client['due_date']}"
-            else:
-                urgency = "Payment Due"
-            
-            message = f"""PAYMENT REMINDER
-Hi {client['name']},
-{urgency}
-Amount: PHP{client['remaining_balance']:,.2f}
-Please settle ASAP. Thank you!"""
-            
-            # Try sending SMS
-            sms_sent = False
-            
-            # First try to detect carrier
-            carrier = detect_carrier(client['phone'])
-            if carrier:
-                if send_sms_via_email_gateway(client['phone'], message, carrier):
-                    sms_sent = True
-            
-            # If detection failed, try all carriers
-            if not sms_sent:
-                carriers = ['smart', 'sun', 'tm']
-                for carrier in carriers:
-                    if send_sms_via_email_gateway(client['phone'], message, carrier):
-                        sms_sent = True
-                        break
-            
-            if sms_sent:
+        for client, outcome in zip(valid_clients, outcomes):
+            if outcome == 'sent':
                 sent_count += 1
                 # Log the SMS reminder
                 try:
-                    db.execute('INSERT INTO sms_reminders (client_id, method, sent_at) VALUES (?, ?, ?)', 
-                              (client['id'], 'email_gateway', datetime.now().isoformat()))
-                    db.commit()
+                    repo.log_sms_reminder(client['id'])
                 except Exception as log_error:
                     print(f"Warning: Failed to log SMS reminder: {log_error}")
             else:
                 failed_count += 1
         
+        # One commit for the whole run
+        repo.commit()
+        
         return jsonify({
             'success': True if sent_count > 0 else False,
             'sent_count': sent_count,
@@ -572,9 +2715,7 @@ def register():
             email = data['email']
             password = data['password']
             
-            db = get_db()
-            cursor = db.execute('SELECT * FROM admins WHERE email = ?', (email,))
-            account = cursor.fetchone()
+            account = get_repository().get_admin_by_email(email)
             
             if account:
                 return jsonify({'success': False, 'message': 'Email already exists!'})
@@ -632,10 +2773,9 @@ def verify_otp():
         
         if otp == temp_data['otp']:
             # Create account
-            db = get_db()
-            db.execute('INSERT INTO admins (username, email, password) VALUES (?, ?, ?)', 
-                      (temp_data['username'], temp_data['email'], temp_data['password']))
-            db.commit()
+            repo = get_repository()
+            repo.create_admin(temp_data['username'], temp_data['email'], temp_data['password'])
+            repo.commit()
             
             # Clean up session
             session.pop('temp_registration', None)
@@ -655,11 +2795,11 @@ def login():
             email = data['email']
             password = data['password']
             
-            db = get_db()
-            cursor = db.execute('SELECT * FROM admins WHERE email = ?', (email,))
-            account = cursor.fetchone()
+            repo = get_repository()
+            account = repo.get_admin_by_email(email)
             
             if account and check_password_hash(account['password'], password):
+                repo.sync_admin(account)
                 session['admin_id'] = account['id']
                 session['username'] = account['username']
                 return jsonify({'success': True, 'message': 'Login successful!'})
@@ -671,118 +2811,365 @@ def login():
     
     return render_template('login.html')
 
+# Served entirely from idx_clients_admin_summary (covering index)
+CLIENT_SUMMARY_SQL = '''
+    SELECT
+        COUNT(*) AS total_clients,
+        COALESCE(SUM(total_amount), 0) AS total_debt,
+        COALESCE(SUM(remaining_balance), 0) AS total_outstanding,
+        COALESCE(SUM(CASE WHEN remaining_balance <= 0 THEN 1 ELSE 0 END), 0) AS paid_count,
+        COALESCE(SUM(CASE WHEN remaining_balance > 0 AND date(due_date) < :today THEN 1 ELSE 0 END), 0) AS overdue_count,
+        COALESCE(SUM(CASE WHEN remaining_balance > 0 AND date(due_date) = :today THEN 1 ELSE 0 END), 0) AS due_today_count,
+        COALESCE(SUM(CASE WHEN remaining_balance > 0 AND date(due_date) = :tomorrow THEN 1 ELSE 0 END), 0) AS due_tomorrow_count
+    FROM clients
+    WHERE admin_id = :admin_id
+'''
+HOT_QUERIES.append(('client_summary', CLIENT_SUMMARY_SQL,
+                    {'today': '2000-01-01', 'tomorrow': '2000-01-02', 'admin_id': 1}))
+
+SUMMARY_COUNTERS = ('total_clients', 'total_debt', 'total_outstanding', 'paid_count', 'pending_count',
+                    'overdue_count', 'due_today_count', 'due_tomorrow_count')
+
+def get_client_summary(db, admin_id, today=None, archived=True):
+    """Totals and status counts for an admin, computed in one aggregate query.
+
+    A client is paid when nothing remains, overdue when a valid due date has
+    passed, and pending otherwise (including missing or unparseable dates).
+    due_today and due_tomorrow are subsets of pending. Archived clients are
+    all settled, so they only add to the totals and paid_count.
+    """
+    today = today or date.today()
+    cursor = db.execute(CLIENT_SUMMARY_SQL, {
+        'today': today.strftime('%Y-%m-%d'),
+        'tomorrow': (today + timedelta(days=1)).strftime('%Y-%m-%d'),
+        'admin_id': admin_id
+    })
+    row = cursor.fetchone()
+
+    summary = dict(row)
+    if archived:
+        archive = db.execute(ARCHIVED_SUMMARY_SQL, {'admin_id': admin_id}).fetchone()
+        summary['total_clients'] += archive['clients']
+        summary['total_debt'] += archive['debt']
+        summary['total_outstanding'] += archive['outstanding']
+        summary['paid_count'] += archive['clients']
+    summary['pending_count'] = summary['total_clients'] - summary['paid_count'] - summary['overdue_count']
+    return summary
+
+# Client due dates and status
+#
+# due_date is stored as canonical ISO text (YYYY-MM-DD), which sorts and
+# compares correctly in SQL. status and days_overdue are materialized on every
+# write and refreshed by the nightly sweep, so filters never re-parse dates.
+DUE_DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%Y/%m/%d', '%d-%m-%Y')
+
+CLIENT_STATUSES = ('paid', 'pending', 'due_tomorrow', 'due_today', 'overdue')
+
+STATUS_LABELS = {
+    'paid': 'Fully Paid',
+    'pending': 'Pending',
+    'due_tomorrow': 'Due Tomorrow',
+    'due_today': 'Due Today',
+    'overdue': 'Overdue'
+}
+
+def parse_due_date(value):
+    """Return a due date as canonical 'YYYY-MM-DD', None if blank, or raise ValueError"""
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    value = str(value).strip()
+    if not value:
+        return None
+    if len(value) == 10 and value[4] == value[7] == '-':
+        try:
+            return date.fromisoformat(value).isoformat()
+        except ValueError:
+            pass
+    for fmt in DUE_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    raise ValueError(f'Invalid due date: {value} (expected YYYY-MM-DD)')
+
+def normalize_stored_due_dates(db):
+    """Rewrite legacy free-form due dates in canonical form (used by the migration)
+
+    A value that cannot be parsed is moved to due_date_raw, so nothing the
+    user typed is lost; the client shows as having no due date until fixed.
+    """
+    cursor = db.execute('''
+        SELECT id, due_date FROM clients
+        WHERE due_date IS NOT NULL AND (date(due_date) IS NULL OR date(due_date) != due_date)
+    ''')
+    invalid = []
+    for row in cursor.fetchall():
+        try:
+            db.execute('UPDATE clients SET due_date = ? WHERE id = ?', (parse_due_date(row['due_date']), row['id']))
+        except ValueError:
+            db.execute('UPDATE clients SET due_date = NULL, due_date_raw = due_date WHERE id = ?', (row['id'],))
+            invalid.append(row['id'])
+    if invalid:
+        print(f"Moved {len(invalid)} unparseable due date(s) to due_date_raw; client ids: "
+              f"{', '.join(map(str, invalid))}")
+
+# days_overdue is signed: positive when past due, negative while still ahead,
+# NULL when paid or without a due date.
+CLIENT_STATUS_SET_SQL = '''
+    status = CASE
+        WHEN remaining_balance <= 0 THEN 'paid'
+        WHEN due_date IS NULL THEN 'pending'
+        WHEN due_date < :today THEN 'overdue'
+        WHEN due_date = :today THEN 'due_today'
+        WHEN due_date = date(:today, '+1 day') THEN 'due_tomorrow'
+        ELSE 'pending'
+    END,
+    days_overdue = CASE
+        WHEN remaining_balance <= 0 THEN NULL
+        ELSE CAST(julianday(:today) - julianday(due_date) AS INTEGER)
+    END
+'''
+
+def refresh_client_statuses(db, today=None, admin_id=None, client_ids=None, unset_only=False):
+    """Recompute status/days_overdue in SQL, skipping rows that are and stay settled
+
+    unset_only limits the update to rows that have never had a status, i.e.
+    rows just bulk-inserted.
+    """
+    today = today or date.today()
+    params = {'today': today.strftime('%Y-%m-%d')}
+    conditions = ['status IS NULL'] if unset_only else []
+    if admin_id is not None:
+        conditions.append('admin_id = :admin_id')
+        params['admin_id'] = admin_id
+    if client_ids is not None:
+        if not client_ids:
+            return 0
+        placeholders = ', '.join(f':id{i}' for i in range(len(client_ids)))
+        conditions.append(f'id IN ({placeholders})')
+        params.update({f'id{i}': client_id for i, client_id in enumerate(client_ids)})
+    where = ' AND '.join(conditions) or '1'
+
+    cursor = db.execute(f'''
+        UPDATE clients SET {CLIENT_STATUS_SET_SQL}
+        WHERE {where}
+        AND (status IS NULL OR status != 'paid' OR remaining_balance > 0)
+    ''', params)
+    return cursor.rowcount
+
+# Per-admin summary maintained by triggers on clients
+#
+# Each counter row is bucketed relative to its own as_of_date, so a trigger
+# firing just after midnight still agrees with the rest of the row. When the
+# calendar day moves on, roll_over_admin_summary() recomputes the row.
+def _summary_delta(ref, sign):
+    """SET clause adding (sign=+) or removing (sign=-) one client row"""
+    active = f"{ref}.remaining_balance > 0"
+    overdue = f"{active} AND date({ref}.due_date) < as_of_date"
+    return f'''
+        total_clients = total_clients {sign} 1,
+        total_debt = total_debt {sign} {ref}.total_amount,
+        total_outstanding = total_outstanding {sign} {ref}.remaining_balance,
+        paid_count = paid_count {sign} (CASE WHEN {ref}.remaining_balance <= 0 THEN 1 ELSE 0 END),
+        overdue_count = overdue_count {sign} (CASE WHEN {overdue} THEN 1 ELSE 0 END),
+        pending_count = pending_count {sign} (CASE WHEN {active} AND NOT COALESCE({overdue}, 0) THEN 1 ELSE 0 END),
+        due_today_count = due_today_count {sign} (CASE WHEN {active} AND date({ref}.due_date) = as_of_date THEN 1 ELSE 0 END),
+        due_tomorrow_count = due_tomorrow_count {sign} (CASE WHEN {active} AND date({ref}.due_date) = date(as_of_date, '+1 day') THEN 1 ELSE 0 END),
+        updated_at = CURRENT_TIMESTAMP
+    '''
+
+_ENSURE_SUMMARY_ROW = "INSERT OR IGNORE INTO admin_summary (admin_id, as_of_date) VALUES ({ref}.admin_id, date('now', 'localtime'));"
+
+ADMIN_SUMMARY_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS admin_summary (
+        admin_id INTEGER PRIMARY KEY,
+        as_of_date TEXT NOT NULL,
+        total_clients INTEGER NOT NULL DEFAULT 0,
+        total_debt REAL NOT NULL DEFAULT 0,
+        total_outstanding REAL NOT NULL DEFAULT 0,
+        paid_count INTEGER NOT NULL DEFAULT 0,
+        pending_count INTEGER NOT NULL DEFAULT 0,
+        overdue_count INTEGER NOT NULL DEFAULT 0,
+        due_today_count INTEGER NOT NULL DEFAULT 0,
+        due_tomorrow_count INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (admin_id) REFERENCES admins (id) ON DELETE CASCADE
+    )''',
+    f'''CREATE TRIGGER IF NOT EXISTS clients_summary_insert AFTER INSERT ON clients BEGIN
+        {_ENSURE_SUMMARY_ROW.format(ref='NEW')}
+        UPDATE admin_summary SET {_summary_delta('NEW', '+')} WHERE admin_id = NEW.admin_id;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS clients_summary_delete AFTER DELETE ON clients BEGIN
+        UPDATE admin_summary SET {_summary_delta('OLD', '-')} WHERE admin_id = OLD.admin_id;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS clients_summary_update
+    AFTER UPDATE OF admin_id, total_amount, remaining_balance, due_date ON clients BEGIN
+        UPDATE admin_summary SET {_summary_delta('OLD', '-')} WHERE admin_id = OLD.admin_id;
+        {_ENSURE_SUMMARY_ROW.format(ref='NEW')}
+        UPDATE admin_summary SET {_summary_delta('NEW', '+')} WHERE admin_id = NEW.admin_id;
+    END''',
+]
+
+def create_admin_summary_schema(db):
+    for sql in ADMIN_SUMMARY_SCHEMA:
+        db.execute(sql)
+
+ARCHIVED_SUMMARY_SQL = '''
+    SELECT COUNT(*) AS clients, COALESCE(SUM(total_amount), 0) AS debt,
+           COALESCE(SUM(remaining_balance), 0) AS outstanding
+    FROM archived_clients WHERE admin_id = :admin_id
+'''
+HOT_QUERIES.append(('archived_summary', ARCHIVED_SUMMARY_SQL, {'admin_id': 1}))
+
+def _write_admin_summary(db, admin_id, today):
+    """Recompute one admin's statuses and summary row (caller owns the transaction)"""
+    refresh_client_statuses(db, today, admin_id=admin_id)
+    summary = get_client_summary(db, admin_id, today)
+    columns = ', '.join(SUMMARY_COUNTERS)
+    placeholders = ', '.join('?' for _ in SUMMARY_COUNTERS)
+    db.execute(f'''
+        INSERT OR REPLACE INTO admin_summary (admin_id, as_of_date, {columns})
+        VALUES (?, ?, {placeholders})
+    ''', (admin_id, today.strftime('%Y-%m-%d'), *[summary[key] for key in SUMMARY_COUNTERS]))
+    summary['as_of_date'] = today.strftime('%Y-%m-%d')
+    return summary
+
+def roll_over_admin_summary(db, admin_id, today=None):
+    """Move an admin's client statuses and summary to a new calendar day, atomically"""
+    today = today or date.today()
+    if db.in_transaction:
+        # Part of the caller's write; it commits or rolls back with it
+        return _write_admin_summary(db, admin_id, today)
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        summary = _write_admin_summary(db, admin_id, today)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return summary
+
+def get_admin_summary(db, admin_id, today=None):
+    """O(1) summary lookup, rolling the row over first if it is from an earlier day.
+
+    Also the guard to call before trusting clients.status for an admin: a
+    rolled-over summary implies that admin's statuses are current.
+    """
+    today = today or date.today()
+    cursor = db.execute('SELECT * FROM admin_summary WHERE admin_id = ?', (admin_id,))
+    row = cursor.fetchone()
+    if row is None or row['as_of_date'] != today.strftime('%Y-%m-%d'):
+        return roll_over_admin_summary(db, admin_id, today)
+    return dict(row)
+
+def roll_over_all_admin_summaries(db, today=None):
+    """Nightly sweep: move every admin's statuses and summary not yet on today"""
+    today = today or date.today()
+    cursor = db.execute('''
+        SELECT admin_id FROM admin_summary WHERE as_of_date != ?
+        UNION
+        SELECT id FROM admins WHERE id NOT IN (SELECT admin_id FROM admin_summary)
+    ''', (today.strftime('%Y-%m-%d'),))
+    admin_ids = [row[0] for row in cursor.fetchall()]
+    for admin_id in admin_ids:
+        roll_over_admin_summary(db, admin_id, today)
+    return len(admin_ids)
+
+def diff_admin_summary(db, admin_id, today=None):
+    """Compare the stored counters with a fresh aggregate; returns {counter: (stored, actual)}"""
+    today = today or date.today()
+    stored = get_admin_summary(db, admin_id, today)
+    actual = get_client_summary(db, admin_id, today)
+    diffs = {}
+    for key in SUMMARY_COUNTERS:
+        if abs((stored[key] or 0) - (actual[key] or 0)) > 0.005:
+            diffs[key] = (stored[key], actual[key])
+    return diffs
+
+@app.cli.command('nightly-sweep')
+def nightly_sweep_command():
+    """Refresh client statuses and summary counters for the new day"""
+    if DB_BACKEND == 'mysql':
+        repo = MySQLRepository()
+        try:
+            count = repo.refresh_statuses()
+            repo.commit()
+        finally:
+            repo.close()
+        print(f"Refreshed {count} client status(es) for {date.today().strftime('%Y-%m-%d')}")
+        return
+    count = sum(roll_over_all_admin_summaries(_pooled_db(database)) for database in all_databases())
+    print(f"Rolled over {count} admin(s) to {date.today().strftime('%Y-%m-%d')}")
+
+@app.cli.command('check-summaries')
+@click.option('--fix', is_flag=True, help='Rebuild rows that differ from the live aggregate.')
+def check_summaries_command(fix):
+    """Rebuild each admin summary in memory and diff it against the stored counters"""
+    if DB_BACKEND != 'sqlite':
+        sys.exit('check-summaries only supports the SQLite backend')
+    today = date.today()
+    mismatched = 0
+    for database in all_databases():
+        db = _pooled_db(database)
+        for row in db.execute('SELECT id FROM admins').fetchall():
+            diffs = diff_admin_summary(db, row['id'], today)
+            if diffs:
+                mismatched += 1
+                for key, (stored, actual) in diffs.items():
+                    print(f"{database} admin {row['id']}: {key} stored={stored} actual={actual}")
+                if fix:
+                    roll_over_admin_summary(db, row['id'], today)
+    print(f"{mismatched} admin summar{'y' if mismatched == 1 else 'ies'} out of sync" + (' (fixed)' if fix and mismatched else ''))
+    if mismatched and not fix:
+        sys.exit(1)
+
+def chart_percentages(counts):
+    """Integer percentages for a dict of counts that always add up to 100.
+
+    Uses the largest-remainder method so rounding never over- or under-shoots.
+    """
+    total = sum(counts.values())
+    if total == 0:
+        return {key: 0 for key in counts}
+
+    exact = {key: count * 100 / total for key, count in counts.items()}
+    percentages = {key: int(value) for key, value in exact.items()}
+    shortfall = 100 - sum(percentages.values())
+    for key in sorted(exact, key=lambda k: exact[k] - percentages[k], reverse=True)[:shortfall]:
+        percentages[key] += 1
+    return percentages
+
+def build_chart_data(summary):
+    """Chart payload shared by the dashboard and clients pages"""
+    counts = {
+        'paid': summary['paid_count'],
+        'pending': summary['pending_count'],
+        'overdue': summary['overdue_count']
+    }
+    percentages = chart_percentages(counts)
+    return {key: {'count': counts[key], 'percentage': percentages[key]} for key in counts}
+
 @app.route('/dashboard')
 @login_required
 def dashboard():
     try:
-        db = get_db()
-        
-        # Get statistics
-        cursor = db.execute('SELECT COUNT(*) as total_clients FROM clients WHERE admin_id = ?', (session['admin_id'],))
-        total_clients = cursor.fetchone()['total_clients']
-        
-        cursor = db.execute('SELECT SUM(total_amount) as total_debt FROM clients WHERE admin_id = ?', (session['admin_id'],))
-        result = cursor.fetchone()
-        total_debt = result['total_debt'] if result['total_debt'] else 0
-        
-        cursor = db.execute('SELECT SUM(remaining_balance) as total_outstanding FROM clients WHERE admin_id = ?', (session['admin_id'],))
-        result = cursor.fetchone()
-        total_outstanding = result['total_outstanding'] if result['total_outstanding'] else 0
-        
-        # Get all clients for chart calculation
-        cursor = db.execute('SELECT * FROM clients WHERE admin_id = ?', (session['admin_id'],))
-        all_clients = cursor.fetchall()
-        
-        # Calculate chart data
+        repo = get_repository()
         today = datetime.now().date()
-        paid_count = 0
-        pending_count = 0
-        overdue_count = 0
-
-        for client in all_clients:
-            if client['remaining_balance'] <= 0:
-                paid_count += 1
-            elif client['due_date']:
-                try:
-                    client_due_date = datetime.strptime(client['due_date'], '%Y-%m-%d').date()
-                    days_diff = (client_due_date - today).days
-                    if days_diff < 0:
-                        overdue_count += 1
-                    else:
-                        pending_count += 1
-                except ValueError:
-                    if client['remaining_balance'] > 0:
-                        pending_count += 1
-                    else:
-                        paid_count += 1
-            else:
-                # No due date but has remaining balance
-                if client['remaining_balance'] > 0:
-                    pending_count += 1
-                else:
-                    paid_count += 1
-
-        # Calculate percentages for chart
-        if total_clients > 0:
-            paid_percentage = round((paid_count / total_clients) * 100, 1)
-            pending_percentage = round((pending_count / total_clients) * 100, 1)
-            overdue_percentage = round((overdue_count / total_clients) * 100, 1)
-            
-            # Adjust for rounding errors to ensure total is 100%
-            total_percentage = paid_percentage + pending_percentage + overdue_percentage
-            if total_percentage != 100:
-                # Add the difference to the largest percentage
-                max_key = max([('paid', paid_percentage), ('pending', pending_percentage), ('overdue', overdue_percentage)], key=lambda x: x[1])[0]
-                if max_key == 'paid':
-                    paid_percentage += (100 - total_percentage)
-                elif max_key == 'pending':
-                    pending_percentage += (100 - total_percentage)
-                else:
-                    overdue_percentage += (100 - total_percentage)
-        else:
-            paid_percentage = pending_percentage = overdue_percentage = 0
 
-        chart_data = {
-            'paid': {'count': paid_count, 'percentage': int(paid_percentage)},
-            'pending': {'count': pending_count, 'percentage': int(pending_percentage)},
-            'overdue': {'count': overdue_count, 'percentage': int(overdue_percentage)}
-        }
+        summary = repo.client_summary(session['admin_id'], today)
+        total_clients = summary['total_clients']
+        total_debt = summary['total_debt']
+        total_outstanding = summary['total_outstanding']
+        chart_data = build_chart_data(summary)
         
         # Get clients with due payments (today, yesterday, tomorrow)
-        yesterday = today - timedelta(days=1)
-        tomorrow = today + timedelta(days=1)
-        
-        cursor = db.execute('''
-            SELECT * FROM clients 
-            WHERE admin_id = ? AND due_date IN (?, ?, ?) AND remaining_balance > 0
-            ORDER BY due_date
-        ''', (session['admin_id'], yesterday.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'), tomorrow.strftime('%Y-%m-%d')))
-        
-        due_clients = cursor.fetchall()
+        due_clients = repo.due_clients(session['admin_id'], today)
         
-        # Add status calculation for each due client
-        for client in due_clients:
-            if client['due_date']:
-                try:
-                    client_due_date = datetime.strptime(client['due_date'], '%Y-%m-%d').date()
-                    days_diff = (client_due_date - today).days
-                    
-                    if days_diff < 0:
-                        client = dict(client)
-                        client['status'] = 'overdue'
-                        client['status_text'] = 'Overdue'
-                    elif days_diff == 0:
-                        client = dict(client)
-                        client['status'] = 'due_today'
-                        client['status_text'] = 'Due Today'
-                    else:
-                        client = dict(client)
-                        client['status'] = 'due_tomorrow'
-                        client['status_text'] = 'Due Tomorrow'
-                except ValueError:
-                    client = dict(client)
-                    client['status'] = 'pending'
-                    client['status_text'] = 'Pending'
+        # Status is materialized on the row; add the display label
+        due_clients = [dict(client, status_text=STATUS_LABELS.get(client['status'], 'Pending'))
+                       for client in due_clients]
         
         stats = {
             'total_clients': total_clients,
@@ -812,114 +3199,884 @@ def dashboard():
 @app.route('/clients')
 @login_required
 def clients():
+    # Rows are fetched page by page from /api/clients; only the totals are rendered here
+    try:
+        summary = get_repository().client_summary(session['admin_id'])
+        chart_data = build_chart_data(summary)
+        
+        return render_template('clients.html', total_clients=summary['total_clients'],
+                               chart_data=chart_data, page_size=CLIENT_PAGE_SIZE)
+    except Exception as e:
+        print(f"Clients error: {e}")
+        return render_template('clients.html', total_clients=0, page_size=CLIENT_PAGE_SIZE, chart_data={
+            'paid': {'count': 0, 'percentage': 0},
+            'pending': {'count': 0, 'percentage': 0},
+            'overdue': {'count': 0, 'percentage': 0}
+        })
+
+# Keyset-paginated client listing
+#
+# Pages are addressed by an opaque cursor holding the last row's sort value and
+# id, so every page is an index seek no matter how deep the client scrolls.
+CLIENT_PAGE_SIZE = 50
+CLIENT_PAGE_SIZE_MAX = 200
+
+# Sort expressions must match the migration 6 indexes exactly. due_date sorts
+# as IFNULL(due_date, '') so missing dates lead ascending and trail descending
+# without NULL special cases in the keyset condition.
+CLIENT_SORT_COLUMNS = {
+    'created_at': 'created_at',
+    'name': 'name COLLATE NOCASE',
+    'due_date': "IFNULL(due_date, '')",
+    'balance': 'remaining_balance'
+}
+
+CLIENT_LIST_COLUMNS = '''
+    id, name, phone, products, total_amount, remaining_balance, due_date,
+    status, days_overdue, created_at
+'''
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def decode_cursor(token, size):
+    """Decode an encode_cursor() token that must hold a list of size values"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError('invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('invalid cursor')
+    return values
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def parse_page_limit(value):
+    """Clamp a page-size argument to 1..CLIENT_PAGE_SIZE_MAX"""
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, CLIENT_PAGE_SIZE_MAX))
+
+def _keyset_condition(expr, descending):
+    """WHERE fragment selecting rows after (:cursor_value, :cursor_id) in ORDER BY expr, id"""
+    op = '<' if descending else '>'
+    return f'({expr} {op} :cursor_value OR ({expr} = :cursor_value AND id {op} :cursor_id))'
+
+def parse_client_filters(args):
+    """Validate listing filters from query-string args"""
+    filters = {}
+    statuses = [value for value in args.get('status', '').split(',') if value]
+    for value in statuses:
+        if value not in CLIENT_STATUSES:
+            raise ValueError(f'Unknown status: {value}')
+    if statuses:
+        filters['status'] = statuses
+    for key in ('min_days_overdue', 'max_days_overdue'):
+        if args.get(key, '') != '':
+            try:
+                filters[key] = int(args[key])
+            except ValueError:
+                raise ValueError(f'{key} must be an integer')
+    if args.get('has_phone') in ('0', '1'):
+        filters['has_phone'] = args['has_phone'] == '1'
+    if args.get('include_archived') in ('1', 'true'):
+        filters['include_archived'] = True
+    return filters
+
+def client_filter_sql(filters, params):
+    """WHERE fragments for parse_client_filters() output; fills params in place"""
+    conditions = []
+    if 'status' in filters:
+        placeholders = ', '.join(f':status{i}' for i in range(len(filters['status'])))
+        conditions.append(f'status IN ({placeholders})')
+        params.update({f'status{i}': value for i, value in enumerate(filters['status'])})
+    if 'min_days_overdue' in filters:
+        conditions.append('days_overdue >= :min_days_overdue')
+        params['min_days_overdue'] = filters['min_days_overdue']
+    if 'max_days_overdue' in filters:
+        conditions.append('days_overdue <= :max_days_overdue')
+        params['max_days_overdue'] = filters['max_days_overdue']
+    if filters.get('has_phone') is True:
+        conditions.append("phone IS NOT NULL AND phone != ''")
+    elif filters.get('has_phone') is False:
+        conditions.append("(phone IS NULL OR phone = '')")
+    return conditions
+
+def list_clients_page(repo, admin_id, sort='created_at', order='desc', limit=CLIENT_PAGE_SIZE,
+                      cursor=None, filters=None):
+    """Return (rows, next_cursor) for one page of an admin's clients"""
+    if sort not in repo.sort_columns:
+        raise ValueError(f'Cannot sort by {sort}')
+    if order not in ('asc', 'desc'):
+        raise ValueError('order must be asc or desc')
+    limit = parse_page_limit(limit)
+    sort_expr = repo.sort_columns[sort]
+    descending = order == 'desc'
+
+    params = {'admin_id': admin_id, 'limit': limit + 1}
+    conditions = ['admin_id = :admin_id'] + client_filter_sql(filters or {}, params)
+    if cursor:
+        cursor_sort, cursor_order, cursor_value, cursor_id = decode_cursor(cursor, 4)
+        if not _is_int(cursor_id) or not isinstance(cursor_value, (str, int, float)):
+            raise ValueError('invalid cursor')
+        if (cursor_sort, cursor_order) != (sort, order):
+            raise ValueError('Cursor does not match the requested sort')
+        conditions.append(_keyset_condition(sort_expr, descending))
+        params.update({'cursor_value': cursor_value, 'cursor_id': cursor_id})
+
+    direction = 'DESC' if descending else 'ASC'
+    if (filters or {}).get('include_archived'):
+        if not repo.has_archive:
+            raise ValueError('include_archived is not available with this backend')
+        # A compound ORDER BY merges the two index-ordered scans
+        where = ' AND '.join(conditions)
+        rows = repo.fetchall(f'''
+            SELECT {CLIENT_LIST_COLUMNS}, {sort_expr} AS sort_value, 0 AS archived FROM clients WHERE {where}
+            UNION ALL
+            SELECT {CLIENT_LIST_COLUMNS}, {sort_expr} AS sort_value, 1 AS archived FROM archived_clients WHERE {where}
+            ORDER BY sort_value {direction}, id {direction}
+            LIMIT :limit
+        ''', params)
+    else:
+        rows = repo.fetchall(f'''
+            SELECT {CLIENT_LIST_COLUMNS}, {sort_expr} AS sort_value FROM clients
+            WHERE {' AND '.join(conditions)}
+            ORDER BY {sort_expr} {direction}, id {direction}
+            LIMIT :limit
+        ''', params)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([sort, order, last['sort_value'], last['id']])
+    for row in rows:
+        del row['sort_value']
+    return rows, next_cursor
+
+HOT_QUERIES.append(('clients_page_by_due_date', f'''
+    SELECT {CLIENT_LIST_COLUMNS} FROM clients
+    WHERE admin_id = :admin_id AND {_keyset_condition(CLIENT_SORT_COLUMNS['due_date'], True)}
+    ORDER BY {CLIENT_SORT_COLUMNS['due_date']} DESC, id DESC LIMIT 51
+''', {'admin_id': 1, 'cursor_value': '2000-01-01', 'cursor_id': 1}))
+HOT_QUERIES.append(('clients_page_by_status', f'''
+    SELECT {CLIENT_LIST_COLUMNS} FROM clients
+    WHERE admin_id = :admin_id AND status IN ('overdue')
+    ORDER BY created_at DESC, id DESC LIMIT 51
+''', {'admin_id': 1}))
+
+@app.route('/api/clients')
+@login_required
+def api_clients():
+    """Keyset-paginated client listing with server-side sort and filters"""
+    try:
+        repo = get_repository()
+        repo.ensure_current_statuses(session['admin_id'])
+        filters = parse_client_filters(request.args)
+        rows, next_cursor = list_clients_page(
+            repo, session['admin_id'],
+            sort=request.args.get('sort', 'created_at'),
+            order=request.args.get('order', 'desc'),
+            limit=request.args.get('limit', CLIENT_PAGE_SIZE),
+            cursor=request.args.get('cursor'),
+            filters=filters
+        )
+        return jsonify({
+            'success': True,
+            'clients': rows,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e), 'clients': []}), 400
+    except Exception as e:
+        print(f"API clients error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to load clients', 'clients': []})
+
+# Client full-text search
+#
+# clients_fts mirrors name, products and phone for every client, keyed by the
+# client id. Each row also carries a tenant token ('a<admin_id>') so the MATCH
+# itself is scoped to one admin instead of filtering a global result set.
+CLIENT_SEARCH_PAGE_SIZE = 20
+
+# bm25 column weights: tenant, name, products, phone_digits
+CLIENT_SEARCH_WEIGHTS = (0.0, 10.0, 2.0, 5.0)
+
+def _phone_digits_sql(ref):
+    """SQL for the searchable phone tokens of {ref}.phone
+
+    Separators are stripped, and the number is indexed in international
+    (63...), national (09...) and subscriber (9...) forms so a prefix typed in
+    any of them matches.
+    """
+    digits = f"{ref}.phone"
+    for char in (' ', '-', '(', ')', '+', '.'):
+        digits = f"replace({digits}, '{char}', '')"
+    digits = f"COALESCE({digits}, '')"
+    return f'''({digits} || CASE
+        WHEN {digits} LIKE '63%' THEN ' ' || substr({digits}, 3) || ' 0' || substr({digits}, 3)
+        WHEN {digits} LIKE '0%' THEN ' ' || substr({digits}, 2) || ' 63' || substr({digits}, 2)
+        ELSE ''
+    END)'''
+
+def _client_search_values(ref):
+    return f"{ref}.id, 'a' || {ref}.admin_id, {ref}.name, COALESCE({ref}.products, ''), {_phone_digits_sql(ref)}"
+
+CLIENT_SEARCH_SCHEMA = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS clients_fts USING fts5(
+        tenant, name, products, phone_digits,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3 4'
+    )''',
+    f'''CREATE TRIGGER IF NOT EXISTS clients_search_insert AFTER INSERT ON clients BEGIN
+        INSERT INTO clients_fts (rowid, tenant, name, products, phone_digits)
+        VALUES ({_client_search_values('NEW')});
+    END''',
+    '''CREATE TRIGGER IF NOT EXISTS clients_search_delete AFTER DELETE ON clients BEGIN
+        DELETE FROM clients_fts WHERE rowid = OLD.id;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS clients_search_update
+    AFTER UPDATE OF admin_id, name, products, phone ON clients BEGIN
+        DELETE FROM clients_fts WHERE rowid = OLD.id;
+        INSERT INTO clients_fts (rowid, tenant, name, products, phone_digits)
+        VALUES ({_client_search_values('NEW')});
+    END''',
+]
+
+def create_client_search_schema(db):
+    for sql in CLIENT_SEARCH_SCHEMA:
+        db.execute(sql)
+
+def rebuild_client_search_index(db):
+    """Repopulate clients_fts from clients (caller owns the transaction)"""
+    db.execute('DELETE FROM clients_fts')
+    db.execute(f'''
+        INSERT INTO clients_fts (rowid, tenant, name, products, phone_digits)
+        SELECT {_client_search_values('clients')} FROM clients
+    ''')
+
+PHONE_QUERY = re.compile(r'^[\d\s().+-]+$')
+
+def build_search_match(query, admin_id):
+    """Turn free text into an FTS5 MATCH expression scoped to one admin
+
+    Every term is quoted (so user input cannot inject FTS syntax) and
+    prefix-matched for type-ahead. A query that looks like a phone number is
+    collapsed into a single digit string first.
+    """
+    query = (query or '').strip()
+    if PHONE_QUERY.match(query):
+        terms = [re.sub(r'\D', '', query)]
+    else:
+        terms = re.findall(r'\w+', query.lower())
+    terms = [term for term in terms if term]
+    if not terms:
+        raise ValueError('Search query is empty')
+    phrases = ' AND '.join(f'"{term}"*' for term in terms)
+    return f'tenant : "a{int(admin_id)}" AND {{name products phone_digits}} : ({phrases})'
+
+CLIENT_SEARCH_SQL = f'''
+    SELECT {', '.join('c.' + column.strip() for column in CLIENT_LIST_COLUMNS.split(','))}
+    FROM clients_fts JOIN clients c ON c.id = clients_fts.rowid
+    WHERE clients_fts MATCH :match AND c.admin_id = :admin_id {{conditions}}
+    ORDER BY bm25(clients_fts, {', '.join(str(weight) for weight in CLIENT_SEARCH_WEIGHTS)}), c.id
+    LIMIT :limit OFFSET :offset
+'''
+
+HOT_QUERIES.append(('clients_search', CLIENT_SEARCH_SQL.format(conditions=''),
+                    {'match': build_search_match('ana', 1), 'admin_id': 1, 'limit': 21, 'offset': 0}))
+
+def search_clients(db, admin_id, query, limit=CLIENT_SEARCH_PAGE_SIZE, cursor=None, filters=None):
+    """Return (rows, next_cursor) for one page of ranked search results
+
+    Ranked results have no stable sort key to seek from, so the cursor
+    carries the query and an offset; it is rejected if the query changes.
+    """
+    limit = parse_page_limit(limit)
+    match = build_search_match(query, admin_id)
+    offset = 0
+    if cursor:
+        cursor_match, offset = decode_cursor(cursor, 2)
+        if not _is_int(offset) or offset < 0:
+            raise ValueError('invalid cursor')
+        if cursor_match != match:
+            raise ValueError('Cursor does not match the search query')
+
+    params = {'match': match, 'admin_id': admin_id, 'limit': limit + 1, 'offset': offset}
+    conditions = ''.join(f' AND {condition}' for condition in client_filter_sql(filters or {}, params))
+    rows = db.execute(CLIENT_SEARCH_SQL.format(conditions=conditions), params).fetchall()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([match, offset + limit])
+    return [dict(row) for row in rows], next_cursor
+
+@app.route('/api/clients/search')
+@login_required
+@sqlite_only
+def api_clients_search():
+    """Ranked, paginated full-text search over the admin's clients"""
+    try:
+        db = get_db()
+        get_admin_summary(db, session['admin_id'])  # makes statuses current
+        filters = parse_client_filters(request.args)
+        rows, next_cursor = search_clients(
+            db, session['admin_id'], request.args.get('q', ''),
+            limit=request.args.get('limit', CLIENT_SEARCH_PAGE_SIZE),
+            cursor=request.args.get('cursor'),
+            filters=filters
+        )
+        return jsonify({
+            'success': True,
+            'clients': rows,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e), 'clients': []}), 400
+    except Exception as e:
+        print(f"Client search error: {e}")
+        return jsonify({'success': False, 'message': 'Search failed', 'clients': []})
+
+# Streaming exports
+#
+# Rows are read in EXPORT_BATCH_SIZE batches from one server-side cursor and
+# written out as they arrive, so memory stays flat and the download starts at
+# once however many rows there are. The generator holds its own pooled
+# connection because it keeps running after the view has returned.
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+CLIENT_EXPORT_COLUMNS = ('id', 'name', 'phone', 'products', 'total_amount', 'remaining_balance',
+                         'due_date', 'status', 'days_overdue', 'created_at')
+REMINDER_EXPORT_COLUMNS = ('id', 'client_id', 'client_name', 'phone', 'method', 'sent_at')
+
+def parse_date_range(args, prefix):
+    """Validate optional <prefix>_from / <prefix>_to query args as canonical dates"""
+    bounds = {}
+    for key in (f'{prefix}_from', f'{prefix}_to'):
+        try:
+            value = parse_due_date(args.get(key))
+        except ValueError:
+            raise ValueError(f'{key} must be a date (YYYY-MM-DD)')
+        if value:
+            bounds[key] = value
+    return bounds
+
+def stream_rows(repo, sql, params, columns, fmt):
+    """Yield an export body chunk per batch of rows"""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+    for rows in repo.iter_rows(sql, params, EXPORT_BATCH_SIZE):
+        if fmt == 'csv':
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows([row[column] for column in columns] for row in rows)
+            yield buffer.getvalue()
+        else:
+            yield ''.join(json.dumps(row) + '\n' for row in rows)
+
+def export_response(name, sql, params, columns):
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError('format must be csv or ndjson')
+    filename = f"{name}_export_{date.today().isoformat()}.{fmt}"
+    rows = stream_rows(get_repository(), sql, params, columns, fmt)
+    return Response(rows, mimetype=EXPORT_FORMATS[fmt], headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no'  # let proxies pass chunks straight through
+    })
+
+@app.route('/export/clients')
+@login_required
+def export_clients():
+    """Stream the admin's clients as CSV or NDJSON (same filters as /api/clients)"""
+    try:
+        get_repository().ensure_current_statuses(session['admin_id'])
+        params = {'admin_id': session['admin_id']}
+        filters = parse_client_filters(request.args)
+        conditions = ['admin_id = :admin_id'] + client_filter_sql(filters, params)
+        params.update(parse_date_range(request.args, 'due'))
+        if 'due_from' in params:
+            conditions.append('due_date >= :due_from')
+        if 'due_to' in params:
+            conditions.append('due_date <= :due_to')
+        columns, where = ', '.join(CLIENT_EXPORT_COLUMNS), ' AND '.join(conditions)
+        if filters.get('include_archived'):
+            if not get_repository().has_archive:
+                raise ValueError('include_archived is not available with this backend')
+            sql = f'''
+                SELECT {columns}, 0 AS archived FROM clients WHERE {where}
+                UNION ALL
+                SELECT {columns}, 1 AS archived FROM archived_clients WHERE {where}
+                ORDER BY created_at, id
+            '''
+            return export_response('clients', sql, params, CLIENT_EXPORT_COLUMNS + ('archived',))
+        sql = f'''
+            SELECT {columns} FROM clients
+            WHERE {where}
+            ORDER BY created_at, id
+        '''
+        return export_response('clients', sql, params, CLIENT_EXPORT_COLUMNS)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+@app.route('/export/sms_reminders')
+@login_required
+def export_sms_reminders():
+    """Stream the admin's reminder history as CSV or NDJSON"""
     try:
-        db = get_db()
-        cursor = db.execute('SELECT * FROM clients WHERE admin_id = ? ORDER BY created_at DESC', (session['admin_id'],))
-        clients = cursor.fetchall()
-        
-        # Add days_diff calculation for each client
-        today = date.today()
-        
-        # Initialize counters for chart data
-        paid_count = 0
-        pending_count = 0
-        overdue_count = 0
-        
-        clients_list = []
-        for client in clients:
-            client_dict = dict(client)
-            if client['due_date']:
-                try:
-                    client_due_date = datetime.strptime(client['due_date'], '%Y-%m-%d').date()
-                    client_dict['days_diff'] = (client_due_date - today).days
-                except ValueError:
-                    client_dict['days_diff'] = None
-            else:
-                client_dict['days_diff'] = None
-            
-            # Calculate chart data based on payment status
-            if client['remaining_balance'] <= 0:
-                paid_count += 1
-            elif client_dict['days_diff'] is not None and client_dict['days_diff'] < 0:
-                overdue_count += 1
-            else:
-                pending_count += 1
-            
-            clients_list.append(client_dict)
-        
-        # Calculate percentages for chart
-        total_clients = len(clients)
-        if total_clients > 0:
-            paid_percentage = round((paid_count / total_clients) * 100)
-            pending_percentage = round((pending_count / total_clients) * 100)
-            overdue_percentage = round((overdue_count / total_clients) * 100)
-            
-            # Ensure percentages add up to 100
-            total_percentage = paid_percentage + pending_percentage + overdue_percentage
-            if total_percentage != 100:
-                paid_percentage += (100 - total_percentage)
+        params = {'admin_id': session['admin_id']}
+        conditions = ['c.admin_id = :admin_id']
+        params.update(parse_date_range(request.args, 'sent'))
+        if 'sent_from' in params:
+            conditions.append('r.sent_at >= :sent_from')
+        if 'sent_to' in params:
+            conditions.append('r.sent_at < :sent_before')
+            params['sent_before'] = (date.fromisoformat(params.pop('sent_to')) + timedelta(days=1)).isoformat()
+        if request.args.get('client_id'):
+            conditions.append('r.client_id = :client_id')
+            try:
+                params['client_id'] = int(request.args['client_id'])
+            except ValueError:
+                raise ValueError('client_id must be an integer')
+        select = 'SELECT r.id, r.client_id, c.name AS client_name, c.phone, r.method, r.sent_at'
+        where = ' AND '.join(conditions)
+        if request.args.get('include_archived') in ('1', 'true'):
+            if not get_repository().has_archive:
+                raise ValueError('include_archived is not available with this backend')
+            sql = f'''
+                {select} FROM clients c JOIN sms_reminders r ON r.client_id = c.id WHERE {where}
+                UNION ALL
+                {select} FROM archived_clients c JOIN archived_sms_reminders r ON r.client_id = c.id WHERE {where}
+                ORDER BY client_id, sent_at
+            '''
         else:
-            paid_percentage = pending_percentage = overdue_percentage = 0
-        
-        chart_data = {
-            'paid': {'count': paid_count, 'percentage': paid_percentage},
-            'pending': {'count': pending_count, 'percentage': pending_percentage},
-            'overdue': {'count': overdue_count, 'percentage': overdue_percentage}
-        }
-        
-        return render_template('clients.html', clients=clients_list, chart_data=chart_data)
-    except Exception as e:
-        print(f"Clients error: {e}")
-        return render_template('clients.html', clients=[], chart_data={
-            'paid': {'count': 0, 'percentage': 0},
-            'pending': {'count': 0, 'percentage': 0},
-            'overdue': {'count': 0, 'percentage': 0}
-        })
+            sql = f'''
+                {select}
+                FROM clients c JOIN sms_reminders r ON r.client_id = c.id
+                WHERE {where}
+                ORDER BY c.created_at, c.id, r.sent_at
+            '''
+        return export_response('sms_reminders', sql, params, REMINDER_EXPORT_COLUMNS)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+HOT_QUERIES.append(('export_clients', f'''
+    SELECT {', '.join(CLIENT_EXPORT_COLUMNS)} FROM clients
+    WHERE admin_id = :admin_id ORDER BY created_at, id
+''', {'admin_id': 1}))
+HOT_QUERIES.append(('export_sms_reminders', '''
+    SELECT r.id, r.client_id, c.name AS client_name, c.phone, r.method, r.sent_at
+    FROM clients c JOIN sms_reminders r ON r.client_id = c.id
+    WHERE c.admin_id = :admin_id ORDER BY c.created_at, c.id, r.sent_at
+''', {'admin_id': 1}))
+
+# Payments ledger
+#
+# Every payment is a row in payments carrying the client's balance after it,
+# written in the same transaction as the balance change. clients.paid_at is
+# kept by triggers (migration 8) and stamps when the balance reaches zero.
+PAYMENT_METHODS = ('cash', 'gcash', 'bank_transfer', 'other')
+
+def record_payment(db, admin_id, client_id, amount=None, method='cash', note=None):
+    """Record a payment and apply it to the client's balance (caller owns the transaction)
+
+    amount=None settles the full remaining balance. Raises ValueError for an
+    unknown client, a settled client or an overpayment.
+    """
+    if method not in PAYMENT_METHODS:
+        raise ValueError(f"Payment method must be one of: {', '.join(PAYMENT_METHODS)}")
+    if amount is not None and amount <= 0:
+        raise ValueError('Payment amount must be greater than zero')
+    params = {'client_id': client_id, 'admin_id': admin_id, 'amount': amount, 'method': method, 'note': note}
+
+    cursor = db.execute('''
+        INSERT INTO payments (client_id, admin_id, amount, method, note, balance_after)
+        SELECT id, admin_id, COALESCE(:amount, remaining_balance), :method, :note,
+               ROUND(remaining_balance - COALESCE(:amount, remaining_balance), 2)
+        FROM clients
+        WHERE id = :client_id AND admin_id = :admin_id AND remaining_balance > 0
+        AND ROUND(remaining_balance - COALESCE(:amount, remaining_balance), 2) >= 0
+    ''', params)
+    if cursor.rowcount == 0:
+        client = db.execute('SELECT remaining_balance FROM clients WHERE id = ? AND admin_id = ?',
+                            (client_id, admin_id)).fetchone()
+        if client is None:
+            raise ValueError('Client not found')
+        if client['remaining_balance'] <= 0:
+            raise ValueError('Client has no remaining balance')
+        raise ValueError(f"Payment exceeds the remaining balance of P{client['remaining_balance']:.2f}")
+    payment_id = cursor.lastrowid
+
+    db.execute('''
+        UPDATE clients SET remaining_balance = (SELECT balance_after FROM payments WHERE id = ?)
+        WHERE id = ?
+    ''', (payment_id, client_id))
+    refresh_client_statuses(db, client_ids=[client_id])
+    return dict(db.execute('SELECT * FROM payments WHERE id = ?', (payment_id,)).fetchone())
 
 # Mark as paid endpoint
 @app.route('/mark_as_paid/<int:client_id>', methods=['PUT'])
 @login_required
 def mark_as_paid(client_id):
     try:
-        db = get_db()
-        db.execute('''
-            UPDATE clients 
-            SET remaining_balance = 0
-            WHERE id = ? AND admin_id = ?
-        ''', (client_id, session['admin_id']))
-        db.commit()
+        data = request.get_json(silent=True) or {}
+        repo = get_repository()
+        repo.mark_paid(session['admin_id'], client_id, method=data.get('method', 'cash'))
+        repo.commit()
         
         return jsonify({'success': True, 'message': 'Client marked as fully paid!'})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)})
     except Exception as e:
         print(f"Mark as paid error: {e}")
         return jsonify({'success': False, 'message': 'Failed to mark client as paid!'})
 
+@app.route('/record_payment/<int:client_id>', methods=['POST'])
+@login_required
+@sqlite_only
+def record_payment_route(client_id):
+    """Record a full or partial payment against a client's balance"""
+    try:
+        data = request.get_json() or {}
+        try:
+            amount = _parse_amount(data.get('amount', ''), 'Payment amount')
+            db = get_db()
+            payment = record_payment(db, session['admin_id'], client_id, amount,
+                                     method=data.get('method', 'cash'), note=data.get('note') or None)
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)})
+        db.commit()
+
+        if payment['balance_after'] <= 0:
+            message = 'Payment recorded - client is now fully paid!'
+        else:
+            message = f"Payment recorded - P{payment['balance_after']:.2f} remaining"
+        return jsonify({'success': True, 'message': message, 'payment': payment})
+    except Exception as e:
+        print(f"Record payment error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to record payment!'})
+
+@app.route('/payments/<int:client_id>')
+@login_required
+@sqlite_only
+def client_payments(client_id):
+    """Payment history for one client, newest first"""
+    try:
+        db = get_db()
+        # Archived clients keep their history in archived_payments
+        cursor = db.execute('''
+            SELECT id, amount, method, balance_after, note, paid_at FROM payments
+            WHERE client_id = :client_id AND admin_id = :admin_id
+            UNION ALL
+            SELECT id, amount, method, balance_after, note, paid_at FROM archived_payments
+            WHERE client_id = :client_id AND admin_id = :admin_id
+            ORDER BY paid_at DESC, id DESC
+        ''', {'client_id': client_id, 'admin_id': session['admin_id']})
+        return jsonify({'success': True, 'payments': [dict(row) for row in cursor.fetchall()]})
+    except Exception as e:
+        print(f"Client payments error: {e}")
+        return jsonify({'success': False, 'payments': []})
+
+def get_collection_report(db, admin_id, date_from, date_to):
+    """Collections between two local dates (inclusive), read as a range scan over the ledger
+
+    collection_rate is collected / (collected + balance still outstanding today).
+    """
+    params = {'admin_id': admin_id, 'date_from': date_from, 'date_to': date_to}
+    # Payments of archived clients still count towards their period
+    range_sql = '''
+        FROM (
+            SELECT client_id, amount, method, balance_after, paid_at FROM payments
+            WHERE admin_id = :admin_id
+            AND paid_at >= datetime(:date_from, 'utc') AND paid_at < datetime(:date_to, '+1 day', 'utc')
+            UNION ALL
+            SELECT client_id, amount, method, balance_after, paid_at FROM archived_payments
+            WHERE admin_id = :admin_id
+            AND paid_at >= datetime(:date_from, 'utc') AND paid_at < datetime(:date_to, '+1 day', 'utc')
+        )
+    '''
+    totals = db.execute(f'''
+        SELECT COUNT(*) AS payment_count, COALESCE(SUM(amount), 0) AS collected,
+               COUNT(DISTINCT client_id) AS clients_paying,
+               SUM(CASE WHEN balance_after <= 0 THEN 1 ELSE 0 END) AS accounts_settled
+        {range_sql}
+    ''', params).fetchone()
+    by_day = db.execute(f'''
+        SELECT date(paid_at, 'localtime') AS day, COUNT(*) AS payment_count, SUM(amount) AS collected
+        {range_sql} GROUP BY day ORDER BY day
+    ''', params).fetchall()
+    by_method = db.execute(f'''
+        SELECT method, COUNT(*) AS payment_count, SUM(amount) AS collected
+        {range_sql} GROUP BY method ORDER BY collected DESC
+    ''', params).fetchall()
+
+    outstanding = get_admin_summary(db, admin_id)['total_outstanding']
+    collected = totals['collected']
+    return {
+        'from': date_from,
+        'to': date_to,
+        'payment_count': totals['payment_count'],
+        'collected': round(collected, 2),
+        'clients_paying': totals['clients_paying'],
+        'accounts_settled': totals['accounts_settled'] or 0,
+        'outstanding': round(outstanding, 2),
+        'collection_rate': round(collected / (collected + outstanding) * 100, 1) if collected + outstanding > 0 else 0,
+        'by_day': [dict(row) for row in by_day],
+        'by_method': [dict(row) for row in by_method]
+    }
+
+HOT_QUERIES.append(('collection_report', '''
+    SELECT COUNT(*), SUM(amount) FROM payments WHERE admin_id = :admin_id
+    AND paid_at >= datetime(:date_from, 'utc') AND paid_at < datetime(:date_to, '+1 day', 'utc')
+''', {'admin_id': 1, 'date_from': '2000-01-01', 'date_to': '2000-01-31'}))
+
+@app.route('/collection_report')
+@login_required
+@sqlite_only
+def collection_report():
+    """Collected amounts for a date range (defaults to the last 30 days)"""
+    try:
+        today = date.today()
+        date_from = parse_due_date(request.args.get('from')) or (today - timedelta(days=29)).isoformat()
+        date_to = parse_due_date(request.args.get('to')) or today.isoformat()
+        if date_from > date_to:
+            raise ValueError('from must not be after to')
+        report = get_collection_report(get_db(), session['admin_id'], date_from, date_to)
+        return jsonify({'success': True, 'report': report})
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Collection report error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to build collection report'})
+
+# Cold storage
+#
+# Clients settled more than ARCHIVE_AFTER_DAYS ago move, with their reminders
+# and payments, into archived_* tables, so the hot clients table holds only the
+# active book. Archived rows keep their ids and are read-only. Triggers on
+# archived_clients add them back into admin_summary, so totals do not change.
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '180'))
+ARCHIVE_BATCH_SIZE = 1000
+
+# table -> (columns moved, column matched against the batch of client ids)
+ARCHIVED_TABLES = {
+    'clients': (('id', 'admin_id', 'name', 'phone', 'products', 'total_amount', 'remaining_balance',
+                 'due_date', 'status', 'days_overdue', 'paid_at', 'created_at'), 'id'),
+    'sms_reminders': (('id', 'client_id', 'method', 'sent_at'), 'client_id'),
+    'payments': (('id', 'client_id', 'admin_id', 'amount', 'method', 'balance_after', 'note', 'paid_at'), 'client_id'),
+}
+
+def _archive_summary_delta(ref, sign):
+    """SET clause adding (sign=+) or removing (sign=-) one archived, settled client"""
+    return f'''
+        total_clients = total_clients {sign} 1,
+        total_debt = total_debt {sign} {ref}.total_amount,
+        total_outstanding = total_outstanding {sign} {ref}.remaining_balance,
+        paid_count = paid_count {sign} 1,
+        updated_at = CURRENT_TIMESTAMP
+    '''
+
+ARCHIVE_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS archived_clients (
+        id INTEGER PRIMARY KEY,
+        admin_id INTEGER NOT NULL,
+        name TEXT NOT NULL,
+        phone TEXT,
+        products TEXT NOT NULL,
+        total_amount REAL NOT NULL,
+        remaining_balance REAL NOT NULL CHECK (remaining_balance <= 0),
+        due_date DATE,
+        status TEXT,
+        days_overdue INTEGER,
+        paid_at TIMESTAMP,
+        created_at TIMESTAMP,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (admin_id) REFERENCES admins (id) ON DELETE CASCADE
+    )''',
+    '''CREATE TABLE IF NOT EXISTS archived_sms_reminders (
+        id INTEGER PRIMARY KEY,
+        client_id INTEGER NOT NULL,
+        method TEXT NOT NULL DEFAULT 'email_gateway',
+        sent_at TIMESTAMP,
+        FOREIGN KEY (client_id) REFERENCES archived_clients (id) ON DELETE CASCADE
+    )''',
+    '''CREATE TABLE IF NOT EXISTS archived_payments (
+        id INTEGER PRIMARY KEY,
+        client_id INTEGER NOT NULL,
+        admin_id INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        method TEXT NOT NULL DEFAULT 'cash',
+        balance_after REAL NOT NULL,
+        note TEXT,
+        paid_at TIMESTAMP,
+        FOREIGN KEY (client_id) REFERENCES archived_clients (id) ON DELETE CASCADE
+    )''',
+    # Same sort keys as the hot table, so include_archived listings merge two index scans
+    '''CREATE INDEX IF NOT EXISTS idx_archived_clients_admin_created
+       ON archived_clients (admin_id, created_at)''',
+    '''CREATE INDEX IF NOT EXISTS idx_archived_clients_admin_name
+       ON archived_clients (admin_id, name COLLATE NOCASE)''',
+    '''CREATE INDEX IF NOT EXISTS idx_archived_clients_admin_due_sort
+       ON archived_clients (admin_id, IFNULL(due_date, ''))''',
+    '''CREATE INDEX IF NOT EXISTS idx_archived_clients_admin_balance
+       ON archived_clients (admin_id, remaining_balance)''',
+    '''CREATE INDEX IF NOT EXISTS idx_archived_clients_admin_summary
+       ON archived_clients (admin_id, total_amount, remaining_balance)''',
+    '''CREATE INDEX IF NOT EXISTS idx_archived_sms_reminders_client_sent
+       ON archived_sms_reminders (client_id, sent_at)''',
+    '''CREATE INDEX IF NOT EXISTS idx_archived_payments_client_paid
+       ON archived_payments (client_id, paid_at)''',
+    '''CREATE INDEX IF NOT EXISTS idx_archived_payments_admin_paid
+       ON archived_payments (admin_id, paid_at, amount)''',
+    f'''CREATE TRIGGER IF NOT EXISTS archived_clients_summary_insert AFTER INSERT ON archived_clients BEGIN
+        {_ENSURE_SUMMARY_ROW.format(ref='NEW')}
+        UPDATE admin_summary SET {_archive_summary_delta('NEW', '+')} WHERE admin_id = NEW.admin_id;
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS archived_clients_summary_delete AFTER DELETE ON archived_clients BEGIN
+        UPDATE admin_summary SET {_archive_summary_delta('OLD', '-')} WHERE admin_id = OLD.admin_id;
+    END''',
+]
+
+def create_archive_schema(db):
+    for sql in ARCHIVE_SCHEMA:
+        db.execute(sql)
+
+def archive_settled_clients(db, admin_id, older_than_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    """Move an admin's clients settled over N days ago into cold storage; returns the number moved
+
+    Each batch is its own short write transaction, so other writers are only
+    held up for one batch at a time.
+    """
+    params = {'admin_id': admin_id, 'age': f'-{older_than_days} days', 'limit': batch_size}
+    db.execute('CREATE TEMP TABLE IF NOT EXISTS archive_batch (id INTEGER PRIMARY KEY)')
+    moved = 0
+    while True:
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.execute('DELETE FROM temp.archive_batch')
+            count = db.execute('''
+                INSERT INTO temp.archive_batch (id)
+                SELECT id FROM clients
+                WHERE admin_id = :admin_id AND remaining_balance <= 0 AND paid_at < datetime('now', :age)
+                LIMIT :limit
+            ''', params).rowcount
+            if count:
+                for table, (columns, key) in ARCHIVED_TABLES.items():
+                    columns = ', '.join(columns)
+                    db.execute(f'''
+                        INSERT INTO archived_{table} ({columns})
+                        SELECT {columns} FROM {table} WHERE {key} IN (SELECT id FROM temp.archive_batch)
+                    ''')
+                # Reminders and payments go with their clients (ON DELETE CASCADE)
+                db.execute('DELETE FROM clients WHERE id IN (SELECT id FROM temp.archive_batch)')
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        moved += count
+        if count < batch_size:
+            return moved
+
+HOT_QUERIES.append(('archive_candidates', '''
+    SELECT id FROM clients
+    WHERE admin_id = :admin_id AND remaining_balance <= 0 AND paid_at < datetime('now', :age)
+    LIMIT 1000
+''', {'admin_id': 1, 'age': '-180 days'}))
+
+@app.cli.command('archive-clients')
+@click.option('--days', default=ARCHIVE_AFTER_DAYS, show_default=True,
+              help='Archive clients settled more than this many days ago.')
+def archive_clients_command(days):
+    """Move long-settled clients, with their reminders and payments, into the archive tables"""
+    if DB_BACKEND != 'sqlite':
+        sys.exit('archive-clients only supports the SQLite backend')
+    moved = 0
+    for database in all_databases():
+        db = _pooled_db(database)
+        for row in db.execute('SELECT id FROM admins ORDER BY id').fetchall():
+            moved += archive_settled_clients(db, row['id'], days)
+    print(f"Archived {moved} client(s) settled more than {days} day(s) ago")
+
+PHONE_BACKFILL_BATCH_SIZE = int(os.getenv('PHONE_BACKFILL_BATCH_SIZE', '1000'))
+
+def backfill_phone_columns(db, batch_size=PHONE_BACKFILL_BATCH_SIZE):
+    """Fill phone_e164/carrier for clients written before they existed; returns rows updated"""
+    updated = 0
+    last_id = 0
+    while True:
+        rows = db.execute('''
+            SELECT id, phone FROM clients
+            WHERE id > ? AND phone_e164 IS NULL AND phone IS NOT NULL AND phone != ''
+            ORDER BY id LIMIT ?
+        ''', (last_id, batch_size)).fetchall()
+        if not rows:
+            return updated
+        last_id = rows[-1]['id']
+        values = [dict(phone_columns(row['phone']), id=row['id']) for row in rows]
+        values = [value for value in values if value['phone_e164']]  # invalid numbers stay NULL
+        # One short write transaction per batch
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            db.executemany('UPDATE clients SET phone_e164 = :phone_e164, carrier = :carrier WHERE id = :id', values)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        updated += len(values)
+
+@app.cli.command('backfill-phones')
+@click.option('--batch-size', default=PHONE_BACKFILL_BATCH_SIZE, show_default=True,
+              help='Rows normalized per transaction.')
+def backfill_phones_command(batch_size):
+    """Store the E.164 number and carrier of clients saved before those columns existed"""
+    if DB_BACKEND != 'sqlite':
+        sys.exit('backfill-phones only supports the SQLite backend')
+    updated = 0
+    for database in all_databases():
+        updated += backfill_phone_columns(_pooled_db(database), batch_size)
+    print(f"Normalized {updated} phone number(s)")
+
+HOT_QUERIES.append(('client_by_phone', '''
+    SELECT id, carrier FROM clients WHERE phone_e164 = ?
+''', ('+639171234567',)))
+
 @app.route('/add_client', methods=['POST'])
 @login_required
 def add_client():
     try:
         data = request.get_json()
+        try:
+            due_date = parse_due_date(data.get('due_date'))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)})
         
-        db = get_db()
-        cursor = db.execute('''
-            INSERT INTO clients (admin_id, name, phone, products, total_amount, remaining_balance, due_date) 
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            session['admin_id'],
-            data['name'],
-            data['phone'],
-            data['products'],
-            data['total_amount'],
-            data['remaining_balance'],
-            data['due_date']
-        ))
-        
-        client_id = cursor.lastrowid
-        db.commit()
+        repo = get_repository()
+        client_id = repo.create_client(session['admin_id'], {
+            'name': data['name'],
+            'phone': data['phone'],
+            'products': data['products'],
+            'total_amount': data['total_amount'],
+            'remaining_balance': data['remaining_balance'],
+            'due_date': due_date
+        })
+        repo.commit()
         
         # Check if new client needs immediate notification
-        cursor = db.execute('SELECT * FROM clients WHERE id = ?', (client_id,))
-        new_client = cursor.fetchone()
+        new_client = repo.get_client(session['admin_id'], client_id)
         
         if new_client and should_notify_for_client(new_client):
             trigger_payment_notifications(session['admin_id'])
@@ -930,39 +4087,181 @@ def add_client():
         return jsonify({'success': False, 'message': 'Failed to add client!'})
     
 
+# Bulk CSV import
+#
+# The upload is parsed as a stream and inserted in IMPORT_BATCH_SIZE batches
+# inside one transaction. Bad rows are skipped and reported by line number;
+# good rows are committed together.
+#
+# Each batch is executemany'd into a TEMP staging table and moved into clients
+# with a single INSERT ... SELECT. FTS5 flushes its pending terms at every
+# statement savepoint, so inserting into clients row by row would flush the
+# search index once per row through the clients_search_insert trigger.
+IMPORT_BATCH_SIZE = 5000
+IMPORT_MAX_ERRORS = 500  # rows beyond this are still counted, just not itemized
+
+# Accepted header spellings for each clients column
+IMPORT_COLUMN_ALIASES = {
+    'name': ('name', 'client', 'client_name'),
+    'phone': ('phone', 'phone_number', 'mobile'),
+    'products': ('products', 'product', 'items'),
+    'total_amount': ('total_amount', 'total', 'amount'),
+    'remaining_balance': ('remaining_balance', 'balance', 'remaining'),
+    'due_date': ('due_date', 'due')
+}
+
+def _import_header_map(fieldnames):
+    """Map clients columns to the CSV's own header names"""
+    normalized = {name.strip().lower().replace(' ', '_'): name for name in fieldnames or [] if name}
+    mapping = {}
+    for column, aliases in IMPORT_COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in normalized:
+                mapping[column] = normalized[alias]
+                break
+    missing = [column for column in ('name', 'total_amount') if column not in mapping]
+    if missing:
+        raise ValueError(f"CSV is missing required column(s): {', '.join(missing)}")
+    return mapping
+
+def _parse_amount(value, label):
+    try:
+        amount = float(str(value).replace(',', '').strip())
+    except ValueError:
+        raise ValueError(f'{label} must be a number')
+    if amount < 0:
+        raise ValueError(f'{label} cannot be negative')
+    return amount
+
+def parse_import_row(row, mapping):
+    """Validate one CSV row and return the clients insert tuple (without admin_id)"""
+    def field(column):
+        return (row.get(mapping[column]) or '').strip() if column in mapping else ''
+
+    name = field('name')
+    if not name:
+        raise ValueError('Name is required')
+    phone = field('phone')
+    if phone and not validate_phone_number(phone):
+        raise ValueError(f'Invalid phone number: {phone}')
+    total_amount = _parse_amount(field('total_amount'), 'Total amount')
+    balance = field('remaining_balance')
+    remaining_balance = _parse_amount(balance, 'Remaining balance') if balance else total_amount
+    if remaining_balance > total_amount:
+        raise ValueError('Remaining balance cannot exceed the total amount')
+    return (name, phone or None, field('products'), total_amount, remaining_balance,
+            parse_due_date(field('due_date')))
+
+def import_clients_csv(db, admin_id, stream):
+    """Insert valid rows from a CSV text stream and return an import report"""
+    reader = csv.DictReader(stream)
+    mapping = _import_header_map(reader.fieldnames)
+    db.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS client_import_staging (
+            admin_id INTEGER, name TEXT, phone TEXT, products TEXT,
+            total_amount REAL, remaining_balance REAL, due_date DATE,
+            phone_e164 TEXT, carrier TEXT
+        )
+    ''')
+
+    def flush(batch):
+        db.executemany('INSERT INTO temp.client_import_staging VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', batch)
+        db.execute('''
+            INSERT INTO clients (admin_id, name, phone, products, total_amount, remaining_balance, due_date,
+                                 phone_e164, carrier)
+            SELECT admin_id, name, phone, products, total_amount, remaining_balance, due_date, phone_e164, carrier
+            FROM temp.client_import_staging ORDER BY rowid
+        ''')
+        db.execute('DELETE FROM temp.client_import_staging')
+        report['imported'] += len(batch)
+
+    # Rows due by tomorrow are the ones should_notify_for_client() would flag
+    notify_by = (date.today() + timedelta(days=1)).strftime('%Y-%m-%d')
+    report = {'imported': 0, 'error_count': 0, 'errors': [], 'needs_notification': False}
+    batch = []
+
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        for row in reader:
+            try:
+                values = parse_import_row(row, mapping)
+            except ValueError as e:
+                report['error_count'] += 1
+                if len(report['errors']) < IMPORT_MAX_ERRORS:
+                    report['errors'].append({'line': reader.line_num, 'message': str(e)})
+                continue
+            columns = phone_columns(values[1])
+            batch.append((admin_id,) + values + (columns['phone_e164'], columns['carrier']))
+            if values[4] > 0 and values[5] and values[5] <= notify_by:
+                report['needs_notification'] = True
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+        refresh_client_statuses(db, admin_id=admin_id, unset_only=True)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return report
+
+@app.route('/import_clients', methods=['POST'])
+@login_required
+@sqlite_only
+def import_clients():
+    """Bulk-create clients from an uploaded CSV file"""
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'success': False, 'message': 'No CSV file uploaded'}), 400
+    try:
+        db = get_db()
+        get_admin_summary(db, session['admin_id'])  # so the import lands on a current summary row
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        report = import_clients_csv(db, session['admin_id'], stream)
+
+        # One notification check for the whole import instead of one per row
+        if report.pop('needs_notification'):
+            trigger_payment_notifications(session['admin_id'])
+
+        message = f"Imported {report['imported']} client(s)"
+        if report['error_count']:
+            message += f", skipped {report['error_count']} invalid row(s)"
+        return jsonify({'success': True, 'message': message, **report})
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return jsonify({'success': False, 'message': f'Could not read CSV: {e}'}), 400
+    except Exception as e:
+        print(f"Import clients error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to import clients!'})
+
 @app.route('/update_client/<int:client_id>', methods=['PUT'])
 @login_required
 def update_client(client_id):
     try:
         data = request.get_json()
+        try:
+            due_date = parse_due_date(data.get('due_date'))
+        except ValueError as e:
+            return jsonify({'success': False, 'message': str(e)})
         
-        db = get_db()
+        repo = get_repository()
         
         # Get old client data
-        cursor = db.execute('SELECT * FROM clients WHERE id = ? AND admin_id = ?', (client_id, session['admin_id']))
-        old_client = cursor.fetchone()
+        old_client = repo.get_client(session['admin_id'], client_id)
         
         # Update client
-        db.execute('''
-            UPDATE clients 
-            SET name = ?, phone = ?, products = ?, 
-                total_amount = ?, remaining_balance = ?, due_date = ?
-            WHERE id = ? AND admin_id = ?
-        ''', (
-            data['name'],
-            data['phone'],
-            data['products'],
-            data['total_amount'],
-            data['remaining_balance'],
-            data['due_date'],
-            client_id,
-            session['admin_id']
-        ))
-        db.commit()
+        repo.update_client(session['admin_id'], client_id, {
+            'name': data['name'],
+            'phone': data['phone'],
+            'products': data['products'],
+            'total_amount': data['total_amount'],
+            'remaining_balance': data['remaining_balance'],
+            'due_date': due_date
+        })
+        repo.commit()
         
         # Get updated client data
-        cursor = db.execute('SELECT * FROM clients WHERE id = ? AND admin_id = ?', (client_id, session['admin_id']))
-        updated_client = cursor.fetchone()
+        updated_client = repo.get_client(session['admin_id'], client_id)
         
         # Check if update requires notification (due date changed or balance changed)
         if (old_client and updated_client and 
@@ -978,6 +4277,144 @@ def update_client(client_id):
         return jsonify({'success': False, 'message': 'Failed to update client!'})
     
     
+# Bulk client actions
+#
+# One transaction for the whole request and one statement per chunk of ids,
+# always scoped by admin_id so foreign ids are silently ignored.
+BULK_CHUNK_SIZE = 500
+BULK_MAX_IDS = 10000
+
+# operation -> (statement template, whether rows stay and need a status refresh)
+BULK_OPERATIONS = {
+    'mark_paid': ('''UPDATE clients SET remaining_balance = 0
+                     WHERE id IN ({ids}) AND admin_id = :admin_id AND remaining_balance != 0''', True),
+    'delete': ('DELETE FROM clients WHERE id IN ({ids}) AND admin_id = :admin_id', False),
+    'shift_due_date': ('''UPDATE clients SET due_date = date(due_date, :shift)
+                          WHERE id IN ({ids}) AND admin_id = :admin_id AND due_date IS NOT NULL''', True),
+    # A balance larger than a client's total is capped at the total
+    'set_balance': ('''UPDATE clients SET remaining_balance = MIN(:balance, total_amount)
+                       WHERE id IN ({ids}) AND admin_id = :admin_id''', True)
+}
+
+def parse_bulk_request(data):
+    """Validate a /bulk_update body and return (operation, client_ids, params)"""
+    operation = data.get('operation')
+    if operation not in BULK_OPERATIONS:
+        raise ValueError(f"Unknown operation: {operation}")
+    try:
+        client_ids = list(dict.fromkeys(int(client_id) for client_id in data.get('client_ids') or []))
+    except (TypeError, ValueError):
+        raise ValueError('client_ids must be a list of client ids')
+    if not client_ids:
+        raise ValueError('No clients selected')
+    if len(client_ids) > BULK_MAX_IDS:
+        raise ValueError(f'At most {BULK_MAX_IDS} clients can be updated at once')
+
+    params = {}
+    if operation == 'shift_due_date':
+        try:
+            days = int(data.get('days'))
+        except (TypeError, ValueError):
+            raise ValueError('days must be a whole number')
+        params['shift'] = f'{days:+d} days'
+    elif operation == 'set_balance':
+        params['balance'] = _parse_amount(data.get('balance', ''), 'Balance')
+    return operation, client_ids, params
+
+# Ledger rows for a bulk mark_paid, written before the balances are zeroed
+BULK_PAYMENTS_SQL = '''
+    INSERT INTO payments (client_id, admin_id, amount, method, balance_after)
+    SELECT id, admin_id, remaining_balance, 'cash', 0 FROM clients
+    WHERE id IN ({ids}) AND admin_id = :admin_id AND remaining_balance > 0
+'''
+
+def apply_bulk_operation(db, admin_id, operation, client_ids, params):
+    """Apply one bulk operation in a single transaction; return (affected, needs_notification)"""
+    template, refresh = BULK_OPERATIONS[operation]
+    affected = 0
+    needs_notification = False
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        for start in range(0, len(client_ids), BULK_CHUNK_SIZE):
+            chunk = client_ids[start:start + BULK_CHUNK_SIZE]
+            chunk_params = dict(params, admin_id=admin_id)
+            chunk_params.update({f'id{i}': client_id for i, client_id in enumerate(chunk)})
+            ids = ', '.join(f':id{i}' for i in range(len(chunk)))
+            if operation == 'mark_paid':
+                db.execute(BULK_PAYMENTS_SQL.format(ids=ids), chunk_params)
+            affected += db.execute(template.format(ids=ids), chunk_params).rowcount
+            if refresh:
+                refresh_client_statuses(db, admin_id=admin_id, client_ids=chunk)
+                if operation != 'mark_paid' and not needs_notification:
+                    needs_notification = db.execute(f'''
+                        SELECT EXISTS (SELECT 1 FROM clients WHERE id IN ({ids}) AND admin_id = :admin_id
+                                       AND status IN ('overdue', 'due_today', 'due_tomorrow'))
+                    ''', chunk_params).fetchone()[0] == 1
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return affected, needs_notification
+
+@app.route('/bulk_update', methods=['POST'])
+@login_required
+@sqlite_only
+def bulk_update():
+    """Mark paid, delete, shift due dates or set balances for many clients at once"""
+    try:
+        operation, client_ids, params = parse_bulk_request(request.get_json() or {})
+        db = get_db()
+        get_admin_summary(db, session['admin_id'])  # so the change lands on a current summary row
+        affected, needs_notification = apply_bulk_operation(db, session['admin_id'], operation, client_ids, params)
+
+        # One notification check for the whole batch
+        if needs_notification:
+            trigger_payment_notifications(session['admin_id'])
+
+        return jsonify({
+            'success': True,
+            'message': f'Updated {affected} client(s)' if operation != 'delete' else f'Deleted {affected} client(s)',
+            'affected': affected
+        })
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        print(f"Bulk update error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to update clients!'})
+
+@app.route('/notification_settings', methods=['POST'])
+@login_required
+def notification_settings():
+    """Switch between instant alerts and the daily digest"""
+    try:
+        mode = (request.get_json() or {}).get('mode')
+        if mode not in NOTIFICATION_MODES:
+            return jsonify({'success': False, 'message': 'Mode must be instant or digest'}), 400
+        repo = get_repository()
+        repo.set_notification_mode(session['admin_id'], mode)
+        repo.commit()
+        return jsonify({'success': True, 'mode': mode,
+                        'message': 'Daily digest enabled' if mode == 'digest' else 'Instant alerts enabled'})
+    except Exception as e:
+        print(f"Notification settings error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to update notification settings'})
+
+@app.route('/send_digest', methods=['POST'])
+@login_required
+def send_digest():
+    """Email the logged-in admin a digest of their due clients now"""
+    try:
+        admin = get_repository().get_admin(session['admin_id'])
+        if not admin:
+            return jsonify({'success': False, 'message': 'Admin email not found!'})
+        # On demand: leaves the scheduled digest's once-a-day claim alone
+        if send_payment_digests([admin], claim=False):
+            return jsonify({'success': True, 'message': f"Digest sent to {admin['email']}"})
+        return jsonify({'success': False, 'message': 'No due clients, or the digest could not be sent'})
+    except Exception as e:
+        print(f"Send digest error: {e}")
+        return jsonify({'success': False, 'message': 'Failed to send digest!'})
+
 @app.route('/check_daily_transitions', methods=['POST'])
 @login_required
 def check_daily_transitions():
@@ -994,9 +4431,9 @@ def check_daily_transitions():
 @login_required
 def delete_client(client_id):
     try:
-        db = get_db()
-        db.execute('DELETE FROM clients WHERE id = ? AND admin_id = ?', (client_id, session['admin_id']))
-        db.commit()
+        repo = get_repository()
+        repo.delete_client(session['admin_id'], client_id)
+        repo.commit()
         
         return jsonify({'success': True, 'message': 'Client deleted successfully!'})
     except Exception as e:
@@ -1007,16 +4444,14 @@ def delete_client(client_id):
 @login_required
 def send_reminder(client_id):
     try:
-        db = get_db()
-        cursor = db.execute('SELECT * FROM clients WHERE id = ? AND admin_id = ?', (client_id, session['admin_id']))
-        client = cursor.fetchone()
+        repo = get_repository()
+        client = repo.get_client(session['admin_id'], client_id)
         
         if not client:
             return jsonify({'success': False, 'message': 'Client not found!'})
         
         # Get admin email for sending reminders
-        cursor = db.execute('SELECT email FROM admins WHERE id = ?', (session['admin_id'],))
-        admin = cursor.fetchone()
+        admin = repo.get_admin(session['admin_id'])
         admin_email = admin['email'] if admin else None
         
         if not admin_email:
@@ -1055,44 +4490,32 @@ def send_reminder(client_id):
 @login_required
 def check_due_payments():
     try:
-        db = get_db()
+        repo = get_repository()
         
         # Get clients with payments due today, yesterday, or tomorrow
         today = datetime.now().date()
-        yesterday = today - timedelta(days=1)
-        tomorrow = today + timedelta(days=1)
-        
-        cursor = db.execute('''
-            SELECT * FROM clients 
-            WHERE admin_id = ? AND due_date IN (?, ?, ?) AND remaining_balance > 0
-        ''', (session['admin_id'], yesterday.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'), tomorrow.strftime('%Y-%m-%d')))
+        repo.ensure_current_statuses(session['admin_id'], today)
+        due_clients = repo.due_clients(session['admin_id'], today)
         
-        due_clients = cursor.fetchall()
+        messages = {
+            'overdue': "{name}'s payment was due yesterday (PHP{amount})",
+            'due_today': "{name}'s payment is due today (PHP{amount})",
+            'due_tomorrow': "{name}'s payment is due tomorrow (PHP{amount})"
+        }
         
         notifications = []
         for client in due_clients:
-            try:
-                client_due_date = datetime.strptime(client['due_date'], '%Y-%m-%d').date()
-                if client_due_date == yesterday:
-                    status = 'overdue'
-                    message = f"{client['name']}'s payment was due yesterday (PHP{client['remaining_balance']})"
-                elif client_due_date == today:
-                    status = 'due_today'
-                    message = f"{client['name']}'s payment is due today (PHP{client['remaining_balance']})"
-                else:
-                    status = 'due_tomorrow'
-                    message = f"{client['name']}'s payment is due tomorrow (PHP{client['remaining_balance']})"
-                
-                notifications.append({
-                    'client_id': client['id'],
-                    'client_name': client['name'],
-                    'amount': client['remaining_balance'],
-                    'due_date': client['due_date'],
-                    'status': status,
-                    'message': message
-                })
-            except ValueError:
+            status = client['status']
+            if status not in messages:
                 continue
+            notifications.append({
+                'client_id': client['id'],
+                'client_name': client['name'],
+                'amount': client['remaining_balance'],
+                'due_date': client['due_date'],
+                'status': status,
+                'message': messages[status].format(name=client['name'], amount=client['remaining_balance'])
+            })
         
         return jsonify({'notifications': notifications})
     except Exception as e:
@@ -1103,35 +4526,18 @@ def check_and_send_instant_notifications(admin_id):
     """Check for clients requiring immediate notification and send emails"""
     try:
         with app.app_context():
-            db = get_db()
+            repo = get_repository(admin_id)
             
             # Get admin email
-            cursor = db.execute('SELECT email FROM admins WHERE id = ?', (admin_id,))
-            admin = cursor.fetchone()
+            admin = repo.get_admin(admin_id)
             if not admin:
                 return 0
             
+            if admin.get('notification_mode') == 'digest':
+                return 0  # covered by the daily digest
             admin_email = admin['email']
             
-            today = date.today()
-            tomorrow = today + timedelta(days=1)
-            yesterday = today - timedelta(days=1)
-            
-            # Get clients that need notifications
-            cursor = db.execute('''
-                SELECT * FROM clients 
-                WHERE admin_id = ? 
-                AND due_date IN (?, ?, ?) 
-                AND remaining_balance > 0
-            ''', (admin_id, yesterday.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'), tomorrow.strftime('%Y-%m-%d')))
-            
-            due_clients = cursor.fetchall()
-            
-            notifications_sent = 0
-            for client in due_clients:
-                if send_automatic_payment_notification(client, admin_email):
-                    notifications_sent += 1
-                    time.sleep(1)
+            notifications_sent = send_new_payment_alerts(repo, admin_id, admin_email)
             
             if notifications_sent > 0:
                 print(f"Sent {notifications_sent} instant notifications to {admin_email}")
@@ -1151,122 +4557,231 @@ def trigger_payment_notifications(admin_id):
 
 def should_notify_for_client(client):
     """Check if a client requires immediate notification"""
-    if client['remaining_balance'] <= 0:
-        return False
-        
-    if not client['due_date']:
-        return False
-        
-    try:
-        today = date.today()
-        client_due_date = datetime.strptime(client['due_date'], '%Y-%m-%d').date()
-        days_diff = (client_due_date - today).days
-        
-        # Notify for: overdue, due today, due tomorrow
-        return days_diff in [-1, 0, 1] or days_diff < -1
-    except ValueError:
-        return False
+    # Notify for: overdue, due today, due tomorrow
+    return client['status'] in ('overdue', 'due_today', 'due_tomorrow')
 
 def check_payment_status_for_admin(admin_id, admin_email):
     """Check payment status for specific admin and send notifications"""
     try:
-        db = get_db()
-        
-        today = date.today()
-        tomorrow = today + timedelta(days=1)
-        yesterday = today - timedelta(days=1)
-        
-        # Get clients due today, tomorrow, or overdue for this admin
-        cursor = db.execute('''
-            SELECT * FROM clients 
-            WHERE admin_id = ? 
-            AND due_date IN (?, ?, ?) 
-            AND remaining_balance > 0
-        ''', (admin_id, yesterday.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'), tomorrow.strftime('%Y-%m-%d')))
-        
-        due_clients = cursor.fetchall()
-        
-        notifications_sent = 0
-        for client in due_clients:
-            if send_automatic_payment_notification(client, admin_email):
-                notifications_sent += 1
-                time.sleep(1)  # Small delay between emails
-        
-        return notifications_sent
+        repo = get_repository(admin_id)
+        return send_new_payment_alerts(repo, admin_id, admin_email)
     except Exception as e:
         print(f"❌ Payment status check error for admin {admin_id}: {e}")
         return 0
 
-def send_automatic_payment_notification(client, admin_email):
-    """Send automatic Gmail notification for client payment status"""
-    try:
-        today = date.today()
-        try:
-            client_due_date = datetime.strptime(client['due_date'], '%Y-%m-%d').date()
-        except ValueError:
-            return False
-        
-        days_diff = (client_due_date - today).days
-        
-        # Determine status and email content
-        if days_diff < 0:
-            status = "OVERDUE"
-            urgency_color = "#f44336"
-            status_icon = "⚠️"
-            priority = "HIGH PRIORITY"
-        elif days_diff == 0:
-            status = "DUE TODAY"
-            urgency_color = "#ff9800"
-            status_icon = "🔔"
-            priority = "URGENT"
-        else:
-            status = "DUE TOMORROW"
-            urgency_color = "#2196f3"
-            status_icon = "📅"
-            priority = "REMINDER"
-        
-        html_content = f"""
-        <div style="background: linear-gradient(135deg, {urgency_color} 0%, {urgency_color}dd 100%); padding: 30px; font-family: Arial, sans-serif;">
-            <div style="background: white; border-radius: 15px; padding: 30px; max-width: 600px; margin: 0 auto; box-shadow: 0 20px 40px rgba(0,0,0,0.1);">
-                <h2 style="color: {urgency_color}; text-align: center; margin-bottom: 10px;">{status_icon} AUTOMATIC PAYMENT ALERT</h2>
-                <p style="text-align: center; background: {urgency_color}; color: white; padding: 8px 16px; border-radius: 20px; display: inline-block; font-weight: bold; font-size: 12px; margin-bottom: 20px;">{priority}</p>
-                
-                <div style="background: #f8f9fa; padding: 20px; border-radius: 10px; margin: 20px 0; border-left: 5px solid {urgency_color};">
-                    <h3 style="color: #333; margin-top: 0;">Client: {client['name']}</h3>
-                    <p style="margin: 8px 0;"><strong>Phone:</strong> {client['phone'] or 'Not provided'}</p>
-                    <p style="margin: 8px 0;"><strong>Products:</strong> {client['products']}</p>
-                </div>
-                
-                <div style="background: #fff3cd; padding: 20px; border-radius: 10px; margin: 20px 0;">
-                    <h3 style="color: #856404; margin-top: 0;">Payment Status: {status}</h3>
-                    <p style="margin: 8px 0;"><strong>Due Date:</strong> {client['due_date']}</p>
-                    <p style="margin: 8px 0;"><strong>Total Amount:</strong> PHP{client['total_amount']:,.2f}</p>
-                    <p style="margin: 8px 0; font-size: 18px;"><strong style="color: {urgency_color};">Outstanding Balance: PHP{client['remaining_balance']:,.2f}</strong></p>
-                </div>
-                
-                <div style="text-align: center; margin-top: 30px; padding: 15px; background: #e3f2fd; border-radius: 8px;">
-                    <p style="color: #1976d2; margin: 0; font-size: 14px;">
-                        <strong>⏰ Sent automatically at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</strong>
-                    </p>
-                    <p style="color: #666; margin: 5px 0 0 0; font-size: 12px;">
-                        Debt Collection System - Automatic Notifications
-                    </p>
-                </div>
+def build_payment_alert(client):
+    """(subject, html) of the automatic alert for a client, or None if no alert is due"""
+    # Determine status and email content
+    if client['status'] not in ('overdue', 'due_today', 'due_tomorrow'):
+        return None
+    
+    if client['status'] == 'overdue':
+        status = "OVERDUE"
+        urgency_color = "#f44336"
+        status_icon = "⚠️"
+        priority = "HIGH PRIORITY"
+    elif client['status'] == 'due_today':
+        status = "DUE TODAY"
+        urgency_color = "#ff9800"
+        status_icon = "🔔"
+        priority = "URGENT"
+    else:
+        status = "DUE TOMORROW"
+        urgency_color = "#2196f3"
+        status_icon = "📅"
+        priority = "REMINDER"
+    
+    html_content = f"""
+    <div style="background: linear-gradient(135deg, {urgency_color} 0%, {urgency_color}dd 100%); padding: 30px; font-family: Arial, sans-serif;">
+        <div style="background: white; border-radius: 15px; padding: 30px; max-width: 600px; margin: 0 auto; box-shadow: 0 20px 40px rgba(0,0,0,0.1);">
+            <h2 style="color: {urgency_color}; text-align: center; margin-bottom: 10px;">{status_icon} AUTOMATIC PAYMENT ALERT</h2>
+            <p style="text-align: center; background: {urgency_color}; color: white; padding: 8px 16px; border-radius: 20px; display: inline-block; font-weight: bold; font-size: 12px; margin-bottom: 20px;">{priority}</p>
+            
+            <div style="background: #f8f9fa; padding: 20px; border-radius: 10px; margin: 20px 0; border-left: 5px solid {urgency_color};">
+                <h3 style="color: #333; margin-top: 0;">Client: {client['name']}</h3>
+                <p style="margin: 8px 0;"><strong>Phone:</strong> {client['phone'] or 'Not provided'}</p>
+                <p style="margin: 8px 0;"><strong>Products:</strong> {client['products']}</p>
+            </div>
+            
+            <div style="background: #fff3cd; padding: 20px; border-radius: 10px; margin: 20px 0;">
+                <h3 style="color: #856404; margin-top: 0;">Payment Status: {status}</h3>
+                <p style="margin: 8px 0;"><strong>Due Date:</strong> {client['due_date']}</p>
+                <p style="margin: 8px 0;"><strong>Total Amount:</strong> PHP{client['total_amount']:,.2f}</p>
+                <p style="margin: 8px 0; font-size: 18px;"><strong style="color: {urgency_color};">Outstanding Balance: PHP{client['remaining_balance']:,.2f}</strong></p>
+            </div>
+            
+            <div style="text-align: center; margin-top: 30px; padding: 15px; background: #e3f2fd; border-radius: 8px;">
+                <p style="color: #1976d2; margin: 0; font-size: 14px;">
+                    <strong>⏰ Sent automatically at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</strong>
+                </p>
+                <p style="color: #666; margin: 5px 0 0 0; font-size: 12px;">
+                    Debt Collection System - Automatic Notifications
+                </p>
             </div>
         </div>
-        """
-        
-        subject = f"[AUTO-ALERT] {status} - {client['name']} (PHP{client['remaining_balance']:,.2f})"
-        
-        success = send_email_brevo(admin_email, subject, html_content)
-        if success:
-            print(f"📧 Sent {status} notification for {client['name']} to {admin_email}")
-        
-        return success
-        
+    </div>
+    """
+    
+    subject = f"[AUTO-ALERT] {status} - {client['name']} (PHP{client['remaining_balance']:,.2f})"
+    return subject, html_content
+
+def send_payment_alerts(clients, admin_email):
+    """Send the automatic alerts for many clients in batched API calls; returns the
+    clients alerted (including those whose send got no reply, so they are not resent)"""
+    try:
+        alerts = [(client, build_payment_alert(client)) for client in clients]
+        alerts = [(client, alert) for client, alert in alerts if alert is not None]
+        outcomes = send_email_brevo_outcomes([(admin_email, subject, html) for client, (subject, html) in alerts])
+        sent_clients = []
+        for (client, alert), outcome in zip(alerts, outcomes):
+            if outcome == 'sent':
+                print(f"📧 Sent {client['status']} notification for {client['name']} to {admin_email}")
+            if outcome in ('sent', 'unknown'):
+                sent_clients.append(client)
+        return sent_clients
     except Exception as e:
-        print(f"❌ Send automatic notification error: {e}")
-        return False
+        print(f"❌ Send automatic notifications error: {e}")
+        return []
+
+def send_new_payment_alerts(repo, admin_id, admin_email, today=None):
+    """Alert the admin about due clients whose status and due date were not alerted
+    before (see notification_ledger); returns the number sent"""
+    today = today or date.today()
+    repo.ensure_current_statuses(admin_id, today)
+    due_clients = [client for client in repo.due_clients(admin_id, today) if should_notify_for_client(client)]
+    claimed = repo.claim_notifications(admin_id, due_clients, today)
+    repo.commit()
+    if not claimed:
+        return 0
+
+    sent_clients = send_payment_alerts(claimed, admin_email)
+    if len(sent_clients) < len(claimed):
+        sent_ids = {client['id'] for client in sent_clients}
+        repo.release_notifications([client for client in claimed if client['id'] not in sent_ids])
+        repo.commit()
+    return len(sent_clients)
+
+NOTIFICATION_MODES = ('instant', 'digest')
+
+# Digest sections in display order: (status, heading, color)
+DIGEST_GROUPS = (
+    ('overdue', '⚠️ Overdue', '#f44336'),
+    ('due_today', '🔔 Due Today', '#ff9800'),
+    ('due_tomorrow', '📅 Due Tomorrow', '#2196f3'),
+)
+
+def build_payment_digest(clients, today=None):
+    """(subject, html) of one email listing every due client grouped by status,
+    largest balance first, or None if nobody is due"""
+    today = today or date.today()
+    groups = {status: [] for status, heading, color in DIGEST_GROUPS}
+    for client in clients:
+        if client['status'] in groups:
+            groups[client['status']].append(client)
+    if not any(groups.values()):
+        return None
+    
+    sections = []
+    grand_total = 0
+    for status, heading, color in DIGEST_GROUPS:
+        group = sorted(groups[status], key=lambda client: client['remaining_balance'], reverse=True)
+        if not group:
+            continue
+        total = sum(client['remaining_balance'] for client in group)
+        grand_total += total
+        rows = ''.join(f"""
+                <tr>
+                    <td style="padding: 8px; border-bottom: 1px solid #eee;">{client['name']}</td>
+                    <td style="padding: 8px; border-bottom: 1px solid #eee;">{client['phone'] or 'Not provided'}</td>
+                    <td style="padding: 8px; border-bottom: 1px solid #eee;">{client['due_date']}</td>
+                    <td style="padding: 8px; border-bottom: 1px solid #eee; text-align: right;">PHP{client['remaining_balance']:,.2f}</td>
+                </tr>""" for client in group)
+        sections.append(f"""
+            <h3 style="color: {color}; margin: 25px 0 10px 0;">{heading} ({len(group)})</h3>
+            <table style="width: 100%; border-collapse: collapse; font-size: 14px;">
+                <tr style="background: #f8f9fa; text-align: left;">
+                    <th style="padding: 8px;">Client</th><th style="padding: 8px;">Phone</th>
+                    <th style="padding: 8px;">Due Date</th><th style="padding: 8px; text-align: right;">Balance</th>
+                </tr>{rows}
+                <tr>
+                    <td colspan="3" style="padding: 8px; font-weight: bold;">Total</td>
+                    <td style="padding: 8px; font-weight: bold; text-align: right; color: {color};">PHP{total:,.2f}</td>
+                </tr>
+            </table>""")
+    
+    count = sum(len(group) for group in groups.values())
+    html_content = f"""
+    <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 30px; font-family: Arial, sans-serif;">
+        <div style="background: white; border-radius: 15px; padding: 30px; max-width: 700px; margin: 0 auto; box-shadow: 0 20px 40px rgba(0,0,0,0.1);">
+            <h2 style="color: #764ba2; text-align: center; margin-bottom: 10px;">📋 Daily Payment Digest</h2>
+            <p style="text-align: center; color: #666; margin-top: 0;">{today.strftime('%A, %B %d, %Y')}</p>
+            {''.join(sections)}
+            <div style="background: #fff3cd; padding: 20px; border-radius: 10px; margin-top: 25px;">
+                <p style="margin: 0; font-size: 18px;"><strong>{count} client(s) due, PHP{grand_total:,.2f} outstanding</strong></p>
+            </div>
+            <p style="color: #666; margin: 20px 0 0 0; font-size: 12px; text-align: center;">
+                Debt Collection System - Daily Digest
+            </p>
+        </div>
+    </div>
+    """
+    
+    subject = f"[DIGEST] {today.strftime('%Y-%m-%d')}: {count} due (PHP{grand_total:,.2f})"
+    return subject, html_content
+
+def send_payment_digests(admins, today=None, claim=True):
+    """Email each admin one digest of their due clients; returns the number sent
+
+    With claim, an admin gets at most one digest per day (admins.digest_sent_on),
+    however many times or from however many processes this runs.
+    All digests go out together through send_email_brevo_outcomes.
+    """
+    today = today or date.today()
+    digests = []
+    for admin in admins:
+        repo = get_repository(admin['id'])
+        claimed = False
+        try:
+            if claim:
+                if not repo.claim_digest(admin['id'], today):
+                    continue
+                repo.commit()
+                claimed = True
+            repo.ensure_current_statuses(admin['id'], today)
+            digest = build_payment_digest(repo.due_clients(admin['id'], today), today)
+            if digest is not None:
+                digests.append((admin, digest))
+        except Exception as e:
+            print(f"❌ Digest error for admin {admin['id']}: {e}")
+            if claimed:
+                repo.release_digest(admin['id'], admin['digest_sent_on'])
+                repo.commit()
+        finally:
+            repo.close()  # runs over every admin: do not hold a connection per admin
+    if not digests:
+        return 0
+    
+    outcomes = send_email_brevo_outcomes([(admin['email'], subject, html) for admin, (subject, html) in digests])
+    for (admin, digest), outcome in zip(digests, outcomes):
+        if outcome == 'sent':
+            print(f"📧 Sent daily digest to {admin['email']}")
+        elif claim and outcome != 'unknown':  # no reply: it may have gone out, so keep today's claim
+            repo = get_repository(admin['id'])
+            repo.release_digest(admin['id'], admin['digest_sent_on'])
+            repo.commit()
+            repo.close()
+    return outcomes.count('sent')
+
+@app.cli.command('send-digests')
+def send_digests_command():
+    """Send today's digest to every admin in digest mode (once per admin per day)"""
+    repo = get_repository(None)
+    try:
+        admins = repo.digest_admins()
+    finally:
+        repo.close()
+    sent = send_payment_digests(admins)
+    print(f"Sent {sent} digest(s) to {len(admins)} admin(s) in digest mode")
 
 # Start automatic notification system
 def start_notification_scheduler():
@@ -1286,44 +4801,51 @@ def logout():
     session.pop('username', None)
     return redirect(url_for('login'))
 
+@app.route('/system_stats')
+@login_required
+def system_stats():
+    """Expose runtime counters for this worker process"""
+    return jsonify({
+        'success': True,
+        'pid': os.getpid(),
+        'db_pool': [pool.snapshot() for pool in list(_pools.values())],
+        'write_buffer': write_buffer.snapshot(),
+        'brevo': brevo.snapshot(),
+        'rate_limits': rate_limiter.snapshot()
+    })
+
+@app.route('/gateway_health')
+@login_required
+def gateway_health_route():
+    """Rolling SMS gateway stats for this worker process, best first"""
+    return jsonify({
+        'success': True,
+        'pid': os.getpid(),
+        'gateways': gateway_health.snapshot(),
+        'hedged_sends': hedged_sender.snapshot()
+    })
+
 @app.route('/get_notification_stats')
 @login_required
 def get_notification_stats():
     try:
-        db = get_db()
+        repo = get_repository()
         
         today = date.today()
-        tomorrow = today + timedelta(days=1)
         week_ago = today - timedelta(days=7)
         
-        # Count notifications for today
-        cursor = db.execute('''
-            SELECT COUNT(*) as count FROM clients 
-            WHERE admin_id = ? AND due_date = ? AND remaining_balance > 0
-        ''', (session['admin_id'], today.strftime('%Y-%m-%d')))
-        due_today_count = cursor.fetchone()['count']
-        
-        cursor = db.execute('''
-            SELECT COUNT(*) as count FROM clients 
-            WHERE admin_id = ? AND due_date = ? AND remaining_balance > 0
-        ''', (session['admin_id'], tomorrow.strftime('%Y-%m-%d')))
-        due_tomorrow_count = cursor.fetchone()['count']
-        
-        cursor = db.execute('''
-            SELECT COUNT(*) as count FROM clients 
-            WHERE admin_id = ? AND due_date < ? AND remaining_balance > 0
-        ''', (session['admin_id'], today.strftime('%Y-%m-%d')))
-        overdue_count = cursor.fetchone()['count']
+        summary = repo.client_summary(session['admin_id'], today)
+        due_today_count = summary['due_today_count']
+        due_tomorrow_count = summary['due_tomorrow_count']
+        overdue_count = summary['overdue_count']
         
         # Count total notifications for this week
-        cursor = db.execute('''
-            SELECT COUNT(*) as count FROM clients 
-            WHERE admin_id = ? AND due_date >= ? AND due_date <= ? AND remaining_balance > 0
-        ''', (session['admin_id'], week_ago.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d')))
-        week_total = cursor.fetchone()['count']
+        week_total = repo.count_due_between(session['admin_id'], week_ago, today)
+        admin = repo.get_admin(session['admin_id'])
         
         return jsonify({
             'success': True,
+            'mode': (admin or {}).get('notification_mode', 'instant'),
             'today': {
                 'due_today': due_today_count,
                 'due_tomorrow': due_tomorrow_count,
@@ -1345,19 +4867,11 @@ def get_notification_stats():
 @login_required
 def check_due_status_changes():
     try:
-        db = get_db()
-        
         today = date.today()
-        yesterday = today - timedelta(days=1)
-        tomorrow = today + timedelta(days=1)
         
         # Check for clients with status changes (this is a simplified version)
-        cursor = db.execute('''
-            SELECT COUNT(*) as count FROM clients 
-            WHERE admin_id = ? AND due_date IN (?, ?, ?) AND remaining_balance > 0
-        ''', (session['admin_id'], yesterday.strftime('%Y-%m-%d'), today.strftime('%Y-%m-%d'), tomorrow.strftime('%Y-%m-%d')))
-        
-        current_notifications = cursor.fetchone()['count']
+        current_notifications = get_repository().count_due_between(
+            session['admin_id'], today - timedelta(days=1), today + timedelta(days=1))
         
         # For real-time updates, you would compare with previous counts
         # For now, we'll just return the current status
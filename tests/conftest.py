@@ -0,0 +1,134 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# app.py reads its configuration at import time: point it at a scratch
+# database and keep background threads from starting before importing it.
+_IMPORT_DIR = tempfile.mkdtemp(prefix='utang-tests-')
+os.environ['DATABASE'] = os.path.join(_IMPORT_DIR, 'import.db')
+os.environ['RATE_LIMIT_DATABASE'] = os.path.join(_IMPORT_DIR, 'rate_limits.db')
+os.environ['OUTBOX_WORKERS'] = '0'
+os.environ['BREVO_API_KEY'] = 'test-key'
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as app_module  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The app module on a fresh, fully migrated SQLite database"""
+    monkeypatch.setattr(app_module, 'DB_BACKEND', 'sqlite')
+    monkeypatch.setattr(app_module, 'DATABASE', str(tmp_path / 'app.db'))
+    monkeypatch.setattr(app_module, 'DB_SHARDS', 0)
+    monkeypatch.setattr(app_module, 'DB_SHARD_DIR', str(tmp_path / 'shards'))
+    monkeypatch.setattr(app_module, '_pools', {})
+    with app_module.app.app_context():
+        app_module.init_db()
+    return app_module
+
+
+def add_admin(app, admin_id, email=None):
+    """Insert an admin row in the directory database (and its shard, if sharded)"""
+    with app.app.app_context():
+        repo = app.get_repository(admin_id)
+        repo.execute_directory(
+            'INSERT INTO admins (id, username, email, password) VALUES (:id, :username, :email, :password)',
+            {'id': admin_id, 'username': f'admin{admin_id}', 'email': email or f'admin{admin_id}@example.com',
+             'password': 'x'})
+        repo.commit()
+        repo.sync_admin(repo.get_admin(admin_id))
+
+
+def add_client(app, admin_id, name, due_date=None, balance=300, total=500, phone='09171234567'):
+    """Create a client through the repository (statuses filled in); returns its id"""
+    with app.app.app_context():
+        repo = app.get_repository(admin_id)
+        client_id = repo.create_client(admin_id, {
+            'name': name, 'phone': phone, 'products': 'rice', 'total_amount': total,
+            'remaining_balance': balance, 'due_date': due_date.isoformat() if due_date else None})
+        repo.commit()
+        return client_id
+
+
+@pytest.fixture
+def client(app):
+    """A test client logged in as admin 1"""
+    add_admin(app, 1)
+    test_client = app.app.test_client()
+    with test_client.session_transaction() as session:
+        session['admin_id'] = 1
+    return test_client
+
+
+class StubBrevo:
+    """Local stand-in for the Brevo send endpoint.
+
+    ``respond(body)`` picks each reply as (status, headers, delay_seconds),
+    optionally followed by a JSON reply body; by default every request is
+    accepted. Every request body is recorded.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.respond = lambda body: (201, {}, 0)
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with stub._lock:
+                    stub.requests.append(body)
+                status, headers, delay, *reply = stub.respond(body)
+                time.sleep(delay)
+                reply = reply[0] if reply else {'messageId': '<stub>'} if status == 201 else {'code': 'stub'}
+                payload = json.dumps(reply).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.server.handle_error = lambda request, address: None  # clients that timed out and hung up
+        self.url = f'http://127.0.0.1:{self.server.server_port}/v3/smtp/email'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def script(self, *statuses):
+        """Reply with these statuses in order, then accept everything"""
+        pending = list(statuses)
+
+        def respond(body):
+            with self._lock:
+                status = pending.pop(0) if pending else 201
+            return (status, {'Retry-After': '0'} if status == 429 else {}, 0)
+        self.respond = respond
+
+    def recipients(self, body):
+        return [to['email'] for version in body.get('messageVersions') or [body] for to in version['to']]
+
+
+@pytest.fixture
+def brevo_stub(app, monkeypatch):
+    """A StubBrevo wired in as the app's Brevo client (no rate limits, fast backoff)"""
+    stub = StubBrevo()
+    client = app_module.BrevoClient(api_url=stub.url, api_key='test-key', backoff=0.01,
+                                    limiter=app_module.RateLimiter(limits={}))
+    monkeypatch.setattr(app_module, 'brevo', client)
+    monkeypatch.setattr(app_module, 'gateway_health', app_module.GatewayHealth())
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
@@ -0,0 +1,138 @@
+import socket
+import time
+
+import pytest
+import requests
+
+
+def make_client(app, stub, **kwargs):
+    options = dict(api_url=stub.url, api_key='test-key', backoff=0.01, limiter=app.RateLimiter(limits={}))
+    options.update(kwargs)
+    return app.BrevoClient(**options)
+
+
+def test_retries_429_and_5xx_until_accepted(app, brevo_stub):
+    brevo_stub.script(429, 503, 502)
+    client = make_client(app, brevo_stub, max_retries=3)
+
+    assert client.post(app.build_brevo_payload('a@example.com', 'Hi', 'Body')).status_code == 201
+    assert len(brevo_stub.requests) == 4
+    stats = client.snapshot()
+    assert stats['retries'] == 3
+    assert stats['sent'] == 1 and stats['errors'] == 0
+
+
+def test_gives_up_after_max_retries(app, brevo_stub):
+    brevo_stub.script(500, 500, 500, 500, 500)
+    client = make_client(app, brevo_stub, max_retries=2)
+
+    assert client.post(app.build_brevo_payload('a@example.com', 'Hi', 'Body')).status_code == 500
+    assert len(brevo_stub.requests) == 3
+    assert client.snapshot()['retries'] == 2
+
+
+def test_does_not_retry_a_rejected_request(app, brevo_stub):
+    brevo_stub.script(400)
+    client = make_client(app, brevo_stub, breaker_threshold=1)
+
+    assert client.post(app.build_brevo_payload('bad', 'Hi', 'Body')).status_code == 400
+    assert len(brevo_stub.requests) == 1
+    # Our request's fault, not an outage: the breaker stays closed
+    assert client.snapshot()['circuit'] == 'closed'
+
+
+def test_breaker_opens_after_threshold_and_closes_after_a_good_probe(app, brevo_stub):
+    brevo_stub.respond = lambda body: (503, {}, 0)
+    client = make_client(app, brevo_stub, max_retries=0, breaker_threshold=3, breaker_cooldown=0.2)
+    payload = app.build_brevo_payload('a@example.com', 'Hi', 'Body')
+
+    for _ in range(2):
+        client.post(payload)
+    assert client.snapshot()['circuit'] == 'closed'
+    client.post(payload)
+    assert client.snapshot()['circuit'] == 'open'
+
+    with pytest.raises(app.CircuitOpenError):
+        client.post(payload)
+    assert len(brevo_stub.requests) == 3
+    assert client.snapshot()['short_circuited'] == 1
+
+    time.sleep(0.25)
+    brevo_stub.script()  # the service is back
+    assert client.post(payload).status_code == 201
+    assert client.snapshot()['circuit'] == 'closed'
+    assert len(brevo_stub.requests) == 4
+
+
+def test_batch_send_splits_into_batch_size_requests(app, brevo_stub, monkeypatch):
+    monkeypatch.setattr(app, 'BREVO_BATCH_SIZE', 100)
+    messages = [(f'user{i}@example.com', 'Alert', f'Body {i}') for i in range(250)]
+
+    assert app.send_email_brevo_batch(messages) == [True] * 250
+    assert [len(body['messageVersions']) for body in brevo_stub.requests] == [100, 100, 50]
+    sent_to = [email for body in brevo_stub.requests for email in brevo_stub.recipients(body)]
+    assert sent_to == [to for to, subject, html in messages]
+
+
+def test_batch_send_isolates_a_rejected_recipient(app, brevo_stub):
+    bad = 'user5@invalid'
+    invalid_to = {'code': 'invalid_parameter', 'message': 'email is not valid in to'}
+    brevo_stub.respond = lambda body: (400, {}, 0, invalid_to) if bad in brevo_stub.recipients(body) else (201, {}, 0)
+    messages = [(f'user{i}@example.com' if i != 5 else bad, 'Alert', 'Body') for i in range(8)]
+
+    assert app.send_email_brevo_batch(messages) == [i != 5 for i in range(8)]
+    # 8 -> 4 + 4 -> only the halves holding the bad recipient keep splitting
+    sizes = [len(brevo_stub.recipients(body)) for body in brevo_stub.requests]
+    assert sorted(sizes, reverse=True) == [8, 4, 4, 2, 2, 1, 1]
+
+
+def test_batch_send_fails_at_once_on_a_request_level_rejection(app, brevo_stub):
+    bad_sender = {'code': 'invalid_parameter', 'message': 'sender email is not valid'}
+    brevo_stub.respond = lambda body: (400, {}, 0, bad_sender)
+    messages = [(f'user{i}@example.com', 'Alert', 'Body') for i in range(8)]
+
+    assert app.send_email_brevo_outcomes(messages) == ['rejected'] * 8
+    assert len(brevo_stub.requests) == 1
+
+
+def test_batch_send_reports_errors_when_retries_run_out(app, brevo_stub, monkeypatch):
+    monkeypatch.setattr(app, 'brevo', make_client(app, brevo_stub, max_retries=1))
+    brevo_stub.respond = lambda body: (503, {}, 0)
+
+    assert app.send_email_brevo_outcomes([('a@example.com', 'S', 'B'), ('b@example.com', 'S', 'B')]) == \
+        ['error', 'error']
+    assert len(brevo_stub.requests) == 2
+
+
+def test_read_timeout_is_not_retried(app, brevo_stub):
+    brevo_stub.respond = lambda body: (201, {}, 0.5)
+    client = make_client(app, brevo_stub, max_retries=3, timeout=(1, 0.1))
+
+    with pytest.raises(app.BrevoOutcomeUnknown):
+        client.post(app.build_brevo_payload('a@example.com', 'Hi', 'Body'))
+    time.sleep(0.5)
+    # Brevo got it and may have delivered it: a second POST could send it twice
+    assert len(brevo_stub.requests) == 1
+    assert client.snapshot()['retries'] == 0
+
+
+def test_batch_send_reports_unknown_outcome_after_read_timeout(app, brevo_stub, monkeypatch):
+    monkeypatch.setattr(app, 'brevo', make_client(app, brevo_stub, timeout=(1, 0.1)))
+    brevo_stub.respond = lambda body: (201, {}, 0.5)
+
+    assert app.send_email_brevo_outcomes([('a@example.com', 'S', 'B'), ('b@example.com', 'S', 'B')]) == \
+        ['unknown', 'unknown']
+    time.sleep(0.5)
+    assert len(brevo_stub.requests) == 1
+
+
+def test_connection_failures_are_retried(app):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]  # nothing listens here once the socket closes
+    client = app.BrevoClient(api_url=f'http://127.0.0.1:{port}/v3/smtp/email', api_key='test-key',
+                             backoff=0.01, max_retries=2, limiter=app.RateLimiter(limits={}))
+
+    with pytest.raises(requests.ConnectionError):
+        client.post(app.build_brevo_payload('a@example.com', 'Hi', 'Body'))
+    assert client.snapshot()['retries'] == 2
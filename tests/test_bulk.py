@@ -0,0 +1,85 @@
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import add_admin, add_client
+
+
+@pytest.fixture
+def notified(app, monkeypatch):
+    """Admin ids passed to trigger_payment_notifications"""
+    calls = []
+    monkeypatch.setattr(app, 'trigger_payment_notifications', calls.append)
+    return calls
+
+
+def bulk(client, operation, client_ids, **extra):
+    return client.post('/bulk_update', json=dict(extra, operation=operation, client_ids=client_ids))
+
+
+def rows(app, ids):
+    with app.app.app_context():
+        db = app.get_db(1)
+        assert app.diff_admin_summary(db, 1) == {}
+        placeholders = ', '.join('?' for _ in ids)
+        return {row['id']: dict(row) for row in
+                db.execute(f'SELECT * FROM clients WHERE id IN ({placeholders})', ids)}
+
+
+def test_mark_paid_settles_and_records_payments(app, client, notified, monkeypatch):
+    monkeypatch.setattr(app, 'BULK_CHUNK_SIZE', 2)
+    ids = [add_client(app, 1, f'Client {i}', date.today(), balance=100 * (i + 1)) for i in range(3)]
+    settled = add_client(app, 1, 'Settled', balance=0)
+
+    response = bulk(client, 'mark_paid', ids + [settled])
+    assert response.json == {'success': True, 'message': 'Updated 3 client(s)', 'affected': 3}
+    assert all(row['status'] == 'paid' and row['paid_at'] for row in rows(app, ids).values())
+    with app.app.app_context():
+        payments = app.get_db(1).execute('SELECT client_id, amount, balance_after FROM payments ORDER BY client_id')
+        assert [tuple(payment) for payment in payments] == [(ids[0], 100, 0), (ids[1], 200, 0), (ids[2], 300, 0)]
+    assert notified == []
+
+
+def test_shift_due_date_refreshes_status_and_notifies_once(app, client, notified):
+    today = date.today()
+    ids = [add_client(app, 1, 'Ana', today + timedelta(days=5)), add_client(app, 1, 'Ben', today + timedelta(days=6)),
+           add_client(app, 1, 'Undated')]
+
+    response = bulk(client, 'shift_due_date', ids, days=-6)
+    assert response.json['affected'] == 2
+    updated = rows(app, ids)
+    assert updated[ids[0]]['due_date'] == (today - timedelta(days=1)).isoformat()
+    assert updated[ids[0]]['status'] == 'overdue' and updated[ids[1]]['status'] == 'due_today'
+    assert updated[ids[2]]['due_date'] is None
+    assert notified == [1]
+
+
+def test_set_balance_is_capped_at_the_total(app, client, notified):
+    ids = [add_client(app, 1, 'Ana', balance=100, total=500), add_client(app, 1, 'Ben', balance=0, total=200)]
+    assert bulk(client, 'set_balance', ids, balance='300').json['affected'] == 2
+    updated = rows(app, ids)
+    assert (updated[ids[0]]['remaining_balance'], updated[ids[1]]['remaining_balance']) == (300, 200)
+    assert updated[ids[1]]['status'] == 'pending'
+
+
+def test_bulk_changes_never_touch_another_admins_clients(app, client, notified):
+    add_admin(app, 2)
+    mine = add_client(app, 1, 'Mine')
+    theirs = add_client(app, 2, 'Theirs')
+    assert bulk(client, 'delete', [mine, theirs]).json['message'] == 'Deleted 1 client(s)'
+    with app.app.app_context():
+        remaining = [row[0] for row in app.get_db(1).execute('SELECT id FROM clients')]
+    assert remaining == [theirs]
+
+
+@pytest.mark.parametrize('body, message', [
+    ({'operation': 'archive', 'client_ids': [1]}, 'Unknown operation: archive'),
+    ({'operation': 'delete', 'client_ids': []}, 'No clients selected'),
+    ({'operation': 'delete', 'client_ids': ['x']}, 'client_ids must be a list of client ids'),
+    ({'operation': 'shift_due_date', 'client_ids': [1], 'days': 'soon'}, 'days must be a whole number'),
+    ({'operation': 'set_balance', 'client_ids': [1], 'balance': '-5'}, 'Balance cannot be negative'),
+])
+def test_bad_bulk_requests_are_rejected(client, body, message):
+    response = client.post('/bulk_update', json=body)
+    assert response.status_code == 400
+    assert response.json['message'] == message
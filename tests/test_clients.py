@@ -0,0 +1,134 @@
+import base64
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import add_admin, add_client
+
+
+@pytest.fixture
+def clients(app, client):
+    """25 clients with repeated names, balances and due dates, some undated"""
+    today = date.today()
+    ids = []
+    for i in range(25):
+        due = None if i % 6 == 0 else today + timedelta(days=i % 4 - 2)
+        ids.append(add_client(app, 1, f'Client {i % 5}', due, balance=(i % 3) * 100))
+    return ids
+
+
+def walk_pages(client, **args):
+    """Follow next_cursor to the end; returns the ids in listing order"""
+    seen, cursor = [], None
+    while True:
+        query = dict(args, limit=7, **({'cursor': cursor} if cursor else {}))
+        response = client.get('/api/clients', query_string=query)
+        assert response.status_code == 200, response.json
+        seen += [row['id'] for row in response.json['clients']]
+        cursor = response.json['next_cursor']
+        if cursor is None:
+            return seen
+
+
+@pytest.mark.parametrize('sort', ['created_at', 'name', 'due_date', 'balance'])
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_keyset_pages_have_no_duplicates_or_gaps(client, clients, sort, order):
+    seen = walk_pages(client, sort=sort, order=order)
+    assert len(seen) == len(set(seen)) == len(clients)
+
+    full = client.get('/api/clients', query_string={'sort': sort, 'order': order, 'limit': 100}).json
+    assert [row['id'] for row in full['clients']] == seen
+
+
+def test_filters_apply_across_pages(client, clients):
+    seen = walk_pages(client, status='paid')
+    expected = client.get('/api/clients', query_string={'status': 'paid', 'limit': 100}).json['clients']
+    assert seen == [row['id'] for row in expected] and len(seen) == 9
+
+
+def encode(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+@pytest.mark.parametrize('args, message', [
+    ({'limit': 'ten'}, 'limit must be an integer'),
+    ({'cursor': 'not a cursor!'}, 'invalid cursor'),
+    ({'cursor': encode({'sort': 'name'})}, 'invalid cursor'),
+    ({'cursor': encode(['created_at', 'desc', '2024-01-01'])}, 'invalid cursor'),
+    ({'cursor': encode(['created_at', 'desc', '2024-01-01', 'x'])}, 'invalid cursor'),
+    ({'cursor': encode(['name', 'asc', 'Ana', 1])}, 'Cursor does not match the requested sort'),
+    ({'sort': 'phone'}, 'Cannot sort by phone'),
+])
+def test_bad_listing_arguments_are_rejected(client, clients, args, message):
+    response = client.get('/api/clients', query_string=args)
+    assert response.status_code == 400
+    assert response.json['message'] == message
+
+
+@pytest.fixture
+def searchable(app, client):
+    """Clients with distinct names, products and phones, plus another admin's look-alike"""
+    add_admin(app, 2)
+    ids = {
+        'ana': add_client(app, 1, 'Ana Santos', phone='09171234567'),
+        'mariana': add_client(app, 1, 'Mariana Cruz', phone='+63 918 555 0000'),
+        'jose': add_client(app, 1, 'José Reyes', phone='0920-111-2222'),
+        'other': add_client(app, 2, 'Ana Other', phone='09171234567'),
+    }
+    with app.app.app_context():
+        db = app.get_db(1)
+        db.execute("UPDATE clients SET products = 'bigas, sardinas' WHERE id = ?", (ids['jose'],))
+        db.commit()
+    return ids
+
+
+def search(client, q, **args):
+    response = client.get('/api/clients/search', query_string=dict(args, q=q))
+    assert response.status_code == 200, response.json
+    return [row['id'] for row in response.json['clients']]
+
+
+def test_search_matches_names_products_and_phones(client, searchable):
+    assert search(client, 'ana') == [searchable['ana']]  # whole-token prefix, own clients only
+    assert search(client, 'san') == [searchable['ana']]
+    assert search(client, 'jose') == [searchable['jose']]  # diacritics folded
+    assert search(client, 'sardin') == [searchable['jose']]  # updated products re-indexed
+    assert search(client, 'ana santos') == [searchable['ana']]
+    for phone in ('0917 123', '639171234567', '9171234'):
+        assert search(client, phone) == [searchable['ana']]
+    assert search(client, '0918-555') == [searchable['mariana']]
+    assert search(client, 'nobody') == []
+
+
+def test_search_ranks_name_matches_above_product_matches(app, client, searchable):
+    rice = add_client(app, 1, 'Bigasan ni Mang Tomas')
+    assert search(client, 'bigas') == [rice, searchable['jose']]
+
+
+def test_deleted_clients_leave_the_index(app, client, searchable):
+    with app.app.app_context():
+        db = app.get_db(1)
+        db.execute('DELETE FROM clients WHERE id = ?', (searchable['ana'],))
+        db.commit()
+    assert search(client, 'ana') == []
+
+
+def test_search_pages_follow_the_cursor(app, client):
+    ids = [add_client(app, 1, f'Santos {i}') for i in range(5)]
+    first = client.get('/api/clients/search', query_string={'q': 'santos', 'limit': 3}).json
+    second = client.get('/api/clients/search',
+                        query_string={'q': 'santos', 'limit': 3, 'cursor': first['next_cursor']}).json
+    assert second['next_cursor'] is None
+    assert sorted(row['id'] for row in first['clients'] + second['clients']) == ids
+
+    response = client.get('/api/clients/search', query_string={'q': 'reyes', 'cursor': first['next_cursor']})
+    assert response.status_code == 400
+    assert response.json['message'] == 'Cursor does not match the search query'
+
+
+@pytest.mark.parametrize('q', ['', '  ', '"*()'])
+def test_empty_search_is_rejected(client, q):
+    response = client.get('/api/clients/search', query_string={'q': q})
+    assert response.status_code == 400
+    assert response.json['message'] == 'Search query is empty'
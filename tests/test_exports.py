@@ -0,0 +1,60 @@
+import csv
+import io
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import add_client
+
+
+@pytest.fixture
+def reminders(app, client):
+    """Two clients with reminders logged; returns their ids"""
+    today = date.today()
+    first = add_client(app, 1, 'Juan', today - timedelta(days=1))
+    second = add_client(app, 1, 'Maria', today + timedelta(days=5), balance=0)
+    with app.app.app_context():
+        repo = app.get_repository(1)
+        for client_id in (first, first, second):
+            repo.log_sms_reminder(client_id)
+        repo.commit()
+    app.write_buffer.flush()
+    return first, second
+
+
+def test_client_export_streams_csv_with_filters(client, reminders):
+    first, second = reminders
+    response = client.get('/export/clients')
+    assert response.mimetype == 'text/csv'
+    assert 'attachment; filename="clients_export_' in response.headers['Content-Disposition']
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [int(row['id']) for row in rows] == [first, second]
+    assert rows[0]['status'] == 'overdue' and rows[1]['status'] == 'paid'
+
+    response = client.get('/export/clients', query_string={'status': 'paid', 'format': 'ndjson'})
+    assert [json.loads(line)['id'] for line in response.get_data(as_text=True).splitlines()] == [second]
+
+
+def test_reminder_export_filters_by_client(client, reminders):
+    first, second = reminders
+    response = client.get('/export/sms_reminders', query_string={'format': 'ndjson'})
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['client_id'] for row in rows] == [first, first, second]
+    assert rows[0]['client_name'] == 'Juan'
+
+    response = client.get('/export/sms_reminders', query_string={'client_id': second})
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [int(row['client_id']) for row in rows] == [second]
+
+
+@pytest.mark.parametrize('url, args, message', [
+    ('/export/sms_reminders', {'client_id': 'abc'}, 'client_id must be an integer'),
+    ('/export/sms_reminders', {'sent_from': 'last week'}, 'sent_from must be a date (YYYY-MM-DD)'),
+    ('/export/clients', {'format': 'xlsx'}, 'format must be csv or ndjson'),
+    ('/export/clients', {'min_days_overdue': 'x'}, 'min_days_overdue must be an integer'),
+])
+def test_bad_export_arguments_are_rejected(client, url, args, message):
+    response = client.get(url, query_string=args)
+    assert response.status_code == 400
+    assert response.json['message'] == message
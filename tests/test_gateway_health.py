@@ -0,0 +1,75 @@
+import pytest
+
+GLOBE = ('sms.globe.com.ph', 'myglobe.sms.ph')
+SMART = ('sms.smart.com.ph', 'txt.smart.com.ph')
+
+
+@pytest.fixture
+def health(app, monkeypatch):
+    health = app.GatewayHealth(window=10, trip_after=3, trip_seconds=60)
+    monkeypatch.setattr(app, 'gateway_health', health)
+    return health
+
+
+def test_higher_success_rate_ranks_first_within_a_group(health):
+    for _ in range(4):
+        health.record('sms.globe.com.ph', False)
+        health.record('sms.globe.com.ph', True)
+        health.record('myglobe.sms.ph', True)
+    assert health.order(GLOBE, SMART) == ['myglobe.sms.ph', 'sms.globe.com.ph', *SMART]
+
+
+def test_slow_gateways_rank_below_fast_ones(health):
+    health.record('sms.smart.com.ph', True, latency_ms=3000)
+    health.record('txt.smart.com.ph', True, latency_ms=100)
+    assert health.order(SMART) == ['txt.smart.com.ph', 'sms.smart.com.ph']
+
+
+def test_groups_keep_their_order_whatever_the_scores(health):
+    for _ in range(2):
+        health.record('sms.globe.com.ph', False)
+        health.record('sun.com.ph', True)
+    assert health.order(GLOBE, ('sun.com.ph',)) == ['myglobe.sms.ph', 'sms.globe.com.ph', 'sun.com.ph']
+
+
+def test_consecutive_rejections_trip_a_gateway_until_it_cools_down(health, monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr('app.time.monotonic', lambda: clock[0])
+    for _ in range(2):
+        health.record('sms.globe.com.ph', False)
+    health.record('sms.globe.com.ph', True)  # an acceptance resets the streak
+    for _ in range(3):
+        health.record('sms.globe.com.ph', False)
+    assert health.order(GLOBE) == ['myglobe.sms.ph']
+    state = {stat['domain']: stat for stat in health.snapshot()}['sms.globe.com.ph']
+    assert (state['state'], state['consecutive_rejections'], state['sends']) == ('failing', 3, 6)
+
+    clock[0] += 61
+    assert 'sms.globe.com.ph' in health.order(GLOBE)
+
+
+def test_when_every_gateway_is_failing_the_best_one_is_still_tried(health):
+    for domain in GLOBE:
+        for _ in range(3):
+            health.record(domain, False)
+    health.record('myglobe.sms.ph', True)  # an older success gives it the better score
+    for _ in range(3):
+        health.record('myglobe.sms.ph', False)
+    assert health.order(GLOBE) == ['myglobe.sms.ph']
+
+
+def test_delivery_addresses_follow_health(app, health):
+    for _ in range(3):
+        health.record('sms.globe.com.ph', False)
+    health.record('sun.com.ph', True)
+    addresses = app.sms_delivery_addresses('09171234567')
+    assert [address.split('@')[1] for address in addresses] == ['myglobe.sms.ph', 'sun.com.ph', *SMART]
+    assert addresses[0].split('@')[0] == '9171234567'
+
+
+def test_health_route_lists_every_gateway(app, client, health):
+    health.record('sun.com.ph', True, latency_ms=250)
+    gateways = client.get('/gateway_health').json['gateways']
+    assert {stat['domain'] for stat in gateways} == set(GLOBE + SMART + ('sun.com.ph',))
+    assert gateways[0]['domain'] == 'sun.com.ph'
+    assert (gateways[0]['success_rate'], gateways[0]['avg_latency_ms']) == (1.0, 250.0)
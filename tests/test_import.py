@@ -0,0 +1,62 @@
+import io
+from datetime import date, timedelta
+
+
+def upload(client, text, filename='clients.csv'):
+    data = {'file': (io.BytesIO(text.encode('utf-8-sig')), filename)}
+    return client.post('/import_clients', data=data, content_type='multipart/form-data')
+
+
+def test_good_rows_are_imported_and_bad_rows_reported_by_line(app, client):
+    later = (date.today() + timedelta(days=30)).isoformat()
+    response = upload(client, '\n'.join([
+        'Client Name,Mobile,Items,Total,Balance,Due',
+        f'Ana Santos,09171234567,rice,"1,500",500,{later}',
+        f'Ben Cruz,,sugar,200,,{later}',
+        ',09171234567,rice,100,50,',
+        'Carla Reyes,12345,rice,100,50,',
+        'Dan Lim,09181234567,rice,abc,,',
+        'Ella Tan,09181234567,rice,100,150,',
+        'Fe Go,09181234567,rice,100,50,next payday',
+        'Gil Uy,09201234567,oil,300,0,',
+    ]))
+
+    assert response.status_code == 200
+    assert response.json['success'] and response.json['imported'] == 3
+    assert response.json['message'] == 'Imported 3 client(s), skipped 5 invalid row(s)'
+    assert response.json['errors'] == [
+        {'line': 4, 'message': 'Name is required'},
+        {'line': 5, 'message': 'Invalid phone number: 12345'},
+        {'line': 6, 'message': 'Total amount must be a number'},
+        {'line': 7, 'message': 'Remaining balance cannot exceed the total amount'},
+        {'line': 8, 'message': 'Invalid due date: next payday (expected YYYY-MM-DD)'},
+    ]
+
+    with app.app.app_context():
+        db = app.get_db(1)
+        rows = {row['name']: dict(row) for row in db.execute('SELECT * FROM clients')}
+        assert app.diff_admin_summary(db, 1) == {}
+    assert set(rows) == {'Ana Santos', 'Ben Cruz', 'Gil Uy'}
+    assert (rows['Ana Santos']['total_amount'], rows['Ana Santos']['remaining_balance']) == (1500, 500)
+    assert rows['Ana Santos']['phone_e164'] == '+639171234567'
+    assert rows['Ben Cruz']['remaining_balance'] == 200  # blank balance defaults to the total
+    assert rows['Ben Cruz']['status'] == 'pending' and rows['Gil Uy']['status'] == 'paid'
+    assert client.get('/api/clients/search', query_string={'q': 'santos'}).json['clients'][0]['name'] == 'Ana Santos'
+
+
+def test_error_list_is_capped_but_every_bad_row_is_counted(app, client, monkeypatch):
+    monkeypatch.setattr(app, 'IMPORT_MAX_ERRORS', 2)
+    monkeypatch.setattr(app, 'IMPORT_BATCH_SIZE', 2)
+    rows = ['name,total'] + [f'Client {i},100' for i in range(5)] + [',100'] * 4
+    response = upload(client, '\n'.join(rows))
+    assert response.json['imported'] == 5 and response.json['error_count'] == 4
+    assert [error['line'] for error in response.json['errors']] == [7, 8]
+
+
+def test_unreadable_uploads_are_rejected(client):
+    response = upload(client, 'client,phone\nAna,09171234567')
+    assert response.status_code == 400
+    assert response.json['message'] == 'Could not read CSV: CSV is missing required column(s): total_amount'
+
+    response = client.post('/import_clients', data={}, content_type='multipart/form-data')
+    assert response.status_code == 400 and response.json['message'] == 'No CSV file uploaded'
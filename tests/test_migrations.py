@@ -0,0 +1,108 @@
+from datetime import date, timedelta
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def legacy_db(tmp_path, monkeypatch):
+    """A database with only the original tables, as before any migration"""
+    monkeypatch.setattr(app_module, 'AUTO_MIGRATE', False)
+    db = app_module.SQLitePool(str(tmp_path / 'legacy.db')).acquire()
+    app_module.create_base_tables(db)
+    db.execute("INSERT INTO admins (id, username, email, password) VALUES (1, 'owner', 'owner@example.com', 'x')")
+    db.commit()
+    yield db
+    db.close()
+
+
+def add_legacy_client(db, name, due_date, balance=100):
+    return db.execute('''
+        INSERT INTO clients (admin_id, name, phone, products, total_amount, remaining_balance, due_date)
+        VALUES (1, ?, '09171234567', 'rice', 100, ?, ?)
+    ''', (name, balance, due_date)).lastrowid
+
+
+def test_legacy_due_dates_are_normalized_and_unparseable_ones_kept(legacy_db):
+    yesterday = date.today() - timedelta(days=1)
+    ids = {
+        'iso': add_legacy_client(legacy_db, 'iso', '2030-01-05'),
+        'us': add_legacy_client(legacy_db, 'us', yesterday.strftime('%m/%d/%Y')),
+        'garbage': add_legacy_client(legacy_db, 'garbage', 'next payday'),
+        'paid': add_legacy_client(legacy_db, 'paid', '2020-01-01', balance=0),
+    }
+    legacy_db.commit()
+
+    app_module.run_migrations(legacy_db)
+
+    rows = {row['id']: row for row in legacy_db.execute(
+        'SELECT id, due_date, due_date_raw, status, days_overdue FROM clients')}
+    assert (rows[ids['iso']]['due_date'], rows[ids['iso']]['status']) == ('2030-01-05', 'pending')
+    assert rows[ids['us']]['due_date'] == yesterday.isoformat()
+    assert (rows[ids['us']]['status'], rows[ids['us']]['days_overdue']) == ('overdue', 1)
+    assert rows[ids['garbage']]['due_date'] is None
+    assert rows[ids['garbage']]['due_date_raw'] == 'next payday'
+    assert rows[ids['garbage']]['status'] == 'pending'
+    assert rows[ids['paid']]['status'] == 'paid' and rows[ids['paid']]['days_overdue'] is None
+
+
+def index_names(db):
+    return {row['name'] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+
+def test_balance_sort_uses_the_summary_index(app):
+    with app.app.app_context():
+        db = app.get_db()
+        sort = app.CLIENT_SORT_COLUMNS['balance']
+        plan = [row['detail'] for row in db.execute(f'''
+            EXPLAIN QUERY PLAN
+            SELECT {app.CLIENT_LIST_COLUMNS} FROM clients
+            WHERE admin_id = :admin_id AND {app._keyset_condition(sort, True)}
+            ORDER BY {sort} DESC, id DESC LIMIT 51
+        ''', {'admin_id': 1, 'cursor_value': 100, 'cursor_id': 1})]
+
+        assert any('idx_clients_admin_summary' in detail for detail in plan), plan
+        assert not any(detail.startswith('SCAN clients') for detail in plan), plan
+        assert 'idx_clients_admin_balance' not in index_names(db)
+
+
+def test_migrations_apply_once(legacy_db):
+    versions = [version for version, _, _ in app_module.MIGRATIONS]
+    add_legacy_client(legacy_db, 'Juan', '2030-01-05')
+    legacy_db.commit()
+
+    assert app_module.run_migrations(legacy_db) == versions
+    before = index_names(legacy_db)
+    assert app_module.run_migrations(legacy_db) == []
+    assert app_module.get_schema_version(legacy_db) == versions[-1]
+    assert index_names(legacy_db) == before
+    assert legacy_db.execute('SELECT COUNT(*) FROM clients').fetchone()[0] == 1
+
+
+def test_hot_queries_use_indexes(app):
+    with app.app.app_context():
+        assert app.check_hot_query_plans(app.get_db()) == []
+
+    result = app.app.test_cli_runner().invoke(args=['check-query-plans'])
+    assert result.exit_code == 0, result.output
+    assert f'OK: {len(app.HOT_QUERIES)} hot queries use indexes' in result.output
+
+
+def test_plan_check_fails_on_a_table_scan(app, monkeypatch):
+    monkeypatch.setattr(app, 'HOT_QUERIES', app.HOT_QUERIES + [
+        ('clients_by_products', 'SELECT * FROM clients WHERE products = ?', ('rice',))])
+    with app.app.app_context():
+        assert app.check_hot_query_plans(app.get_db()) == [('clients_by_products', 'SCAN clients')]
+
+    result = app.app.test_cli_runner().invoke(args=['check-query-plans'])
+    assert result.exit_code == 1
+    assert 'FAIL clients_by_products: SCAN clients' in result.output
+
+
+def test_plan_check_fails_when_an_index_is_missing(app):
+    with app.app.app_context():
+        db = app.get_db()
+        db.execute('DROP INDEX idx_sms_reminders_client_sent')
+        problems = dict(app.check_hot_query_plans(db))
+        assert problems['client_last_reminder'] == 'SCAN sms_reminders'
@@ -0,0 +1,134 @@
+import threading
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import add_client
+
+ADMIN_EMAIL = 'admin1@example.com'
+
+
+def subjects(brevo_stub):
+    return [version.get('subject', body.get('subject'))
+            for body in brevo_stub.requests for version in body.get('messageVersions') or [body]]
+
+
+def send_alerts(app, today):
+    with app.app.app_context():
+        return app.send_new_payment_alerts(app.get_repository(1), 1, ADMIN_EMAIL, today)
+
+
+@pytest.fixture
+def due(app, client):
+    """A client due tomorrow, one overdue and one paid"""
+    today = date.today()
+    return {
+        'tomorrow': add_client(app, 1, 'Ana', today + timedelta(days=1)),
+        'overdue': add_client(app, 1, 'Ben', today - timedelta(days=1)),
+        'paid': add_client(app, 1, 'Cora', today, balance=0),
+    }
+
+
+# Instant alerts (notification ledger)
+def test_each_status_transition_is_alerted_once(app, due, brevo_stub):
+    today = date.today()
+    assert send_alerts(app, today) == 2
+    assert sorted(subject.split(' - ')[0] for subject in subjects(brevo_stub)) == \
+        ['[AUTO-ALERT] DUE TOMORROW', '[AUTO-ALERT] OVERDUE']
+
+    brevo_stub.requests.clear()
+    assert send_alerts(app, today) == 0
+    assert brevo_stub.requests == []
+
+    # Next day Ana moves to due today; Ben is still overdue on the same due date
+    assert send_alerts(app, today + timedelta(days=1)) == 1
+    assert subjects(brevo_stub) == ['[AUTO-ALERT] DUE TODAY - Ana (PHP300.00)']
+
+
+def test_a_new_due_date_is_a_new_transition(app, client, due, brevo_stub, monkeypatch):
+    monkeypatch.setattr(app, 'trigger_payment_notifications', lambda admin_id: None)  # no background run
+    today = date.today()
+    send_alerts(app, today)
+    client.post('/bulk_update', json={'operation': 'shift_due_date', 'client_ids': [due['overdue']], 'days': 2})
+    brevo_stub.requests.clear()
+    assert send_alerts(app, today) == 1
+    assert subjects(brevo_stub) == ['[AUTO-ALERT] DUE TOMORROW - Ben (PHP300.00)']
+
+
+def test_failed_alerts_are_released_for_the_next_run(app, due, brevo_stub):
+    brevo_stub.respond = lambda body: (400, {}, 0)
+    assert send_alerts(app, date.today()) == 0
+
+    brevo_stub.respond = lambda body: (201, {}, 0)
+    assert send_alerts(app, date.today()) == 2
+
+
+def test_digest_admins_get_no_instant_alerts(app, client, due, brevo_stub):
+    assert client.post('/notification_settings', json={'mode': 'digest'}).json['mode'] == 'digest'
+    assert app.check_and_send_instant_notifications(1) == 0
+    assert brevo_stub.requests == []
+
+
+# Daily digest
+def digest_admin(app, client):
+    client.post('/notification_settings', json={'mode': 'digest'})
+    with app.app.app_context():
+        repo = app.get_repository(None)
+        admins = repo.digest_admins()
+        repo.close()
+    assert [admin['id'] for admin in admins] == [1]
+    return admins
+
+
+def test_digest_is_claimed_once_per_day_across_concurrent_runs(app, client, due, brevo_stub):
+    admins = digest_admin(app, client)
+    today = date.today()
+    results = []
+
+    def run():
+        with app.app.app_context():
+            results.append(app.send_payment_digests(admins, today))
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [0, 0, 0, 1]
+    assert subjects(brevo_stub) == [f'[DIGEST] {today.isoformat()}: 2 due (PHP600.00)']
+
+    with app.app.app_context():
+        assert app.send_payment_digests(admins, today) == 0
+        assert app.send_payment_digests(admins, today + timedelta(days=1)) == 1
+
+
+def test_failed_digest_releases_the_claim(app, client, due, brevo_stub):
+    admins = digest_admin(app, client)
+    brevo_stub.respond = lambda body: (400, {}, 0)
+    with app.app.app_context():
+        assert app.send_payment_digests(admins) == 0
+        brevo_stub.respond = lambda body: (201, {}, 0)
+        assert app.send_payment_digests(admins) == 1
+
+
+def test_on_demand_digest_leaves_the_daily_claim_alone(app, client, due, brevo_stub):
+    admins = digest_admin(app, client)
+    assert client.post('/send_digest').json['success']
+    with app.app.app_context():
+        assert app.send_payment_digests(admins) == 1
+    assert len(subjects(brevo_stub)) == 2
+
+
+def test_digest_groups_clients_by_status_largest_balance_first(app):
+    today = date.today()
+    clients = [
+        {'name': 'Small', 'phone': None, 'due_date': today.isoformat(), 'remaining_balance': 50, 'status': 'due_today'},
+        {'name': 'Late', 'phone': None, 'due_date': '2020-01-01', 'remaining_balance': 10, 'status': 'overdue'},
+        {'name': 'Large', 'phone': None, 'due_date': today.isoformat(), 'remaining_balance': 900, 'status': 'due_today'},
+        {'name': 'Paid', 'phone': None, 'due_date': today.isoformat(), 'remaining_balance': 0, 'status': 'paid'},
+    ]
+    subject, html = app.build_payment_digest(clients, today)
+    assert subject == f'[DIGEST] {today.isoformat()}: 3 due (PHP960.00)'
+    assert html.index('Late') < html.index('Large') < html.index('Small')
+    assert 'Paid' not in html
+    assert app.build_payment_digest(clients[3:], today) is None
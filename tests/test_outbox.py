@@ -0,0 +1,140 @@
+from datetime import date
+
+import pytest
+
+from conftest import add_admin, add_client
+
+
+@pytest.fixture
+def queued(app, brevo_stub):
+    """Admin 1 with two SMS reminders queued in the outbox; yields (db, job_id)"""
+    add_admin(app, 1)
+    add_client(app, 1, 'Juan', date.today(), phone='09171234567')
+    add_client(app, 1, 'Maria', date.today(), phone='09181234567')
+    with app.app.app_context():
+        db = app.get_db(1)
+        clients = app.get_repository(1).sms_eligible_clients(1)
+        job_id, queued, skipped = app.enqueue_sms_job(db, 1, clients)
+        assert (queued, skipped) == (2, 0)
+        yield db, job_id
+
+
+def outbox(db):
+    return {row['client_id']: dict(row) for row in db.execute('SELECT * FROM outbox')}
+
+
+def make_due(db):
+    db.execute("UPDATE outbox SET next_attempt_at = datetime('now', '-1 second')")
+    db.commit()
+
+
+def test_sends_logs_and_finishes_the_job(app, queued, brevo_stub):
+    db, job_id = queued
+
+    assert app.process_outbox(app.DATABASE) == 2
+    assert {row['status'] for row in outbox(db).values()} == {'sent'}
+    assert db.execute('SELECT COUNT(*) FROM sms_reminders').fetchone()[0] == 2
+    progress = app.get_job_progress(db, 1, job_id)
+    assert (progress['status'], progress['sent'], progress['pending']) == ('done', 2, 0)
+    assert progress['finished_at'] is not None
+    assert len(brevo_stub.requests) == 1  # one batched call
+
+
+def test_claim_is_a_lease(app, queued):
+    db, job_id = queued
+
+    assert len(app.claim_outbox(db, lease_seconds=300)) == 2
+    assert app.claim_outbox(db) == []  # leased to the first worker
+    make_due(db)  # the lease ran out: that worker died
+    assert [row['attempts'] for row in app.claim_outbox(db)] == [2, 2]
+
+
+def test_failed_send_is_retried_with_backoff(app, queued, brevo_stub, monkeypatch):
+    db, job_id = queued
+    monkeypatch.setattr(app.brevo, 'max_retries', 0)
+    brevo_stub.respond = lambda body: (503, {}, 0)
+
+    app.process_outbox(app.DATABASE)
+    rows = outbox(db)
+    assert {(row['status'], row['attempts'], row['last_error']) for row in rows.values()} == \
+        {('pending', 1, 'Brevo API call failed')}
+    assert db.execute("SELECT COUNT(*) FROM outbox WHERE next_attempt_at > datetime('now')").fetchone()[0] == 2
+    assert app.process_outbox(app.DATABASE) == 0  # not due yet
+
+    brevo_stub.script()
+    make_due(db)
+    assert app.process_outbox(app.DATABASE) == 2
+    assert {(row['status'], row['attempts']) for row in outbox(db).values()} == {('sent', 2)}
+
+
+def test_gives_up_after_max_attempts(app, queued, brevo_stub, monkeypatch):
+    db, job_id = queued
+    monkeypatch.setattr(app, 'OUTBOX_MAX_ATTEMPTS', 2)
+    monkeypatch.setattr(app.brevo, 'max_retries', 0)
+    brevo_stub.respond = lambda body: (503, {}, 0)
+
+    for _ in range(2):
+        make_due(db)
+        app.process_outbox(app.DATABASE)
+    assert {(row['status'], row['attempts']) for row in outbox(db).values()} == {('failed', 2)}
+    assert app.get_job_progress(db, 1, job_id)['status'] == 'done'
+
+
+def test_deferred_sends_do_not_use_up_attempts(app, queued, brevo_stub, monkeypatch):
+    db, job_id = queued
+    monkeypatch.setattr(app, 'brevo', app.BrevoClient(
+        api_url=brevo_stub.url, api_key='test-key', max_retries=0, breaker_threshold=1,
+        breaker_cooldown=300, limiter=app.RateLimiter(limits={})))
+    brevo_stub.respond = lambda body: (503, {}, 0)
+
+    app.process_outbox(app.DATABASE)  # fails and opens the breaker
+    for _ in range(3):
+        make_due(db)
+        app.process_outbox(app.DATABASE)
+
+    assert len(brevo_stub.requests) == 1
+    assert {(row['status'], row['attempts']) for row in outbox(db).values()} == {('pending', 1)}
+    assert {row['last_error'] for row in outbox(db).values()} == \
+        {'Deferred: Brevo circuit open or rate limit reached'}
+
+
+def test_known_bad_number_fails_without_a_send(app, queued, brevo_stub):
+    db, job_id = queued
+    db.execute("INSERT INTO gateway_memo (phone, failures, bad_until) VALUES ('9171234567', 3, datetime('now', '+7 days'))")
+    db.commit()
+
+    app.process_outbox(app.DATABASE)
+    rows = {row['recipient']: row for row in outbox(db).values()}
+    bad = rows['+639171234567']
+    assert (bad['status'], bad['attempts']) == ('failed', 1)
+    assert bad['last_error'] == 'Invalid or known-bad number: no gateway to try'
+    assert rows['+639181234567']['status'] == 'sent'
+    assert [brevo_stub.recipients(body) for body in brevo_stub.requests] == [['9181234567@sms.smart.com.ph']]
+
+
+def test_unanswered_send_is_not_retried(app, queued, brevo_stub, monkeypatch):
+    db, job_id = queued
+    monkeypatch.setattr(app.brevo, 'timeout', (1, 0.1))
+    brevo_stub.respond = lambda body: (201, {}, 0.5)
+
+    app.process_outbox(app.DATABASE)
+    assert {row['status'] for row in outbox(db).values()} == {'failed'}
+    assert app.get_job_progress(db, 1, job_id)['status'] == 'done'
+
+
+def test_job_progress_route_reports_partial_counts(app, client, brevo_stub):
+    add_client(app, 1, 'Juan', date.today(), phone='09171234567')
+    add_client(app, 1, 'Maria', date.today(), phone='09181234567')
+    job_id = client.post('/send_all_sms_reminders').json['job_id']
+
+    progress = client.get(f'/jobs/{job_id}').json
+    assert (progress['status'], progress['total'], progress['sent'], progress['pending']) == ('running', 2, 0, 2)
+
+    with app.app.app_context():
+        db = app.get_db(1)
+        db.execute("UPDATE outbox SET next_attempt_at = datetime('now', '+1 hour') WHERE recipient = '+639181234567'")
+        db.commit()
+    app.process_outbox(app.DATABASE)  # no worker ever picks up the other row
+    progress = client.get(f'/jobs/{job_id}').json
+    assert (progress['status'], progress['sent'], progress['failed'], progress['pending']) == ('running', 1, 0, 1)
+    assert client.get(f'/jobs/{job_id + 1}').status_code == 404
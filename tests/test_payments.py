@@ -0,0 +1,58 @@
+from datetime import date, timedelta
+
+from conftest import add_client
+
+
+def test_partial_payments_build_a_running_balance(app, client):
+    client_id = add_client(app, 1, 'Juan', date.today() + timedelta(days=3), balance=300)
+
+    response = client.post(f'/record_payment/{client_id}', json={'amount': '120', 'method': 'gcash'})
+    assert response.json['success'] and response.json['payment']['balance_after'] == 180
+
+    response = client.post(f'/record_payment/{client_id}', json={'amount': '200'})
+    assert not response.json['success']
+    assert response.json['message'] == 'Payment exceeds the remaining balance of P180.00'
+
+    response = client.post(f'/record_payment/{client_id}', json={'amount': '180'})
+    assert response.json['success'] and response.json['payment']['balance_after'] == 0
+    response = client.post(f'/record_payment/{client_id}', json={'amount': '1'})
+    assert response.json['message'] == 'Client has no remaining balance'
+
+    history = client.get(f'/payments/{client_id}').json['payments']
+    assert [(payment['amount'], payment['balance_after']) for payment in history] == [(180, 0), (120, 180)]
+
+    with app.app.app_context():
+        row = app.get_db(1).execute('SELECT remaining_balance, status, paid_at FROM clients WHERE id = ?',
+                                    (client_id,)).fetchone()
+        assert (row['remaining_balance'], row['status']) == (0, 'paid')
+        assert row['paid_at'] is not None
+
+
+def test_collection_report_sums_the_ledger(app, client):
+    first = add_client(app, 1, 'Juan', date.today(), balance=300)
+    add_client(app, 1, 'Maria', date.today(), balance=100)
+    client.post(f'/record_payment/{first}', json={'amount': '100', 'method': 'gcash'})
+    client.post(f'/record_payment/{first}', json={'amount': '200'})
+
+    report = client.get('/collection_report').json['report']
+    assert report['payment_count'] == 2 and report['collected'] == 300
+    assert report['clients_paying'] == 1 and report['accounts_settled'] == 1
+    assert report['outstanding'] == 100 and report['collection_rate'] == 75.0
+    assert {row['method']: row['collected'] for row in report['by_method']} == {'cash': 200, 'gcash': 100}
+
+
+def test_recent_paid_clients_use_the_paid_at_index(app, client):
+    with app.app.app_context():
+        db = app.get_db()
+        db.executemany('''
+            INSERT INTO clients (admin_id, name, products, total_amount, remaining_balance, due_date)
+            VALUES (1, 'client', 'rice', 100, ?, '2030-01-01')
+        ''', [(0 if i % 50 == 0 else 100,) for i in range(500)])
+        db.execute('ANALYZE')
+        indexes = {row['name'] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        plan = [row['detail'] for row in db.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT * FROM clients WHERE admin_id = 1 AND remaining_balance <= 0 ORDER BY paid_at DESC LIMIT 5
+        ''')]
+    assert 'idx_clients_admin_paid_created' not in indexes
+    assert any('idx_clients_admin_paid_at' in detail for detail in plan), plan
@@ -0,0 +1,49 @@
+import pytest
+
+from conftest import add_admin, add_client
+
+
+@pytest.mark.parametrize('phone, e164, carrier', [
+    ('0917 123 4567', '+639171234567', 'globe'),
+    ('+63 918-123-4567', '+639181234567', 'smart'),
+    ('9221234567', '+639221234567', 'sun'),
+    ('09011234567', '+639011234567', None),  # valid number, unknown prefix
+    ('12345', None, None),
+    ('', None, None),
+])
+def test_phone_columns(app, phone, e164, carrier):
+    assert app.phone_columns(phone) == {'phone_e164': e164, 'carrier': carrier}
+
+
+def test_unknown_prefix_is_stored_as_null_and_tries_every_gateway(app):
+    add_admin(app, 1)
+    client_id = add_client(app, 1, 'Unknown prefix', phone='09011234567')
+
+    with app.app.app_context():
+        row = app.get_db(1).execute('SELECT phone_e164, carrier FROM clients WHERE id = ?', (client_id,)).fetchone()
+    assert (row['phone_e164'], row['carrier']) == ('+639011234567', None)
+    domains = {address.split('@', 1)[1] for address in app.sms_delivery_addresses(row['phone_e164'], row['carrier'])}
+    assert domains == app.SMS_GATEWAY_DOMAIN_SET
+
+
+def test_known_carrier_gateways_come_first(app):
+    addresses = app.sms_delivery_addresses('09181234567', 'smart')
+    assert [address.split('@', 1)[1] for address in addresses[:2]] == list(app.SMS_GATEWAY_DOMAINS['smart'])
+    assert len(addresses) == len(app.SMS_GATEWAY_DOMAIN_SET)
+
+
+def test_backfill_fills_rows_written_before_the_columns(app):
+    add_admin(app, 1)
+    with app.app.app_context():
+        db = app.get_db(1)
+        db.executemany('''
+            INSERT INTO clients (admin_id, name, phone, products, total_amount, remaining_balance)
+            VALUES (1, ?, ?, 'rice', 100, 100)
+        ''', [('globe', '09171234567'), ('unknown', '09011234567'), ('invalid', '123'), ('none', None)])
+        db.commit()
+
+        assert app.backfill_phone_columns(db, batch_size=2) == 2
+        rows = {row['name']: (row['phone_e164'], row['carrier'])
+                for row in db.execute('SELECT name, phone_e164, carrier FROM clients')}
+    assert rows == {'globe': ('+639171234567', 'globe'), 'unknown': ('+639011234567', None),
+                    'invalid': (None, None), 'none': (None, None)}
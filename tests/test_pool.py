@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def pool(tmp_path):
+    return app_module.SQLitePool(str(tmp_path / 'pool.db'), size=2, timeout=0.05)
+
+
+def test_released_connections_are_reused(pool):
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+
+    stats = pool.snapshot()
+    assert (stats['hits'], stats['misses'], stats['open']) == (1, 1, 1)
+
+
+def test_connections_are_tuned(pool):
+    conn = pool.acquire()
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == app_module.DB_JOURNAL_MODE.lower()
+    assert conn.execute('PRAGMA foreign_keys').fetchone()[0] == 1
+    assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == app_module.DB_BUSY_TIMEOUT_MS
+
+
+def test_release_rolls_back_an_unfinished_transaction(pool):
+    conn = pool.acquire()
+    conn.execute('CREATE TABLE t (x INTEGER)')
+    conn.commit()
+    conn.execute('INSERT INTO t VALUES (1)')
+    pool.release(conn)
+
+    conn = pool.acquire()
+    assert not conn.in_transaction
+    assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+
+
+def test_full_pool_times_out(pool):
+    held = [pool.acquire(), pool.acquire()]
+    with pytest.raises(sqlite3.OperationalError, match='waiting for a database connection'):
+        pool.acquire()
+    assert pool.snapshot()['timeouts'] == 1
+
+    pool.release(held.pop())
+    assert pool.acquire() is not None
+    assert pool.snapshot()['open'] == 2
+
+
+def test_requests_hand_their_connections_back(app, client):
+    for _ in range(3):
+        assert client.get('/api/clients').status_code == 200
+    stats = app.get_pool().snapshot()
+    assert stats['idle'] == stats['open'] == 1
+    assert stats['hits'] >= 2
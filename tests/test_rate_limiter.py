@@ -0,0 +1,83 @@
+import pytest
+
+
+class FakeClock:
+    """Stands in for app.time: sleeping just moves the clock forward"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(app, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(app, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def limiter_for(app, tmp_path, clock):
+    def make(limits, max_wait=60):
+        return app.RateLimiter(database=str(tmp_path / 'buckets.db'), limits=limits, max_wait=max_wait)
+    return make
+
+
+def test_burst_is_free_then_tokens_refill_at_the_rate(limiter_for, clock):
+    limiter = limiter_for({'email': (2.0, 4.0)})
+    assert [limiter.acquire({'email': 1}) for _ in range(4)] == [0, 0, 0, 0]
+    assert limiter.acquire({'email': 1}) == pytest.approx(0.5)
+
+    clock.sleep(1.0)  # two tokens back
+    assert limiter.acquire({'email': 2}) == 0
+    assert limiter.acquire({'email': 1}) == pytest.approx(0.5)
+
+    clock.sleep(100)  # refill stops at the burst size
+    assert [limiter.acquire({'email': 1}) for _ in range(4)] == [0, 0, 0, 0]
+    assert limiter.acquire({'email': 1}) > 0
+    stats = limiter.snapshot()
+    assert (stats['acquired'], stats['waited']) == (12, 3)
+
+
+def test_oversized_request_leaves_the_bucket_in_debt(limiter_for):
+    limiter = limiter_for({'email': (2.0, 4.0)})
+    assert limiter.acquire({'email': 10}) == 0
+    assert limiter.acquire({'email': 1}) == pytest.approx(3.5)  # (6 owed + 1) / 2 per second
+
+
+def test_a_wait_longer_than_max_wait_raises(app, limiter_for):
+    limiter = limiter_for({'email': (1.0, 2.0)}, max_wait=1)
+    limiter.acquire({'email': 2})
+    with pytest.raises(app.RateLimitExceeded, match='email'):
+        limiter.acquire({'email': 2})
+    assert limiter.snapshot()['exceeded'] == 1
+
+
+def test_all_buckets_pay_together_or_not_at_all(app, limiter_for, clock):
+    limiter = limiter_for({'email': (1.0, 5.0), 'gateway': (1.0, 1.0)}, max_wait=0.5)
+    limiter.acquire({'gateway:sms.globe.com.ph': 1})
+    with pytest.raises(app.RateLimitExceeded):
+        limiter.acquire({'email': 1, 'gateway:sms.globe.com.ph': 1})
+    assert [limiter.acquire({'email': 1}) for _ in range(5)] == [0] * 5  # nothing was taken
+
+
+def test_limiters_on_one_database_share_the_budget(limiter_for):
+    first, second = limiter_for({'email': (1.0, 2.0)}), limiter_for({'email': (1.0, 2.0)})
+    first.acquire({'email': 2})
+    assert second.acquire({'email': 1}) == pytest.approx(1.0)
+
+
+def test_gateway_limits_fall_back_from_domain_to_carrier_default(app):
+    limiter = app.RateLimiter(limits={'gateway': (1.0, 1.0), 'sun.com.ph': (5.0, 5.0), 'email': (0, 0)})
+    assert limiter.limit_for('gateway:sun.com.ph') == (5.0, 5.0)
+    assert limiter.limit_for('gateway:sms.globe.com.ph') == (1.0, 1.0)
+    assert limiter.limit_for('email') is None
+    assert app.parse_rate_limits('email=5/20, gateway=0.5') == {'email': (5.0, 20.0), 'gateway': (0.5, 1.0)}
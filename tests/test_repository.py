@@ -0,0 +1,288 @@
+"""Repository methods run against both storage backends.
+
+The MySQL half needs a server: set MYSQL_TEST_HOST (and MYSQL_TEST_PORT,
+MYSQL_TEST_USER, MYSQL_TEST_PASSWORD, MYSQL_TEST_DATABASE) to use an existing
+one, or have docker available and a throwaway MariaDB container is started.
+Otherwise those tests are skipped.
+"""
+import os
+import shutil
+import subprocess
+import time
+from datetime import date, timedelta
+
+import pytest
+
+import app as app_module
+
+MYSQL_TABLES = ('notification_ledger', 'sms_reminders', 'clients', 'admins')
+
+
+def mysql_connect(server):
+    return app_module.MySQLdb.connect(host=server['host'], port=server['port'], user=server['user'],
+                                      passwd=server['password'], db=server['database'])
+
+
+def wait_for_mysql(server, timeout=120):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            mysql_connect(server).close()
+            return
+        except app_module.MySQLdb.Error:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(1)
+
+
+@pytest.fixture(scope='session')
+def mysql_server():
+    """Connection settings for a MySQL/MariaDB server the tests may freely write to"""
+    if app_module.MySQLdb is None:
+        pytest.skip('mysqlclient is not installed')
+    if os.getenv('MYSQL_TEST_HOST'):
+        server = {
+            'host': os.environ['MYSQL_TEST_HOST'],
+            'port': int(os.getenv('MYSQL_TEST_PORT', '3306')),
+            'user': os.getenv('MYSQL_TEST_USER', 'root'),
+            'password': os.getenv('MYSQL_TEST_PASSWORD', ''),
+            'database': os.getenv('MYSQL_TEST_DATABASE', 'utang_test'),
+        }
+        wait_for_mysql(server)
+        yield server
+        return
+
+    if shutil.which('docker') is None:
+        pytest.skip('set MYSQL_TEST_HOST or install docker to run the MySQL tests')
+    name = f'utang-test-mariadb-{os.getpid()}'
+    started = subprocess.run(
+        ['docker', 'run', '-d', '--rm', '--name', name, '-p', '127.0.0.1::3306',
+         '-e', 'MARIADB_ROOT_PASSWORD=secret', '-e', 'MARIADB_DATABASE=utang_test', 'mariadb:11'],
+        capture_output=True, text=True)
+    if started.returncode != 0:
+        pytest.skip(f'could not start a MariaDB container: {started.stderr.strip()}')
+    try:
+        mapped = subprocess.run(['docker', 'port', name, '3306/tcp'], capture_output=True, text=True, check=True)
+        server = {'host': '127.0.0.1', 'port': int(mapped.stdout.splitlines()[0].rsplit(':', 1)[1]),
+                  'user': 'root', 'password': 'secret', 'database': 'utang_test'}
+        wait_for_mysql(server)
+        yield server
+    finally:
+        subprocess.run(['docker', 'rm', '-f', name], capture_output=True)
+
+
+@pytest.fixture
+def mysql(app, mysql_server, monkeypatch):
+    """The app pointed at an empty, freshly created MySQL schema"""
+    monkeypatch.setattr(app, 'DB_BACKEND', 'mysql')
+    monkeypatch.setattr(app, 'MYSQL_HOST', mysql_server['host'])
+    monkeypatch.setattr(app, 'MYSQL_PORT', mysql_server['port'])
+    monkeypatch.setattr(app, 'MYSQL_USER', mysql_server['user'])
+    monkeypatch.setattr(app, 'MYSQL_PASSWORD', mysql_server['password'])
+    monkeypatch.setattr(app, 'MYSQL_DATABASE', mysql_server['database'])
+    monkeypatch.setattr(app, '_pools', {})
+    monkeypatch.setattr(app.MySQLRepository, '_statuses_as_of', {})
+
+    conn = mysql_connect(mysql_server)
+    cursor = conn.cursor()
+    cursor.execute('SET FOREIGN_KEY_CHECKS = 0')
+    for table in MYSQL_TABLES:
+        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+    conn.close()
+    app.MySQLRepository.create_schema()
+    yield mysql_server
+
+
+@pytest.fixture(params=['sqlite', 'mysql'])
+def repo(request, app):
+    """A repository on each backend, inside an app context"""
+    if request.param == 'mysql':
+        request.getfixturevalue('mysql')
+    with app.app.app_context():
+        repository = app.get_repository()
+        assert isinstance(repository, app.MySQLRepository if request.param == 'mysql' else app.SQLiteRepository)
+        yield repository
+        repository.close()
+
+
+def client_fields(name, due_date, balance=300, total=500, phone='09171234567'):
+    return {'name': name, 'phone': phone, 'products': 'rice', 'total_amount': total,
+            'remaining_balance': balance, 'due_date': due_date.isoformat() if due_date else None}
+
+
+def add_admin(repo, email='owner@example.com'):
+    admin_id = repo.create_admin('owner', email, 'hashed')
+    repo.commit()
+    return admin_id
+
+
+# Placeholder translation (no server needed)
+@pytest.mark.parametrize('sql, expected', [
+    ('SELECT * FROM clients WHERE id = :id AND admin_id = :admin_id',
+     'SELECT * FROM clients WHERE id = %(id)s AND admin_id = %(admin_id)s'),
+    ("SELECT * FROM clients WHERE name LIKE '%rice%' AND id = :id",
+     "SELECT * FROM clients WHERE name LIKE '%%rice%%' AND id = %(id)s"),
+    ("SELECT '10:30' AS t, :_x1 AS x", "SELECT '10:30' AS t, %(_x1)s AS x"),
+    ('SELECT a::text FROM t', 'SELECT a::text FROM t'),
+])
+def test_translate(sql, expected):
+    assert app_module.MySQLRepository.translate(sql) == expected
+
+
+# Admins
+def test_admin_round_trip(repo):
+    first = add_admin(repo, 'first@example.com')
+    second = add_admin(repo, 'second@example.com')
+
+    assert first and second == first + 1  # lastrowid of each insert
+    assert repo.get_admin(first)['email'] == 'first@example.com'
+    assert repo.get_admin_by_email('second@example.com')['id'] == second
+    assert repo.get_admin(second + 100) is None
+    assert repo.get_admin_by_email('nobody@example.com') is None
+    assert repo.get_admin(first)['notification_mode'] == 'instant'
+
+    assert repo.set_notification_mode(second, 'digest') == 1
+    repo.commit()
+    assert [admin['id'] for admin in repo.digest_admins()] == [second]
+
+
+# Clients
+def test_client_crud(repo):
+    admin_id = add_admin(repo)
+    other_id = add_admin(repo, 'other@example.com')
+    yesterday = date.today() - timedelta(days=1)
+
+    client_id = repo.create_client(admin_id, client_fields('Juan', yesterday))
+    repo.commit()
+    client = repo.get_client(admin_id, client_id)
+    assert client['name'] == 'Juan'
+    assert client['due_date'] == yesterday.isoformat()
+    assert client['remaining_balance'] == 300
+    assert client['status'] == 'overdue' and client['days_overdue'] == 1
+    assert client['phone_e164'] == '+639171234567' and client['carrier'] == 'globe'
+    assert repo.get_client(other_id, client_id) is None
+
+    assert repo.update_client(admin_id, client_id, client_fields('Juan', yesterday, balance=0)) == 1
+    repo.commit()
+    client = repo.get_client(admin_id, client_id)
+    assert client['status'] == 'paid' and client['paid_at'] is not None
+    assert repo.update_client(other_id, client_id, client_fields('Juan', yesterday)) == 0
+
+    assert repo.delete_client(other_id, client_id) == 0
+    assert repo.delete_client(admin_id, client_id) == 1
+    repo.commit()
+    assert repo.get_client(admin_id, client_id) is None
+
+
+def test_due_and_sms_eligible_clients(repo):
+    admin_id = add_admin(repo)
+    today = date.today()
+    ids = {
+        name: repo.create_client(admin_id, client_fields(name, due, **extra))
+        for name, due, extra in [
+            ('yesterday', today - timedelta(days=1), {}),
+            ('today', today, {}),
+            ('tomorrow', today + timedelta(days=1), {'phone': ''}),
+            ('next week', today + timedelta(days=7), {}),
+            ('paid today', today, {'balance': 0}),
+            ('no due date', None, {'phone': None}),
+        ]
+    }
+    repo.commit()
+
+    assert [client['id'] for client in repo.due_clients(admin_id, today)] == \
+        [ids['yesterday'], ids['today'], ids['tomorrow']]
+    assert repo.count_due_between(admin_id, today, today + timedelta(days=7)) == 3
+    eligible = {client['id'] for client in repo.sms_eligible_clients(admin_id)}
+    assert eligible == {ids['yesterday'], ids['today'], ids['next week']}
+    assert repo.count_sms_eligible(admin_id) == 3
+    assert [client['id'] for client in repo.recent_paid_clients(admin_id)] == [ids['paid today']]
+
+
+def test_log_sms_reminder_skips_deleted_clients(repo, app):
+    admin_id = add_admin(repo)
+    client_id = repo.create_client(admin_id, client_fields('Juan', date.today()))
+    repo.commit()
+
+    repo.log_sms_reminder(client_id)
+    repo.log_sms_reminder(client_id + 100)
+    repo.commit()
+    app.write_buffer.flush()  # SQLite group-commits reminder rows
+
+    rows = repo.fetchall('SELECT client_id, method FROM sms_reminders')
+    assert rows == [{'client_id': client_id, 'method': 'email_gateway'}]
+
+
+def test_claim_notifications_once_per_status_and_due_date(repo):
+    admin_id = add_admin(repo)
+    today = date.today()
+    client_id = repo.create_client(admin_id, client_fields('Juan', today))
+    repo.commit()
+    due = repo.due_clients(admin_id, today)
+
+    assert [client['id'] for client in repo.claim_notifications(admin_id, due, today)] == [client_id]
+    repo.commit()
+    assert repo.claim_notifications(admin_id, due, today) == []
+
+    repo.release_notifications(due)
+    repo.commit()
+    assert [client['id'] for client in repo.claim_notifications(admin_id, due, today)] == [client_id]
+
+
+def test_claim_digest_once_per_day(repo):
+    admin_id = add_admin(repo)
+    today = date.today()
+
+    assert repo.claim_digest(admin_id, today)
+    repo.commit()
+    assert not repo.claim_digest(admin_id, today)
+    repo.release_digest(admin_id, None)
+    repo.commit()
+    assert repo.claim_digest(admin_id, today)
+
+
+# MySQL only: DDL upgrades and pooled connections
+def mysql_indexes(repo, table):
+    return {row['index_name'] for row in repo.fetchall('''
+        SELECT DISTINCT index_name AS index_name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = :table
+    ''', {'table': table})}
+
+
+def test_create_schema_upgrades_an_older_database(app, mysql):
+    with app.app.app_context():
+        repo = app.MySQLRepository()
+        for sql in ['ALTER TABLE clients DROP INDEX idx_clients_phone_e164',
+                    'ALTER TABLE clients DROP COLUMN phone_e164, DROP COLUMN carrier',
+                    'ALTER TABLE admins DROP COLUMN notification_mode, DROP COLUMN digest_sent_on']:
+            repo.execute(sql)
+        repo.close()
+
+        app.MySQLRepository.create_schema()
+        app.MySQLRepository.create_schema()  # a second run changes nothing
+
+        repo = app.MySQLRepository()
+        assert 'idx_clients_phone_e164' in mysql_indexes(repo, 'clients')
+        admin_id = add_admin(repo)
+        assert repo.get_admin(admin_id)['notification_mode'] == 'instant'
+        repo.close()
+
+
+def test_pool_replaces_a_connection_the_server_closed(app, mysql):
+    pool = app.get_mysql_pool()
+    conn = pool.acquire()
+    thread_id = conn.thread_id()
+    pool.release(conn)
+
+    killer = mysql_connect(mysql)
+    killer.cursor().execute(f'KILL {thread_id}')
+    killer.close()
+
+    conn = pool.acquire()
+    try:
+        assert conn.thread_id() != thread_id
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1')
+        assert cursor.fetchone() == (1,)
+    finally:
+        pool.release(conn)
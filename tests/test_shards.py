@@ -0,0 +1,124 @@
+from datetime import date, timedelta
+
+from conftest import add_admin
+
+ADMIN_ID = 3
+
+
+def seed_admin(app):
+    """An admin with live clients, archived clients, a pending SMS job and an alert ledger row"""
+    add_admin(app, ADMIN_ID)
+    today = date.today()
+    with app.app.app_context():
+        db = app.get_db(ADMIN_ID)
+        db.executemany('''
+            INSERT INTO clients (admin_id, name, phone, products, total_amount, remaining_balance, due_date)
+            VALUES (?, ?, ?, 'rice', ?, ?, ?)
+        ''', [
+            (ADMIN_ID, 'Overdue', '09171234567', 500, 300, (today - timedelta(days=3)).isoformat()),
+            (ADMIN_ID, 'Due today', '09181234567', 200, 200, today.isoformat()),
+            (ADMIN_ID, 'Settled long ago', None, 400, 0, '2020-01-01'),
+            (ADMIN_ID, 'Also settled', None, 150, 0, '2020-02-01'),
+            (ADMIN_ID, 'Settled recently', None, 100, 0, today.isoformat()),
+        ])
+        db.execute('''
+            INSERT INTO sms_reminders (client_id, method)
+            SELECT id, 'email_gateway' FROM clients WHERE name = 'Settled long ago'
+        ''')
+        db.execute("UPDATE clients SET paid_at = datetime('now', '-400 days') WHERE name LIKE '%long ago' OR name = 'Also settled'")
+        db.commit()
+        assert app.archive_settled_clients(db, ADMIN_ID, older_than_days=180) == 2
+
+        clients = app.get_repository(ADMIN_ID).sms_eligible_clients(ADMIN_ID)
+        app.enqueue_sms_job(db, ADMIN_ID, clients)
+        db.execute('''
+            INSERT INTO notification_ledger (client_id, status, due_date, admin_id)
+            SELECT id, 'due_today', due_date, admin_id FROM clients WHERE name = 'Due today'
+        ''')
+        db.commit()
+        return app.get_client_summary(db, ADMIN_ID)
+
+
+def count(db, table):
+    return db.execute(f'SELECT COUNT(*) FROM {table} WHERE admin_id = ?', (ADMIN_ID,)).fetchone()[0]
+
+
+def test_split_moves_archived_clients_and_keeps_the_summary(app, monkeypatch):
+    before = seed_admin(app)
+    assert before['total_clients'] == 5 and before['paid_count'] == 3
+
+    monkeypatch.setattr(app, 'DB_SHARDS', 2)
+    with app.app.app_context():
+        app.init_db()
+    result = app.app.test_cli_runner().invoke(args=['split-shards', '--purge'])
+    assert result.exit_code == 0, result.output
+
+    with app.app.app_context():
+        shard = app.get_db(ADMIN_ID)
+        directory = app.get_directory_db()
+        assert app.shard_database(ADMIN_ID) != app.DATABASE
+        assert app.get_client_summary(shard, ADMIN_ID) == before
+        stored = app.get_admin_summary(shard, ADMIN_ID)
+        assert {key: stored[key] for key in app.SUMMARY_COUNTERS} == \
+            {key: before[key] for key in app.SUMMARY_COUNTERS}
+
+        assert count(shard, 'archived_clients') == 2
+        assert shard.execute('SELECT COUNT(*) FROM archived_sms_reminders').fetchone()[0] == 1
+        assert count(shard, 'jobs') == 1
+        assert count(shard, 'outbox') == 2
+        assert count(shard, 'notification_ledger') == 1
+        for table in ('clients', 'archived_clients', 'jobs', 'outbox', 'notification_ledger'):
+            assert count(directory, table) == 0, table
+        assert directory.execute('SELECT COUNT(*) FROM archived_sms_reminders').fetchone()[0] == 0
+
+
+def test_split_without_purge_moves_unsent_outbox_rows(app, monkeypatch):
+    seed_admin(app)
+    monkeypatch.setattr(app, 'DB_SHARDS', 2)
+    with app.app.app_context():
+        app.init_db()
+    runner = app.app.test_cli_runner()
+    assert runner.invoke(args=['split-shards']).exit_code == 0
+    # Re-running is a no-op, even though the directory still holds the copies
+    assert 'skipped' in runner.invoke(args=['split-shards']).output
+
+    with app.app.app_context():
+        directory = app.get_directory_db()
+        assert count(directory, 'archived_clients') == 2
+        assert count(directory, 'outbox') == 0
+        assert count(app.get_db(ADMIN_ID), 'outbox') == 2
+
+
+def session_for(app, admin_id):
+    test_client = app.app.test_client()
+    with test_client.session_transaction() as session:
+        session['admin_id'] = admin_id
+    return test_client
+
+
+def test_each_admin_reads_and_writes_only_its_own_shard(app, monkeypatch):
+    monkeypatch.setattr(app, 'DB_SHARDS', 2)
+    with app.app.app_context():
+        app.init_db()
+    add_admin(app, 1)
+    add_admin(app, 2)
+    due = (date.today() + timedelta(days=10)).isoformat()
+    for admin_id, name in ((1, 'Odd shard'), (2, 'Even shard')):
+        response = session_for(app, admin_id).post('/add_client', json={
+            'name': name, 'phone': '09171234567', 'products': 'rice',
+            'total_amount': 100, 'remaining_balance': 100, 'due_date': due})
+        assert response.json['success']
+
+    assert app.shard_database(1) == app.shard_path(1) and app.shard_database(2) == app.shard_path(0)
+    with app.app.app_context():
+        for admin_id, name in ((1, 'Odd shard'), (2, 'Even shard')):
+            shard = app.get_db(admin_id)
+            assert [row['name'] for row in shard.execute('SELECT name FROM clients')] == [name]
+            assert shard.execute('SELECT id FROM admins').fetchall()[0]['id'] == admin_id  # mirror row
+            assert app.diff_admin_summary(shard, admin_id) == {}
+        directory = app.get_directory_db()
+        assert directory.execute('SELECT COUNT(*) FROM clients').fetchone()[0] == 0
+        assert directory.execute('SELECT COUNT(*) FROM admins').fetchone()[0] == 2
+
+    names = [row['name'] for row in session_for(app, 2).get('/api/clients').json['clients']]
+    assert names == ['Even shard']
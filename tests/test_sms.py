@@ -0,0 +1,153 @@
+import time
+
+PHONE = '09171230001'
+
+
+def gateways(app, phone=PHONE):
+    (number,), (addresses,) = app.sms_candidates([phone])
+    return number, [address.split('@', 1)[1] for address in addresses]
+
+
+def gateway_of(brevo_stub, body):
+    return brevo_stub.recipients(body)[0].split('@', 1)[1]
+
+
+def finish(sender):
+    """Let attempts left running in the background complete"""
+    sender._executor.shutdown(wait=True)
+
+
+def test_slow_gateway_is_hedged_within_the_delay(app, brevo_stub):
+    number, (primary, backup, *_) = gateways(app)
+    brevo_stub.respond = lambda body: (201, {}, 2.0 if gateway_of(brevo_stub, body) == primary else 0)
+    sender = app.HedgedSender(delay_ms=300, max_parallel=2)
+
+    started = time.monotonic()
+    assert sender.send(PHONE, 'Payment reminder')
+    elapsed = time.monotonic() - started
+
+    # Worst case is the hedge delay plus the backup's own latency, not the 2s stall
+    assert 0.3 <= elapsed < 1.0
+    stats = sender.snapshot()
+    assert stats['hedged'] == 1 and stats['hedge_wins'] == 1
+    assert app.load_gateway_memo([number])[number][0] == backup
+
+    finish(sender)
+    assert [gateway_of(brevo_stub, body) for body in brevo_stub.requests] == [primary, backup]
+    assert sender.snapshot()['duplicates'] == 1
+
+
+def test_fast_gateway_is_not_hedged(app, brevo_stub):
+    sender = app.HedgedSender(delay_ms=300, max_parallel=2)
+
+    assert sender.send(PHONE, 'Payment reminder')
+    finish(sender)
+    assert len(brevo_stub.requests) == 1
+    assert sender.snapshot()['hedged'] == 0
+
+
+def test_rejection_moves_to_next_gateway_without_waiting(app, brevo_stub):
+    number, (primary, backup, *_) = gateways(app)
+    brevo_stub.respond = lambda body: (400 if gateway_of(brevo_stub, body) == primary else 201, {}, 0)
+    sender = app.HedgedSender(delay_ms=1000, max_parallel=2)
+
+    started = time.monotonic()
+    assert sender.send(PHONE, 'Payment reminder')
+    assert time.monotonic() - started < 0.5
+    finish(sender)
+    assert [gateway_of(brevo_stub, body) for body in brevo_stub.requests] == [primary, backup]
+    assert sender.snapshot()['hedged'] == 0
+
+
+def test_api_failure_stops_without_retries_or_other_gateways(app, brevo_stub):
+    assert app.brevo.max_retries > 0
+    brevo_stub.respond = lambda body: (503, {}, 0)
+    sender = app.HedgedSender(delay_ms=300, max_parallel=2)
+
+    assert not sender.send(PHONE, 'Payment reminder')
+    finish(sender)
+    # The hedge delay, not the Brevo client's backoff, decides when to move on
+    assert len(brevo_stub.requests) == 1
+    assert app.brevo.snapshot()['retries'] == 0
+
+
+def memo_failures(app, number):
+    with app.app.app_context():
+        row = app.get_directory_db().execute('SELECT failures FROM gateway_memo WHERE phone = ?',
+                                             (number,)).fetchone()
+    return row['failures'] if row else 0
+
+
+def test_number_rejected_by_every_carrier_gateway_counts_as_a_failure(app, brevo_stub):
+    brevo_stub.respond = lambda body: (400, {}, 0)
+    number, domains = gateways(app)
+    sender = app.HedgedSender(delay_ms=300, max_parallel=2)
+
+    assert not sender.send(PHONE, 'Payment reminder')
+    finish(sender)
+    assert len(brevo_stub.requests) == len(domains)
+    assert memo_failures(app, number) == 1
+
+
+def test_skipped_carrier_gateway_does_not_count_as_a_rejection(app, brevo_stub):
+    brevo_stub.respond = lambda body: (400, {}, 0)
+    for _ in range(app.gateway_health.trip_after):
+        app.gateway_health.record('myglobe.sms.ph', False)  # tripped: skipped by the walk
+    number, domains = gateways(app)
+    assert 'myglobe.sms.ph' not in domains
+
+    sender = app.HedgedSender(delay_ms=300, max_parallel=2)
+    assert not sender.send(PHONE, 'Payment reminder')
+    finish(sender)
+    assert not app.deliver_sms(PHONE, 'Payment reminder')
+    assert memo_failures(app, number) == 0
+
+
+def test_accepting_gateway_is_remembered_for_the_next_send(app, brevo_stub, monkeypatch):
+    number, (primary, backup, *_) = gateways(app)
+    brevo_stub.respond = lambda body: (400 if gateway_of(brevo_stub, body) == primary else 201, {}, 0)
+
+    assert app.deliver_sms(PHONE, 'Payment reminder')
+    assert [gateway_of(brevo_stub, body) for body in brevo_stub.requests] == [primary, backup]
+    assert app.load_gateway_memo([number]) == {number: (backup, False)}
+
+    monkeypatch.setattr(app, 'gateway_health', app.GatewayHealth())  # only the memo reorders now
+    brevo_stub.requests.clear()
+    assert app.deliver_sms(PHONE, 'Payment reminder')
+    assert [gateway_of(brevo_stub, body) for body in brevo_stub.requests] == [backup]
+
+
+def test_stale_memo_is_ignored(app, brevo_stub):
+    number, (primary, *_) = gateways(app)
+    assert app.deliver_sms(PHONE, 'Payment reminder')
+    with app.app.app_context():
+        db = app.get_directory_db()
+        db.execute("UPDATE gateway_memo SET last_success_at = datetime('now', ?)",
+                   (f'-{app.GATEWAY_MEMO_TTL_DAYS + 1} days',))
+        db.commit()
+    assert app.load_gateway_memo([number]) == {number: (None, False)}
+
+
+def test_known_bad_number_is_not_sent_until_the_mark_expires(app, brevo_stub, monkeypatch):
+    monkeypatch.setattr(app, 'GATEWAY_BAD_AFTER', 2)
+    brevo_stub.respond = lambda body: (400, {}, 0)
+    number, domains = gateways(app)
+    other = '09171230002'
+
+    for _ in range(2):
+        assert app.deliver_sms_batch([(PHONE, 'Payment reminder')]) == ['rejected']
+    assert app.load_gateway_memo([number]) == {number: (None, True)}
+
+    brevo_stub.requests.clear()
+    brevo_stub.respond = lambda body: (201, {}, 0)
+    assert app.deliver_sms_batch([(PHONE, 'Payment reminder'), (other, 'Payment reminder')]) == \
+        ['unreachable', 'sent']
+    assert [to.split('@')[0] for body in brevo_stub.requests for to in brevo_stub.recipients(body)] == \
+        [app.sms_local_number(other)]
+
+    with app.app.app_context():
+        db = app.get_directory_db()
+        db.execute("UPDATE gateway_memo SET bad_until = datetime('now', '-1 minute') WHERE phone = ?", (number,))
+        db.commit()
+    assert app.deliver_sms(PHONE, 'Payment reminder')
+    assert app.load_gateway_memo([number])[number][1] is False
@@ -0,0 +1,133 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import add_admin, add_client
+
+
+@pytest.fixture
+def ledger(app, client):
+    """One client in each status; returns their ids by name"""
+    today = date.today()
+    return {
+        'paid': add_client(app, 1, 'paid', today - timedelta(days=9), balance=0, total=200),
+        'overdue': add_client(app, 1, 'overdue', today - timedelta(days=1), balance=150, total=300),
+        'today': add_client(app, 1, 'today', today, balance=100, total=100),
+        'tomorrow': add_client(app, 1, 'tomorrow', today + timedelta(days=1), balance=50, total=400),
+        'undated': add_client(app, 1, 'undated', None, balance=25, total=25),
+    }
+
+
+def test_client_summary_counts_every_status_in_one_pass(app, ledger):
+    with app.app.app_context():
+        summary = app.get_client_summary(app.get_db(1), 1)
+    assert summary['total_clients'] == 5
+    assert (summary['total_debt'], summary['total_outstanding']) == (1025, 325)
+    assert (summary['paid_count'], summary['overdue_count'], summary['pending_count']) == (1, 1, 3)
+    assert (summary['due_today_count'], summary['due_tomorrow_count']) == (1, 1)
+
+    chart = app.build_chart_data(summary)
+    assert {key: value['count'] for key, value in chart.items()} == {'paid': 1, 'pending': 3, 'overdue': 1}
+    assert {key: value['percentage'] for key, value in chart.items()} == {'paid': 20, 'pending': 60, 'overdue': 20}
+
+
+@pytest.mark.parametrize('counts', [
+    {'paid': 1, 'pending': 1, 'overdue': 1},
+    {'paid': 2, 'pending': 5, 'overdue': 0},
+    {'paid': 7, 'pending': 13, 'overdue': 29},
+])
+def test_chart_percentages_always_add_up_to_100(app, counts):
+    percentages = app.chart_percentages(counts)
+    assert sum(percentages.values()) == 100
+    for key, count in counts.items():
+        assert abs(percentages[key] - count * 100 / sum(counts.values())) < 1
+
+
+def test_chart_percentages_of_nothing_are_zero(app):
+    assert app.chart_percentages({'paid': 0, 'pending': 0, 'overdue': 0}) == {'paid': 0, 'pending': 0, 'overdue': 0}
+
+
+def test_dashboard_and_clients_pages_show_the_same_chart(client, ledger):
+    dashboard = client.get('/dashboard').get_data(as_text=True)
+    assert 'P1,025.00' in dashboard and 'P325.00' in dashboard
+    assert '60%' in dashboard
+
+    page = client.get('/clients').get_data(as_text=True)
+    line = next(line for line in page.splitlines() if 'window.chartData = {' in line)
+    chart = json.loads(line.split('=', 1)[1].strip().rstrip(';'))
+    assert chart == {'paid': {'count': 1, 'percentage': 20}, 'pending': {'count': 3, 'percentage': 60},
+                     'overdue': {'count': 1, 'percentage': 20}}
+
+
+def stored_summary(db, admin_id):
+    return dict(db.execute('SELECT * FROM admin_summary WHERE admin_id = ?', (admin_id,)).fetchone())
+
+
+def test_triggers_keep_the_summary_in_step_with_every_write(app, ledger):
+    add_admin(app, 2)
+    today = date.today()
+    with app.app.app_context():
+        db = app.get_db()
+        writes = [
+            ('UPDATE clients SET remaining_balance = 0 WHERE id = ?', (ledger['overdue'],)),
+            ('UPDATE clients SET due_date = ? WHERE id = ?', (today.isoformat(), ledger['tomorrow'])),
+            ('UPDATE clients SET total_amount = 900, remaining_balance = 900 WHERE id = ?', (ledger['undated'],)),
+            ('UPDATE clients SET remaining_balance = 10, due_date = ? WHERE id = ?',
+             ((today - timedelta(days=3)).isoformat(), ledger['paid'])),
+            ('UPDATE clients SET admin_id = 2 WHERE id = ?', (ledger['today'],)),
+            ('DELETE FROM clients WHERE id = ?', (ledger['tomorrow'],)),
+        ]
+        for sql, params in writes:
+            db.execute(sql, params)
+            db.commit()
+            assert stored_summary(db, 1)['as_of_date'] == today.isoformat()
+            assert app.diff_admin_summary(db, 1, today) == {}, sql
+            assert app.diff_admin_summary(db, 2, today) == {}, sql
+
+        assert stored_summary(db, 1)['total_clients'] == 3
+        assert stored_summary(db, 2)['total_clients'] == 1
+
+
+def test_payments_and_bulk_updates_keep_the_summary_in_step(app, client, ledger):
+    client.post(f"/record_payment/{ledger['overdue']}", json={'amount': '150'})
+    client.post('/bulk_update', json={'operation': 'mark_paid', 'client_ids': [ledger['today']]})
+    client.post('/bulk_update', json={'operation': 'delete', 'client_ids': [ledger['undated']]})
+    with app.app.app_context():
+        db = app.get_db(1)
+        assert app.diff_admin_summary(db, 1) == {}
+        summary = stored_summary(db, 1)
+    assert (summary['total_clients'], summary['paid_count'], summary['overdue_count']) == (4, 3, 0)
+
+
+def test_summary_rolls_over_to_a_new_day(app, ledger):
+    today = date.today()
+    with app.app.app_context():
+        db = app.get_db(1)
+        assert stored_summary(db, 1)['overdue_count'] == 1
+
+        later = today + timedelta(days=2)
+        summary = app.get_admin_summary(db, 1, later)
+        assert summary['as_of_date'] == later.isoformat()
+        assert summary['overdue_count'] == 3 and summary['due_today_count'] == 0
+        assert stored_summary(db, 1)['overdue_count'] == 3
+        status = db.execute('SELECT status FROM clients WHERE id = ?', (ledger['tomorrow'],)).fetchone()[0]
+        assert status == 'overdue'
+        assert app.diff_admin_summary(db, 1, later) == {}
+
+
+def test_check_summaries_reports_and_fixes_drift(app, ledger):
+    with app.app.app_context():
+        db = app.get_db(1)
+        db.execute('UPDATE admin_summary SET overdue_count = 7 WHERE admin_id = 1')
+        db.commit()
+        assert app.diff_admin_summary(db, 1) == {'overdue_count': (7, 1)}
+
+    runner = app.app.test_cli_runner()
+    result = runner.invoke(args=['check-summaries'])
+    assert result.exit_code == 1
+    assert 'admin 1: overdue_count stored=7 actual=1' in result.output
+
+    result = runner.invoke(args=['check-summaries', '--fix'])
+    assert result.exit_code == 0 and '1 admin summary out of sync (fixed)' in result.output
+    assert runner.invoke(args=['check-summaries']).exit_code == 0
@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+INSERT = 'INSERT INTO events (value) VALUES (?)'
+
+
+@pytest.fixture
+def events(app):
+    """The app database with a scratch events table; returns a row-count helper"""
+    db = app.get_pool().acquire()
+    db.execute('CREATE TABLE events (value INTEGER NOT NULL)')
+    db.commit()
+    app.get_pool().release(db)
+
+    def count():
+        db = app.get_pool().acquire()
+        try:
+            return db.execute('SELECT COUNT(*) FROM events').fetchone()[0]
+        finally:
+            app.get_pool().release(db)
+    return count
+
+
+def test_rows_wait_for_one_group_commit(app, events):
+    buffer = app.WriteBuffer(max_rows=100, max_ms=60000)
+    for value in range(5):
+        buffer.add(app.DATABASE, INSERT, (value,))
+    assert events() == 0 and buffer.snapshot()['pending'] == 5
+
+    assert buffer.flush() == 5
+    assert events() == 5
+    stats = buffer.snapshot()
+    assert (stats['rows'], stats['flushes'], stats['pending'], stats['dropped']) == (5, 1, 0, 0)
+    assert buffer.flush() == 0
+
+
+def test_a_full_buffer_flushes_itself(app, events):
+    buffer = app.WriteBuffer(max_rows=3, max_ms=60000)
+    for value in range(4):
+        buffer.add(app.DATABASE, INSERT, (value,))
+    assert events() == 3 and buffer.snapshot()['pending'] == 1
+    buffer.flush()
+
+
+def test_old_rows_are_flushed_by_the_timer(app, events):
+    buffer = app.WriteBuffer(max_rows=100, max_ms=50)
+    buffer.add(app.DATABASE, INSERT, (1,))
+    deadline = time.monotonic() + 2
+    while events() == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert events() == 1 and buffer.snapshot()['flushes'] == 1
+
+
+def test_a_failed_batch_is_dropped_and_counted(app, events, capsys):
+    buffer = app.WriteBuffer(max_rows=100, max_ms=60000)
+    buffer.add(app.DATABASE, INSERT, (1,))
+    buffer.add(app.DATABASE, INSERT, (None,))  # NOT NULL violation rolls back the whole batch
+    assert buffer.flush() == 0
+    assert events() == 0
+    assert buffer.snapshot()['dropped'] == 2
+    assert 'write buffer dropped 2 row(s)' in capsys.readouterr().out
+
+
+def test_rows_are_flushed_at_the_end_of_a_request(app, client, events):
+    app.write_buffer.add(app.DATABASE, INSERT, (1,))
+    assert client.get('/api/clients').status_code == 200
+    assert events() == 1 and app.write_buffer.snapshot()['pending'] == 0